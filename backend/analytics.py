@@ -0,0 +1,45 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from coalescing import SingleFlight
+
+# Seconds an analytics result is served from memory before the pipeline runs again
+ANALYTICS_CACHE_TTL = 60
+
+# Date bucket -> $dateToString format for the trend pipelines
+TREND_BUCKETS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+
+
+class TTLCache:
+    """Per-worker cache of expensive results that expire after a fixed time.
+
+    A miss is computed through SingleFlight, so a dashboard opened by many
+    people at once runs each pipeline once instead of once per request.
+    """
+
+    def __init__(self, ttl: float = ANALYTICS_CACHE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._flights = SingleFlight()
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self.clock():
+            return entry[1]
+        return await self._flights.run(key, lambda: self._refresh(key, compute))
+
+    async def _refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await compute()
+        self._entries[key] = (self.clock() + self.ttl, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+analytics_cache = TTLCache()
@@ -0,0 +1,223 @@
+"""
+Session archives for moving sessions between environments or keeping a finished season.
+
+An archive is gzip-compressed NDJSON: a header line, then one line per Mongo
+document as {"collection": ..., "document": ...} in relaxed extended JSON, so
+dates come back as dates. Archives can be concatenated (cat a.gz b.gz).
+
+    python archive.py export [--session ID ...] [-o sesiones.ndjson.gz]
+    python archive.py import sesiones.ndjson.gz [--replace]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from bson import json_util
+from dotenv import load_dotenv
+
+from database import Database, DatabaseSettings
+
+ARCHIVE_FORMAT = "scout-sessions"
+ARCHIVE_VERSION = 1
+
+# zlib level 6 compresses the repetitive person documents ~10x at a good speed
+COMPRESSION_LEVEL = 6
+
+# Documents per insert_many when importing
+IMPORT_BATCH_SIZE = 1000
+
+# Bytes read from an archive file at a time
+READ_CHUNK = 1 << 20
+
+# (collection, documents) as produced by Database.iter_archive
+DocumentBatches = AsyncIterator[Tuple[str, List[Dict[str, Any]]]]
+
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _header() -> bytes:
+    header = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "exported_at": datetime.utcnow().isoformat()}
+    return (json.dumps(header) + "\n").encode("utf-8")
+
+
+def _encode(name: str, docs: List[Dict[str, Any]]) -> bytes:
+    # default= only handles the values plain JSON can't (dates), the rest stays in the C encoder
+    return "".join(
+        json.dumps({"collection": name, "document": doc}, default=json_util.default, ensure_ascii=False) + "\n"
+        for doc in docs
+    ).encode("utf-8")
+
+
+def _object_hook(obj: Dict[str, Any]) -> Any:
+    # Extended JSON values ({"$date": ...}) are the only objects whose first key starts with "$"
+    return json_util.object_hook(obj) if next(iter(obj), "")[:1] == "$" else obj
+
+
+async def write_archive(batches: DocumentBatches, level: int = COMPRESSION_LEVEL) -> AsyncIterator[bytes]:
+    """Stream a compressed archive; encoding and compression run in a worker thread"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    yield compressor.compress(_header())
+    async for name, docs in batches:
+        chunk = await asyncio.to_thread(lambda: compressor.compress(_encode(name, docs)))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+class ArchiveReader:
+    """Incremental decoder: feed compressed bytes, get back (collection, document) records"""
+
+    def __init__(self):
+        self.decompressor = zlib.decompressobj(GZIP_WBITS)
+        self.in_member = False
+        self.pending = b""
+        self.headers = 0
+
+    def feed(self, data: bytes) -> List[Tuple[str, Dict[str, Any]]]:
+        text = b""
+        try:
+            while data:
+                text += self.decompressor.decompress(data)
+                data = self.decompressor.unused_data
+                self.in_member = not self.decompressor.eof
+                if self.decompressor.eof:
+                    # The next gzip member of a concatenated archive
+                    self.decompressor = zlib.decompressobj(GZIP_WBITS)
+        except zlib.error as error:
+            raise ValueError(f"no es un archivo gzip válido ({error})")
+        lines = (self.pending + text).split(b"\n")
+        self.pending = lines.pop()
+        return self._parse(lines)
+
+    def finish(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Records of the last line; fails on a truncated or empty archive"""
+        if self.in_member:
+            raise ValueError("el archivo está incompleto")
+        records = self._parse([self.pending])
+        self.pending = b""
+        if not self.headers:
+            raise ValueError("falta la cabecera del archivo")
+        return records
+
+    def _parse(self, lines: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, object_hook=_object_hook)
+                if "format" in record:
+                    if record["format"] != ARCHIVE_FORMAT or record.get("version") != ARCHIVE_VERSION:
+                        raise ValueError("formato o versión de archivo desconocidos")
+                    self.headers += 1
+                    continue
+                if not self.headers:
+                    raise ValueError("falta la cabecera del archivo")
+                records.append((record["collection"], record["document"]))
+            except (KeyError, TypeError) as error:
+                raise ValueError(f"línea no válida ({error})")
+        return records
+
+
+async def read_archive(chunks: AsyncIterator[bytes], batch_size: int = IMPORT_BATCH_SIZE) -> DocumentBatches:
+    """Decode a compressed archive into (collection, documents) batches for Database.import_archive"""
+    reader = ArchiveReader()
+    name, batch = None, []
+
+    async def decoded():
+        async for chunk in chunks:
+            yield await asyncio.to_thread(reader.feed, chunk)
+        yield reader.finish()
+
+    async for records in decoded():
+        for collection, document in records:
+            if collection != name or len(batch) >= batch_size:
+                if batch:
+                    yield name, batch
+                name, batch = collection, []
+            batch.append(document)
+    if batch:
+        yield name, batch
+
+
+async def _read_file(path: Path) -> AsyncIterator[bytes]:
+    with open(path, "rb") as source:
+        while True:
+            chunk = await asyncio.to_thread(source.read, READ_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def _counted(batches: DocumentBatches, counts: Dict[str, int]) -> DocumentBatches:
+    async for name, docs in batches:
+        counts[name] = counts.get(name, 0) + len(docs)
+        yield name, docs
+
+
+async def export_command(database: Database, args: argparse.Namespace) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    batches = _counted(database.iter_archive(args.session or None), counts)
+    target = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        async for chunk in write_archive(batches, args.level):
+            target.write(chunk)
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+    return counts
+
+
+async def import_command(database: Database, args: argparse.Namespace) -> Dict[str, int]:
+    result = await database.import_archive(read_archive(_read_file(Path(args.archive))), replace=args.replace)
+    if result.skipped_sessions:
+        print(f"{result.skipped_sessions} sesiones ya existían y se han omitido", file=sys.stderr)
+    return result.inserted
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Defaults to MONGO_URL")
+    parser.add_argument("--db-name", help="Defaults to DB_NAME")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write sessions to an archive")
+    export.add_argument("--session", action="append", help="Session ID to export (repeatable); all if omitted")
+    export.add_argument("-o", "--output", default="-", help="Archive file, '-' for stdout")
+    export.add_argument("--level", type=int, default=COMPRESSION_LEVEL, help="gzip level, 1 (fast) to 9 (small)")
+
+    load = commands.add_parser("import", help="Load an archive into the database")
+    load.add_argument("archive", help="Archive file")
+    load.add_argument("--replace", action="store_true", help="Overwrite sessions that already exist instead of skipping them")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    load_dotenv(Path(__file__).parent / ".env")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    if args.db_name:
+        os.environ["DB_NAME"] = args.db_name
+    database = Database(DatabaseSettings.from_env())
+    database.connect()
+    started = time.perf_counter()
+    try:
+        command = export_command if args.command == "export" else import_command
+        counts = await command(database, args)
+    finally:
+        database.close()
+    summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+    print(f"{args.command}: {summary or 'nada'} en {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,135 +1,644 @@
+import heapq
 import random
-from typing import Dict, List, Tuple
-from models import Person, SectionLimits, ContinuityItem, RestrictionPriorities, AssignmentStatistics, SatisfactionStats
+from itertools import groupby
+from typing import Collection, Dict, List, Optional, Tuple
+from models import (Person, SectionLimits, ContinuityItem, RestrictionPriorities, AssignmentStatistics,
+                    SatisfactionStats, GroupConstraint, AssignmentTrace, SECTIONS)
+from flow import MinCostFlow
+from groups import GroupPlan
+from name_index import NameIndex
+from tracing import AssignmentTracer
+
+# Restrictions optimized by the lexicographic strategy, keyed as in RestrictionPriorities
+RESTRICTIONS = ["sectionLimits", "continuityList", "firstPreference", "secondPreference"]
+
+def preference_rank(person: Person, section: str) -> Optional[int]:
+    """Position of a section in a person's ranked preferences (0 = first choice), None if unranked"""
+    try:
+        return person.preferences.index(section)
+    except ValueError:
+        return None
+
+def satisfaction_category(person: Person, section: str) -> str:
+    """Satisfaction bucket (a SatisfactionStats field name) for a person placed in a section"""
+    rank = preference_rank(person, section)
+    if rank is not None:
+        # A ranked section counts as ranked even if also vetoed; ranks past the second are "other"
+        return ("firstChoice", "secondChoice")[rank] if rank < 2 else "other"
+    if section in person.vetoes:
+        return "veto"
+    return "other"
+
+def vetoed_sections(person: Person) -> Tuple[str, ...]:
+    """Sections a person must not be placed in"""
+    return tuple(person.vetoes)
+
+class SectionCapacity:
+    """Room left per section during a greedy pass.
+
+    Sections with room are kept in a heap by section order and all sections in
+    a heap by head count, both invalidated lazily (counts only grow), so the
+    "first free section" and "least full section" fallbacks cost O(log k)
+    instead of a scan over every section.
+    """
+    
+    def __init__(self, sections: List[str], limits: Dict, assignments: Dict[str, List[Person]]):
+        self.sections = sections
+        self.max = {section: limits[section].max for section in sections}
+        self.counts = {section: len(assignments[section]) for section in sections}
+        self._open = [i for i, section in enumerate(sections) if self.has_room(section)]
+        self._by_count = [(self.counts[section], i) for i, section in enumerate(sections)]
+        heapq.heapify(self._by_count)
+    
+    def has_room(self, section: str) -> bool:
+        return self.counts[section] < self.max[section]
+    
+    def room(self, section: str) -> int:
+        return max(self.max[section] - self.counts[section], 0)
+    
+    def add(self, section: str, count: int = 1):
+        self.counts[section] += count
+    
+    def first_open(self, excluded: Collection[str] = ()) -> Optional[str]:
+        """First section in section order with room that isn't excluded"""
+        skipped = []
+        found = None
+        while self._open:
+            section = self.sections[self._open[0]]
+            if not self.has_room(section):
+                heapq.heappop(self._open)
+            elif section in excluded:
+                skipped.append(heapq.heappop(self._open))
+            else:
+                found = section
+                break
+        for index in skipped:
+            heapq.heappush(self._open, index)
+        return found
+    
+    def least_full(self) -> str:
+        """Section with the fewest people, the earliest one on ties"""
+        while True:
+            count, index = self._by_count[0]
+            current = self.counts[self.sections[index]]
+            if count == current:
+                return self.sections[index]
+            heapq.heapreplace(self._by_count, (current, index))
 
 class SectionAssigner:
     def __init__(self, people: List[Person], limits: SectionLimits, 
-                 continuity_list: List[ContinuityItem], priorities: RestrictionPriorities):
+                 continuity_list: List[ContinuityItem], priorities: RestrictionPriorities,
+                 rng: Optional[random.Random] = None, strategy: str = "greedy",
+                 sections: Optional[List[str]] = None, constraints: Optional[List[GroupConstraint]] = None,
+                 trace: bool = False):
         self.people = people
         self.limits = limits.limits
         self.continuity_list = continuity_list
         self.priorities = priorities.priorities
-        self.sections = ["Colonia", "Manada", "Tropa", "Esculta", "Clan"]
+        self.sections = list(sections or SECTIONS)
+        self.rng = rng or random.Random()
+        self.strategy = strategy
+        self.groups = GroupPlan(people, constraints or [])
+        self._name_index: Optional[NameIndex] = None
+        self._people_by_id: Optional[Dict[str, Person]] = None
+        # Longest ranked list; unranked sections rank right after it and vetoed ones after that
+        self.max_rank = max((len(person.preferences) for person in people), default=0)
+        # Opt-in: every hook below is skipped when this is None
+        self.tracer = AssignmentTracer() if trace else None
         
     def assign_people(self) -> Dict[str, List[Person]]:
         """Main assignment algorithm"""
-        # Initialize sections
+        if self.tracer is not None:
+            self.tracer.start()
+        if self.strategy == "lexicographic":
+            return self._assign_lexicographic()
+        
+        # Steps 1-2: Assign continuity list (highest priority) and get remaining people
+        assignments, remaining_people = self.assign_continuity()
+        self.lap("continuity")
+        return self.assign_remaining(assignments, remaining_people)
+    
+    def lap(self, phase: str):
+        """End a profiled phase (it started at the previous lap) when tracing"""
+        if self.tracer is not None:
+            self.tracer.lap(phase)
+    
+    def trace_report(self, assignments: Dict[str, List[Person]]) -> Optional[AssignmentTrace]:
+        """Why everyone in assignments is where they are, and the phase profile; None unless tracing"""
+        if self.tracer is None:
+            return None
+        return self.tracer.report(assignments)
+    
+    def assign_continuity(self) -> Tuple[Dict[str, List[Person]], List[Person]]:
+        """Place the continuity list and return the partial assignment plus the people left over"""
         assignments = {section: [] for section in self.sections}
         
-        # Step 1: Assign continuity list (highest priority)
         assigned_people = set()
+        tracer = self.tracer
         for continuity_item in self.continuity_list:
-            person = self._find_person_by_name(continuity_item.name)
-            if person and person.name not in assigned_people:
+            person = self._find_continuity_person(continuity_item)
+            if person and person.id not in assigned_people:
                 assignments[continuity_item.section].append(person)
-                assigned_people.add(person.name)
+                assigned_people.add(person.id)
+                if tracer is not None:
+                    tracer.place(person, "continuity")
         
-        # Step 2: Get remaining people
-        remaining_people = [p for p in self.people if p.name not in assigned_people]
+        remaining_people = [p for p in self.people if p.id not in assigned_people]
+        return assignments, remaining_people
+    
+    def assign_remaining(self, assignments: Dict[str, List[Person]],
+                         remaining_people: List[Person]) -> Dict[str, List[Person]]:
+        """Assign everyone not covered by the continuity list according to the priorities"""
+        remaining_people = self._place_groups(assignments, remaining_people)
         
-        # Step 3: Sort restrictions by priority
-        restriction_order = sorted(self.priorities.items(), key=lambda x: x[1])
+        # Whoever is already placed (continuity list and constrained groups) is never moved afterwards
+        pinned = {id(person) for section_people in assignments.values() for person in section_people}
         
-        # Step 4: Apply assignment strategy based on priorities
+        # Step 3: Apply assignment strategy based on priorities
         if self._get_priority('sectionLimits') == 1:
             # Section limits have highest priority - strict limit enforcement
             assignments = self._assign_with_strict_limits(assignments, remaining_people)
         else:
             # Preferences have higher priority - try to satisfy preferences first
             assignments = self._assign_with_preference_priority(assignments, remaining_people)
+        
+        # Step 4: Top up sections below their minimum, unless preferences outrank the limits
+        if self._get_priority('sectionLimits') <= self._get_priority('firstPreference'):
+            assignments = self._rebalance_minimums(assignments, pinned)
             
         return assignments
     
+    def _place_groups(self, assignments: Dict[str, List[Person]],
+                      remaining_people: List[Person]) -> List[Person]:
+        """Place every constrained unit whole, before the per-person passes; returns everyone else.
+
+        A unit follows any member that is already placed or on the continuity
+        list. Otherwise it takes its best-ranked section with room for all of
+        its waiting members that no apart partner occupies, then any such
+        section, then the one with the most room. Larger units go first.
+        """
+        groups = self.groups
+        if not groups.units:
+            return remaining_people
+        
+        waiting = {id(person) for person in remaining_people}
+        location = {person.id: section for section, section_people in assignments.items()
+                    for person in section_people if person.id in groups.unit_of}
+        continuity_section = self._continuity_sections()
+        unit_section: Dict[int, str] = {}
+        for person_id, section in location.items():
+            unit_section.setdefault(groups.unit_of[person_id], section)
+        counts = {section: len(assignments[section]) for section in self.sections}
+        
+        order = [unit for unit, members in enumerate(groups.units) if any(id(p) in waiting for p in members)]
+        self.rng.shuffle(order)
+        order.sort(key=lambda unit: -len(groups.units[unit]))
+        for unit in order:
+            members = [p for p in groups.units[unit] if id(p) in waiting]
+            section = unit_section.get(unit) or next(
+                (continuity_section[id(p)] for p in groups.units[unit] if id(p) in continuity_section), None)
+            if section is None:
+                blocked = {unit_section[other] for other in groups.apart[unit] if other in unit_section}
+                section = self._unit_section(unit, len(members), counts, blocked)
+            assignments[section].extend(members)
+            counts[section] += len(members)
+            unit_section[unit] = section
+            waiting.difference_update(id(p) for p in members)
+            if self.tracer is not None:
+                self.tracer.place_all(members, "group")
+        
+        self.lap("groups")
+        return [p for p in remaining_people if id(p) in waiting]
+    
+    def _unit_section(self, unit: int, size: int, counts: Dict[str, int], blocked: Collection[str]) -> str:
+        """Best section for a unit of this many people, avoiding the sections of its apart partners"""
+        preferences, vetoes = self.groups.choices(unit)
+        room = {section: self.limits[section].max - counts[section] for section in self.sections}
+        allowed = [section for section in self.sections if section not in blocked] or self.sections
+        for section in preferences:
+            if section in allowed and room[section] >= size:
+                return section
+        for section in allowed:
+            if section not in vetoes and room[section] >= size:
+                return section
+        # Nothing fits the whole unit: overfill the roomiest section, vetoed ones last
+        return max(allowed, key=lambda section: (section not in vetoes, room[section]))
+    
     def _assign_with_strict_limits(self, assignments: Dict[str, List[Person]], 
                                  remaining_people: List[Person]) -> Dict[str, List[Person]]:
         """Assignment strategy when section limits have priority 1"""
-        random.shuffle(remaining_people)  # Randomize for fairness
+        self.rng.shuffle(remaining_people)  # Randomize for fairness
+        capacity = SectionCapacity(self.sections, self.limits, assignments)
+        tracer = self.tracer
         
         for person in remaining_people:
-            assigned = False
-            
-            # Try first preference
-            if self._can_assign_to_section(assignments, person.option1):
-                assignments[person.option1].append(person)
-                assigned = True
-            # Try second preference
-            elif self._can_assign_to_section(assignments, person.option2):
-                assignments[person.option2].append(person)
-                assigned = True
-            # Try any available section (excluding veto if not "Ninguna")
-            else:
-                for section in self.sections:
-                    if ((person.veto == "Ninguna" or section != person.veto) and 
-                        self._can_assign_to_section(assignments, section)):
-                        assignments[section].append(person)
-                        assigned = True
+            # Preferences in ranked order
+            section = next((s for s in person.preferences if capacity.has_room(s)), None)
+            reason = "preference"
+            if section is None:
+                # Any available section (excluding vetoes), else force the least full section
+                section, reason = self._fallback_section(person, capacity)
+            assignments[section].append(person)
+            capacity.add(section)
+            if tracer is not None:
+                tracer.place(person, reason)
+                # The shuffle was the draw: every ranked section before this one was already full
+                for missed in person.preferences:
+                    if missed == section:
                         break
-            
-            # If still not assigned, force assign to least full section
-            if not assigned:
-                least_full = min(self.sections, key=lambda s: len(assignments[s]))
-                assignments[least_full].append(person)
-                
+                    tracer.lose_draw(person, missed)
+        
+        self.lap("strict_limits")
         return assignments
     
+    def _fallback_section(self, person: Person, capacity: SectionCapacity) -> Tuple[str, str]:
+        """First section with room that isn't vetoed ("fallback"), else the least full one ("forced")"""
+        section = capacity.first_open(vetoed_sections(person))
+        if section is not None:
+            return section, "fallback"
+        return capacity.least_full(), "forced"
+    
     def _assign_with_preference_priority(self, assignments: Dict[str, List[Person]], 
                                        remaining_people: List[Person]) -> Dict[str, List[Person]]:
         """Assignment strategy when preferences have higher priority"""
-        # Group people by first preference
-        first_preference_groups = {}
+        capacity = SectionCapacity(self.sections, self.limits, assignments)
+        remaining_people = self._assign_by_rank(assignments, remaining_people, capacity)
+        self.lap("ranked")
+        
+        # Assign remaining people to any available section, forcing the least full one if necessary
+        tracer = self.tracer
         for person in remaining_people:
-            if person.option1 not in first_preference_groups:
-                first_preference_groups[person.option1] = []
-            first_preference_groups[person.option1].append(person)
+            section, reason = self._fallback_section(person, capacity)
+            assignments[section].append(person)
+            capacity.add(section)
+            if tracer is not None:
+                tracer.place(person, reason)
         
-        # Assign by first preferences
-        for section, people_wanting_section in first_preference_groups.items():
-            available_spots = self.limits[section].max - len(assignments[section])
-            
-            if len(people_wanting_section) <= available_spots:
-                # Everyone gets their first choice
-                assignments[section].extend(people_wanting_section)
-                remaining_people = [p for p in remaining_people if p not in people_wanting_section]
-            else:
-                # Random selection for first preference
-                selected = random.sample(people_wanting_section, available_spots)
-                assignments[section].extend(selected)
-                remaining_people = [p for p in remaining_people if p not in selected]
+        self.lap("fallback")
+        return assignments
+    
+    def _assign_by_rank(self, assignments: Dict[str, List[Person]], remaining_people: List[Person],
+                        capacity: SectionCapacity) -> List[Person]:
+        """Satisfy preferences rank by rank; returns whoever none of their ranked sections could take.
+
+        Waiting people sit in demand buckets keyed by (rank, section). A bucket
+        that fits is placed whole and an oversubscribed one gets a random subset
+        of the free seats. Whoever misses out moves straight to the bucket of
+        their next ranked section that still has room, so full sections and
+        empty ranks are skipped instead of rescanning the pool once per rank.
+        """
+        buckets: Dict[int, Dict[str, List[Person]]] = {}
+        pending_ranks: List[int] = []
+        tracer = self.tracer
         
-        # Assign remaining people by second preference
-        for person in remaining_people[:]:
-            if self._can_assign_to_section(assignments, person.option2):
-                assignments[person.option2].append(person)
-                remaining_people.remove(person)
+        def enqueue(person: Person, start: int):
+            for rank in range(start, len(person.preferences)):
+                section = person.preferences[rank]
+                if capacity.has_room(section):
+                    if rank not in buckets:
+                        buckets[rank] = {}
+                        heapq.heappush(pending_ranks, rank)
+                    buckets[rank].setdefault(section, []).append(person)
+                    return
+                if tracer is not None:
+                    tracer.lose_draw(person, section)
         
-        # Assign remaining people to any available section
         for person in remaining_people:
-            assigned = False
-            for section in self.sections:
-                if ((person.veto == "Ninguna" or section != person.veto) and 
-                    self._can_assign_to_section(assignments, section)):
-                    assignments[section].append(person)
-                    assigned = True
-                    break
-            
-            # Force assign if necessary
-            if not assigned:
-                least_full = min(self.sections, key=lambda s: len(assignments[s]))
-                assignments[least_full].append(person)
+            enqueue(person, 0)
         
+        # Placed people are tracked by identity, not equality
+        placed = set()
+        while pending_ranks:
+            rank = heapq.heappop(pending_ranks)
+            for section, wanting in buckets.pop(rank).items():
+                available_spots = capacity.room(section)
+                if len(wanting) <= available_spots:
+                    selected = wanting
+                else:
+                    selected = self.rng.sample(wanting, available_spots)
+                assignments[section].extend(selected)
+                capacity.add(section, len(selected))
+                placed.update(id(p) for p in selected)
+                if tracer is not None:
+                    tracer.place_all(selected, "preference")
+                if len(selected) < len(wanting):
+                    for person in wanting:
+                        if id(person) not in placed:
+                            if tracer is not None:
+                                tracer.lose_draw(person, section)
+                            enqueue(person, rank + 1)
+        
+        return [p for p in remaining_people if id(p) not in placed]
+    
+    def _rebalance_minimums(self, assignments: Dict[str, List[Person]],
+                            pinned: set) -> Dict[str, List[Person]]:
+        """Move people into sections below their minimum, cheapest satisfaction loss first.
+
+        Candidate moves go into one heap keyed by the change in preference rank
+        and are validated lazily when popped. A person gets an entry per
+        preferred section that is short, plus one generic entry for "any short
+        section that isn't vetoed" resolved at pop time, so the heap holds
+        O(n) entries however many sections there are.
+        """
+        counts = {section: len(assignments[section]) for section in self.sections}
+        deficits = [s for s in self.sections if counts[s] < self.limits[s].min]
+        if not deficits:
+            return assignments
+        short = set(deficits)
+        
+        location = {}
+        heap = []
+        other_rank = self.max_rank
+        for section in self.sections:
+            if counts[section] <= self.limits[section].min:
+                continue
+            for person in assignments[section]:
+                if id(person) in pinned:
+                    continue
+                location[id(person)] = section
+                current_rank = self._preference_rank(person, section)
+                vetoes = vetoed_sections(person)
+                for target in person.preferences:
+                    if target in short and target != section and target not in vetoes:
+                        cost = self._preference_rank(person, target) - current_rank
+                        heapq.heappush(heap, (cost, len(heap), target, person))
+                heapq.heappush(heap, (other_rank - current_rank, len(heap), None, person))
+        
+        moved = {}
+        while heap and deficits:
+            _, _, target, person = heapq.heappop(heap)
+            source = location[id(person)]
+            if counts[source] <= self.limits[source].min:
+                continue
+            if target is None:
+                # Generic entry: the first short section this person can go to
+                vetoes = vetoed_sections(person)
+                target = next((s for s in deficits if s != source and s not in vetoes), None)
+                if target is None:
+                    continue
+            elif source == target or counts[target] >= self.limits[target].min:
+                continue
+            if self.tracer is not None:
+                self.tracer.move(person, source)
+            location[id(person)] = target
+            moved[id(person)] = person
+            counts[source] -= 1
+            counts[target] += 1
+            if counts[target] >= self.limits[target].min:
+                deficits.remove(target)
+        
+        if moved:
+            # Rebuild each section once instead of removing people one by one
+            # (a target only ever receives people, so nobody moves twice)
+            assignments = {
+                section: [p for p in section_people if id(p) not in moved]
+                for section, section_people in assignments.items()
+            }
+            for person_id, person in moved.items():
+                assignments[location[person_id]].append(person)
+        self.lap("rebalance")
         return assignments
     
-    def _can_assign_to_section(self, assignments: Dict[str, List[Person]], section: str) -> bool:
-        """Check if we can assign another person to this section"""
-        current_count = len(assignments[section])
-        return current_count < self.limits[section].max
+    def _preference_rank(self, person: Person, section: str) -> int:
+        """Position in the ranked preferences, then max_rank if unranked and max_rank + 1 if vetoed"""
+        rank = preference_rank(person, section)
+        if rank is not None:
+            return rank
+        return self.max_rank + 1 if section in person.vetoes else self.max_rank
     
-    def _find_person_by_name(self, name: str) -> Person:
-        """Find person by name in the people list"""
+    def assign_incremental(self, previous: Dict[str, List[Person]]) -> Tuple[Dict[str, List[Person]], List[Person]]:
+        """Warm start from a previous assignment (manual moves included).
+
+        Everyone whose preferences didn't change and whose continuity target (if
+        any) matches their current section keeps their place; only new or changed
+        people are placed, on the capacity left over. Returns the assignment and
+        the people that were (re)placed. People are matched to the previous
+        assignment by ID, or by name when their ID isn't in it.
+        """
+        if self.tracer is not None:
+            self.tracer.start()
+        continuity_section = self._continuity_sections()
+        previous_by_id = {person.id: (section, person)
+                          for section, section_people in previous.items() for person in section_people}
+        # Previous placements no current ID claims (a roster re-uploaded with new IDs) are matched by name
+        current_ids = {person.id for person in self.people}
+        previous_by_name: Dict[str, List[Tuple[str, Person]]] = {}
+        for section, old in previous_by_id.values():
+            if old.id not in current_ids:
+                previous_by_name.setdefault(old.name, []).append((section, old))
+        
+        assignments = {section: [] for section in self.sections}
+        affected = []
+        kept: Dict[str, str] = {}
         for person in self.people:
-            if person.name == name:
-                return person
-        return None
+            entry = previous_by_id.get(person.id)
+            if entry is None and previous_by_name.get(person.name):
+                entry = previous_by_name[person.name].pop(0)
+            section, old = entry or (None, None)
+            target = continuity_section.get(id(person))
+            if (old is None or section not in assignments
+                    or (old.preferences, old.vetoes) != (person.preferences, person.vetoes)
+                    or (target is not None and target != section)):
+                affected.append(person)
+            else:
+                kept[person.id] = section
+        
+        # A constrained unit is only kept as a whole, and only if it still meets its constraints
+        groups = self.groups
+        unsettled = {groups.unit_of[p.id] for p in affected if p.id in groups.unit_of}
+        if groups.units:
+            unit_sections = [{kept[p.id] for p in unit if p.id in kept} for unit in groups.units]
+            for unit, sections in enumerate(unit_sections):
+                if len(sections) > 1 or any(sections & unit_sections[other] for other in groups.apart[unit]):
+                    unsettled.add(unit)
+        for person in self.people:
+            if person.id not in kept:
+                continue
+            if groups.unit_of.get(person.id) in unsettled:
+                affected.append(person)
+            else:
+                assignments[kept[person.id]].append(person)
+                if self.tracer is not None:
+                    self.tracer.place(person, "kept")
+        self.lap("keep")
+        
+        if not affected:
+            return assignments, affected
+        
+        if self.strategy == "lexicographic":
+            return self._place_lexicographic(assignments, affected, continuity_section), affected
+        
+        remaining_people = []
+        for person in affected:
+            target = continuity_section.get(id(person))
+            if target is not None:
+                assignments[target].append(person)
+                if self.tracer is not None:
+                    self.tracer.place(person, "continuity")
+            else:
+                remaining_people.append(person)
+        return self.assign_remaining(assignments, remaining_people), affected
+    
+    def _continuity_sections(self) -> Dict[int, str]:
+        """Continuity target per person (by identity); the first matching item wins"""
+        continuity_section = {}
+        for continuity_item in self.continuity_list:
+            person = self._find_continuity_person(continuity_item)
+            if person and id(person) not in continuity_section and continuity_item.section in self.limits:
+                continuity_section[id(person)] = continuity_item.section
+        return continuity_section
+    
+    def class_key(self, person: Person, continuity_section: Dict[int, str]) -> Tuple:
+        """People with equal keys are interchangeable for the lexicographic strategy"""
+        return (continuity_section.get(id(person)), tuple(person.preferences), tuple(person.vetoes))
+    
+    def _assign_lexicographic(self) -> Dict[str, List[Person]]:
+        """Optimize the restrictions lexicographically in the configured priority order"""
+        assignments = {section: [] for section in self.sections}
+        continuity_section = self._continuity_sections()
+        self.lap("continuity")
+        return self._place_lexicographic(assignments, self.people, continuity_section)
+    
+    def _place_lexicographic(self, assignments: Dict[str, List[Person]], people: List[Person],
+                             continuity_section: Dict[int, str]) -> Dict[str, List[Person]]:
+        """Add people to a partial assignment; constrained units are placed whole first, since a flow could split them"""
+        free_people = self._place_groups(assignments, people)
+        occupied = {section: len(assignments[section]) for section in self.sections}
+        placed = self._solve_lexicographic(free_people, continuity_section, occupied)
+        for section in self.sections:
+            assignments[section].extend(placed[section])
+        return assignments
+    
+    def _solve_lexicographic(self, people: List[Person], continuity_section: Dict[int, str],
+                             occupied: Optional[Dict[str, int]] = None) -> Dict[str, List[Person]]:
+        """Place people with one min-cost flow; occupied seats are taken off the limits.
+
+        People with identical inputs are collapsed into classes and solved as one
+        min-cost flow. Each priority level gets a weight larger than the whole
+        range of every level below it, so the flow optimum is exactly the
+        lexicographic optimum: no lower level can ever buy back a unit lost on a
+        higher one. Vetoes sit above every configured level and are only broken
+        when nothing else fits; continuity overrides a veto. Ranks past the
+        second sit on one extra level below all configured ones, worth less the
+        further down the list they are.
+
+        A class only has direct edges to the sections it cares about (continuity
+        and its ranked preferences). Every other section is reached through a hub
+        shared by all classes with the same vetoes, so the graph grows with
+        classes + hubs x sections rather than classes x sections.
+        """
+        occupied = occupied or {}
+        bounds = {}
+        for section in self.sections:
+            limit = self.limits[section]
+            taken = occupied.get(section, 0)
+            bounds[section] = (max(limit.min - taken, 0), max(limit.max - taken, 0))
+        
+        classes: Dict[Tuple, List[Person]] = {}
+        for person in people:
+            classes.setdefault(self.class_key(person, continuity_section), []).append(person)
+        
+        # Step 3: Sort restrictions by priority; equal priorities share a level
+        restriction_order = sorted(RESTRICTIONS, key=self._get_priority)
+        levels = [list(group) for _, group in groupby(restriction_order, key=self._get_priority)]
+        
+        total = len(people)
+        base = 4 * total + sum(low for low, _ in bounds.values()) + 2
+        # Rank r >= 2 earns max_rank - r on the lowest level; its unit outweighs that level's whole range
+        max_rank = max((len(person.preferences) for person in people), default=0)
+        lower_ranks = max(max_rank - 2, 0) * total + 1
+        weights = {}
+        for depth, level in enumerate(reversed(levels)):
+            for restriction in level:
+                weights[restriction] = lower_ranks * base ** depth
+        veto_weight = lower_ranks * base ** len(levels)
+        
+        solver = MinCostFlow(2)
+        source, sink = 0, 1
+        section_nodes = {section: solver.add_node() for section in self.sections}
+        for section, node in section_nodes.items():
+            low, high = bounds[section]
+            # Filling up to min earns the limits reward, exceeding max pays it back
+            solver.add_edge(node, sink, min(low, high), -weights["sectionLimits"])
+            solver.add_edge(node, sink, abs(high - low), 0)
+            solver.add_edge(node, sink, total, weights["sectionLimits"])
+        
+        hubs: Dict[Tuple[str, ...], Tuple[int, Dict[str, int]]] = {}
+        def hub_for(vetoes: Tuple[str, ...]) -> int:
+            if vetoes not in hubs:
+                node = solver.add_node()
+                hubs[vetoes] = (node, {
+                    section: solver.add_edge(node, section_node, total, veto_weight if section in vetoes else 0)
+                    for section, section_node in section_nodes.items()
+                })
+            return hubs[vetoes][0]
+        
+        class_edges = []
+        rank_weights = [weights["firstPreference"], weights["secondPreference"]]
+        for (continuity, preferences, vetoes), members in classes.items():
+            node = solver.add_node()
+            solver.add_edge(source, node, len(members))
+            edges = {}
+            for section in (continuity,) + preferences:
+                if section is None or section in edges or section not in section_nodes:
+                    continue
+                gain = 0
+                if section == continuity:
+                    gain += weights["continuityList"]
+                elif section in vetoes:
+                    gain -= veto_weight
+                if section in preferences:
+                    rank = preferences.index(section)
+                    gain += rank_weights[rank] if rank < 2 else max_rank - rank
+                edges[section] = solver.add_edge(node, section_nodes[section], len(members), -gain)
+            hub_edge = solver.add_edge(node, hub_for(vetoes), len(members), 0)
+            class_edges.append((members, edges, continuity, vetoes, hub_edge))
+        self.lap("graph")
+        
+        solver.solve(source, sink, total)
+        self.lap("solve")
+        
+        assignments = {section: [] for section in self.sections}
+        hub_pools: Dict[Tuple[str, ...], List[Person]] = {}
+        tracer = self.tracer
+        for members, edges, continuity, vetoes, hub_edge in class_edges:
+            members = list(members)
+            self.rng.shuffle(members)  # Members of a class are interchangeable; split them fairly
+            start = 0
+            for section, edge_id in edges.items():
+                count = solver.flow(edge_id)
+                assignments[section].extend(members[start:start + count])
+                if tracer is not None:
+                    tracer.place_all(members[start:start + count],
+                                     "continuity" if section == continuity else "preference")
+                start += count
+            hub_pools.setdefault(vetoes, []).extend(members[start:start + solver.flow(hub_edge)])
+        
+        # Any split of a hub's flow is optimal; filling in class order keeps each class's counts fixed
+        for vetoes, pool in hub_pools.items():
+            start = 0
+            for section, edge_id in hubs[vetoes][1].items():
+                count = solver.flow(edge_id)
+                assignments[section].extend(pool[start:start + count])
+                if tracer is not None:
+                    tracer.place_all(pool[start:start + count], "forced" if section in vetoes else "fallback")
+                start += count
+        self.lap("distribute")
+        return assignments
+    
+    def _find_continuity_person(self, continuity_item: ContinuityItem) -> Optional[Person]:
+        """The person a continuity item refers to: by ID when it has one, else by name"""
+        if continuity_item.person_id is not None:
+            if self._people_by_id is None:
+                self._people_by_id = {person.id: person for person in self.people}
+            return self._people_by_id.get(continuity_item.person_id)
+        return self._find_person_by_name(continuity_item.name)
+    
+    def _find_person_by_name(self, name: str) -> Optional[Person]:
+        """Find a person by name, ignoring case, accents and extra whitespace"""
+        if self._name_index is None:
+            self._name_index = NameIndex(self.people)
+        return self._name_index.find(name)
     
     def _get_priority(self, restriction: str) -> int:
         """Get priority level for a restriction"""
@@ -140,7 +649,10 @@ class SectionAssigner:
         total_people = len(self.people)
         assigned = sum(len(section_people) for section_people in assignments.values())
         
-        satisfaction = SatisfactionStats()
+        # Stored assignments can hold longer ranked lists than the current roster
+        counted_rank = max((len(person.preferences) for section_people in assignments.values()
+                            for person in section_people), default=0)
+        satisfaction = SatisfactionStats(rankHistogram=[0] * max(self.max_rank, counted_rank))
         section_counts = {}
         within_limits = True
         
@@ -154,19 +666,24 @@ class SectionAssigner:
             
             # Calculate satisfaction
             for person in section_people:
-                if person.option1 == section:
-                    satisfaction.firstChoice += 1
-                elif person.option2 == section:
-                    satisfaction.secondChoice += 1
-                elif person.veto != "Ninguna" and person.veto == section:
-                    satisfaction.veto += 1
-                else:
-                    satisfaction.other += 1
+                category = satisfaction_category(person, section)
+                setattr(satisfaction, category, getattr(satisfaction, category) + 1)
+                rank = preference_rank(person, section)
+                if rank is not None:
+                    satisfaction.rankHistogram[rank] += 1
+        
+        group_violations = 0
+        if self.groups.units:
+            section_of = {person.id: section for section, section_people in assignments.items()
+                          for person in section_people}
+            group_violations = self.groups.violations(section_of)
         
+        self.lap("statistics")
         return AssignmentStatistics(
             totalPeople=total_people,
             assigned=assigned,
             satisfaction=satisfaction,
             sectionCounts=section_counts,
-            withinLimits=within_limits
+            withinLimits=within_limits,
+            groupViolations=group_violations
         )
\ No newline at end of file
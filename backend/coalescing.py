@@ -0,0 +1,33 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one in-flight computation.
+
+    The shared task is shielded, so a caller that goes away (e.g. a client
+    disconnect) does not cancel the work for the others still waiting.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, done: asyncio.Future):
+        if self._calls.get(key) is done:
+            del self._calls[key]
+        if not done.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            done.exception()
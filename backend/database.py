@@ -1,23 +1,190 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Optional, Dict, Any
+from pymongo import ASCENDING, DESCENDING, CursorType, DeleteMany, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+from pydantic import BaseModel
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
-from pathlib import Path
+import time
+import uuid
 from models import *
+from operation_log import compact_snapshot, SNAPSHOT_INTERVAL
 
-# Load environment variables
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Collections holding a session's data, in archive order: sessions first, so an
+# import knows which sessions it skips before their history arrives
+ARCHIVE_COLLECTIONS = ["sessions", "assignments", "operations", "snapshots"]
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Reads record last_accessed at most this often (seconds) per session and worker
+TOUCH_INTERVAL = 300
+
+# Sessions remembered for the touch throttle before the memory is reset
+TOUCH_MEMORY = 100_000
+
+# Bytes kept in the capped collection that relays SSE events between workers
+EVENT_LOG_BYTES = 16 * 1024 * 1024
+
+class DatabaseSettings(BaseModel):
+    """MongoDB connection settings, read from the environment when the client is created"""
+    mongo_url: str
+    db_name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 5000
+    compressors: Optional[str] = None  # e.g. "zstd,snappy,zlib"
+    transactions: Optional[bool] = None  # None = detect replica set / sharded cluster
+    
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        env = os.environ
+        optional_int = lambda name: int(env[name]) if env.get(name) else None
+        return cls(
+            mongo_url=env['MONGO_URL'],
+            db_name=env['DB_NAME'],
+            max_pool_size=int(env.get('MONGO_MAX_POOL_SIZE', 100)),
+            min_pool_size=int(env.get('MONGO_MIN_POOL_SIZE', 0)),
+            max_idle_time_ms=optional_int('MONGO_MAX_IDLE_TIME_MS'),
+            server_selection_timeout_ms=int(env.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            connect_timeout_ms=int(env.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+            compressors=env.get('MONGO_COMPRESSORS') or None,
+            transactions={"on": True, "off": False}.get(env.get('MONGO_TRANSACTIONS', 'auto'))
+        )
+    
+    def client_options(self) -> Dict[str, Any]:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+        }
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.compressors:
+            options["compressors"] = self.compressors
+        return options
+
+class _Rollback(Exception):
+    """Raised inside a grouped write to undo it and report failure"""
 
 class Database:
-    def __init__(self):
-        self.sessions = db.sessions
-        self.assignments = db.assignments
+    def __init__(self, settings: Optional[DatabaseSettings] = None):
+        self.settings = settings
+        self.client = None
+        self.db = None
+        self._transactions: Optional[bool] = None
+        self._touched: Dict[str, float] = {}
+    
+    # Connection Lifecycle
+    def connect(self, settings: Optional[DatabaseSettings] = None, client=None):
+        """Create the client if it doesn't exist yet (a ready-made client can be injected)"""
+        if self.client is not None:
+            return
+        self.settings = settings or self.settings or DatabaseSettings.from_env()
+        if client is None:
+            client = AsyncIOMotorClient(self.settings.mongo_url, **self.settings.client_options())
+        self.client = client
+        self.db = client[self.settings.db_name]
+    
+    def close(self):
+        """Close the client and its connection pool"""
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+        self._transactions = None
+    
+    async def ping(self) -> bool:
+        """Round trip to the server; used by the readiness probe"""
+        try:
+            await self._get_db().command("ping")
+            return True
+        except Exception:
+            return False
+    
+    async def warm_up(self):
+        """Open the first pooled connection and create indexes ahead of the first request"""
+        await self._get_db().command("ping")
+        await self.ensure_indexes()
+    
+    def _get_db(self):
+        if self.db is None:
+            self.connect()
+        return self.db
+    
+    async def _transactions_supported(self) -> bool:
+        """Whether multi-document transactions are available; asked once per client"""
+        if self._transactions is None:
+            db = self._get_db()
+            supported = self.settings.transactions
+            if supported is None:
+                try:
+                    hello = await db.command("hello")
+                    # Standalone servers have neither a replica set name nor the mongos marker
+                    supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+                except Exception:
+                    supported = False
+            self._transactions = supported
+        return self._transactions
+    
+    async def _grouped_write(self, write):
+        """Run write(session) as one transaction where supported, else with session=None.
+
+        write must leave nothing half-done when it runs without a transaction:
+        it gets session=None then and has to compensate for its own partial writes.
+        Raising _Rollback undoes the transaction and makes this return False.
+        """
+        try:
+            if not await self._transactions_supported():
+                await write(None)
+            else:
+                async with await self.client.start_session() as session:
+                    await session.with_transaction(write)
+        except _Rollback:
+            return False
+        return True
+    
+    @property
+    def sessions(self):
+        return self._get_db().sessions
+    
+    @property
+    def assignments(self):
+        return self._get_db().assignments
+    
+    @property
+    def operations(self):
+        return self._get_db().operations
+    
+    @property
+    def snapshots(self):
+        return self._get_db().snapshots
+    
+    @property
+    def locks(self):
+        return self._get_db().locks
+    
+    @property
+    def events(self):
+        return self._get_db().events
+    
+    async def ensure_indexes(self):
+        """Create the indexes the API relies on"""
+        # The unique seq doubles as the guard against two concurrent edits
+        await self.operations.create_index(
+            [("session_id", ASCENDING), ("assignment_id", ASCENDING), ("seq", ASCENDING)], unique=True
+        )
+        await self.snapshots.create_index(
+            [("session_id", ASCENDING), ("assignment_id", ASCENDING), ("seq", DESCENDING)]
+        )
+        # Locks left behind by a crashed worker are reaped by Mongo
+        await self.locks.create_index("expires_at", expireAfterSeconds=0)
+        # Range scans for the analytics trends
+        await self.assignments.create_index("created_at")
+        # Every request finds its session by ID; the expiry sweep scans by access time
+        await self.sessions.create_index("session_id")
+        await self.sessions.create_index("last_accessed")
+        await self.assignments.create_index("session_id")
     
     # Session Management
     async def create_session(self, session_id: str) -> bool:
@@ -26,34 +193,109 @@ class Database:
         result = await self.sessions.insert_one(session_data.dict())
         return result.inserted_id is not None
     
+    def _touch_due(self, session_id: str) -> bool:
+        """Whether a read of this session should also record the access (see TOUCH_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._touched.get(session_id, float("-inf")) < TOUCH_INTERVAL:
+            return False
+        if len(self._touched) >= TOUCH_MEMORY:
+            self._touched.clear()
+        self._touched[session_id] = now
+        return True
+    
+    async def _find_session(self, session_id: str, projection: Optional[Dict[str, Any]] = None):
+        """find_one on a session that records the access in the same round trip when it is due"""
+        if self._touch_due(session_id):
+            return await self.sessions.find_one_and_update(
+                {"session_id": session_id}, {"$set": _accessed({})}, projection=projection
+            )
+        return await self.sessions.find_one({"session_id": session_id}, projection)
+    
+    async def touch(self, session_id: str):
+        """Record an access to a session read without _find_session"""
+        if self._touch_due(session_id):
+            await self.sessions.update_one({"session_id": session_id}, {"$set": _accessed({})})
+    
     async def get_session(self, session_id: str) -> Optional[SessionData]:
         """Get session data"""
-        session_doc = await self.sessions.find_one({"session_id": session_id})
+        session_doc = await self._find_session(session_id)
         if session_doc:
-            return SessionData(**session_doc)
+            session = SessionData(**session_doc)
+            await self._backfill_ids(session_doc, session)
+            return session
         return None
     
+    async def _backfill_ids(self, session_doc: Dict[str, Any], session: SessionData):
+        """Persist the IDs generated for people/continuity items saved before IDs existed"""
+        update_data, unchanged = {}, {}
+        if any("id" not in doc for doc in session_doc.get("people") or []):
+            update_data["people"] = [person.dict() for person in session.people]
+            unchanged["people"] = session_doc["people"]
+        if any("id" not in doc for doc in session_doc.get("continuity_list") or []):
+            update_data["continuity_list"] = [item.dict() for item in session.continuity_list]
+            unchanged["continuity_list"] = session_doc["continuity_list"]
+        current = session_doc.get("current_assignment")
+        if current and _missing_person_ids(current["assignments"]):
+            # Assigned people get the ID of the registered person with the same name
+            sections = _fill_person_ids(current["assignments"], session.people)
+            session.current_assignment = Assignment(**{**current, "assignments": sections})
+            update_data["current_assignment.assignments"] = sections
+            unchanged["current_assignment.assignments"] = current["assignments"]
+        if not update_data:
+            return
+        # Only if nobody changed the lists in the meantime
+        await self.sessions.update_one(
+            {"session_id": session.session_id, **unchanged},
+            {"$set": update_data}
+        )
+    
     async def update_session(self, session_id: str, update_data: Dict[str, Any]) -> bool:
         """Update session data"""
         result = await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": update_data}
+            {"$set": _accessed(update_data)}
         )
         return result.modified_count > 0
     
     # People Management
     async def save_people(self, session_id: str, people: List[PersonCreate]) -> bool:
         """Save people list for a session"""
-        people_objects = [Person(**person.dict(), session_id=session_id) for person in people]
+        people_objects = await self.stable_people(session_id, people)
         people_dicts = [person.dict() for person in people_objects]
         
         await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": {"people": people_dicts}},
+            {"$set": _accessed({"people": people_dicts})},
             upsert=True
         )
         return True
     
+    async def stable_people(self, session_id: str, people: List[PersonCreate]) -> List[Person]:
+        """People of a re-uploaded roster, keeping the IDs already stored for them.
+
+        An explicit id wins; otherwise a person takes the ID of a stored person
+        with the same name (in order, for repeated names), so constraints,
+        continuity items and incremental runs keep pointing at them.
+        """
+        stored: Dict[str, List[str]] = {}
+        session_doc = await self._find_session(session_id, {"people.id": 1, "people.name": 1})
+        for person in (session_doc or {}).get("people") or []:
+            stored.setdefault(person.get("name"), []).append(person.get("id"))
+        taken = {person.id for person in people if person.id}
+        
+        result = []
+        for person in people:
+            values = person.dict()
+            if not values["id"]:
+                free = [person_id for person_id in stored.get(person.name, []) if person_id not in taken]
+                if free:
+                    values["id"] = free[0]
+                    taken.add(free[0])
+                else:
+                    del values["id"]
+            result.append(Person(**values, session_id=session_id))
+        return result
+    
     async def get_people(self, session_id: str) -> List[Person]:
         """Get people list for a session"""
         session = await self.get_session(session_id)
@@ -61,13 +303,55 @@ class Database:
             return session.people
         return []
     
+    async def get_people_field(self, session_id: str, field: str) -> List[Any]:
+        """One field of every person in a session, read with a projection instead of loading the people"""
+        session_doc = await self._find_session(session_id, {f"people.{field}": 1})
+        if not session_doc:
+            return []
+        return [person.get(field) for person in session_doc.get("people") or []]
+    
+    async def patch_people(self, session_id: str, patch: PeoplePatch) -> Optional[List[str]]:
+        """Add, update and remove individual people; returns the new IDs or None if the session doesn't exist"""
+        added = [Person(**person.dict(exclude_none=True), session_id=session_id) for person in patch.add]
+        updates = await self._merge_choice_updates(session_id, patch.update)
+        found = await self._patch_array(session_id, "people", [person.dict() for person in added],
+                                        updates, patch.remove)
+        return [person.id for person in added] if found else None
+    
+    async def _merge_choice_updates(self, session_id: str, updates: List[PersonUpdate]) -> List[PersonUpdate]:
+        """Updates that change some choice fields are merged into the stored person and rewrite all of them.
+
+        Legacy option1/option2/veto updates rebuild the ranked lists, and a new
+        list is checked against the stored other one; ValueError if a section
+        would end up both ranked and vetoed.
+        """
+        def partial(update: PersonUpdate) -> bool:
+            fields = update.model_fields_set
+            return bool(fields & set(CHOICE_FIELDS)) and not {"preferences", "vetoes"} <= fields
+        
+        if not any(partial(update) for update in updates):
+            return updates
+        session_doc = await self.sessions.find_one(
+            {"session_id": session_id}, {f"people.{field}": 1 for field in ["id", "name", *CHOICE_FIELDS]}
+        )
+        stored = {person.get("id"): person for person in (session_doc or {}).get("people") or []}
+        synced = []
+        for update in updates:
+            if partial(update) and update.id in stored:
+                person = Person(**{**stored[update.id], **update.dict(exclude_unset=True)})
+                check_choice_overlap(person.preferences, person.vetoes)
+                update = PersonUpdate(**update.dict(exclude_unset=True, exclude=set(CHOICE_FIELDS)),
+                                      **{field: getattr(person, field) for field in CHOICE_FIELDS})
+            synced.append(update)
+        return synced
+    
     # Section Limits Management
     async def save_limits(self, session_id: str, limits: SectionLimitsCreate) -> bool:
         """Save section limits for a session"""
         limits_obj = SectionLimits(session_id=session_id, limits=limits.limits)
         await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": {"limits": limits_obj.dict()}},
+            {"$set": _accessed({"limits": limits_obj.dict()})},
             upsert=True
         )
         return True
@@ -79,6 +363,23 @@ class Database:
             return session.limits
         return None
     
+    # Section Set Management
+    async def save_sections(self, session_id: str, sections: List[str]) -> bool:
+        """Save the section names of a session"""
+        await self.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": _accessed({"sections": sections})},
+            upsert=True
+        )
+        return True
+    
+    async def get_sections(self, session_id: str) -> List[str]:
+        """Get the section names of a session; sessions saved before section sets existed use the defaults"""
+        session_doc = await self._find_session(session_id, {"sections": 1})
+        if session_doc and session_doc.get("sections"):
+            return session_doc["sections"]
+        return list(SECTIONS)
+    
     # Continuity List Management
     async def save_continuity_list(self, session_id: str, continuity_list: List[ContinuityItemCreate]) -> bool:
         """Save continuity list for a session"""
@@ -87,7 +388,7 @@ class Database:
         
         await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": {"continuity_list": continuity_dicts}},
+            {"$set": _accessed({"continuity_list": continuity_dicts})},
             upsert=True
         )
         return True
@@ -99,13 +400,68 @@ class Database:
             return session.continuity_list
         return []
     
+    async def patch_continuity_list(self, session_id: str, patch: ContinuityPatch) -> Optional[List[str]]:
+        """Add, update and remove individual continuity items; returns the new IDs or None if the session doesn't exist"""
+        added = [ContinuityItem(**item.dict(), session_id=session_id) for item in patch.add]
+        found = await self._patch_array(session_id, "continuity_list", [item.dict() for item in added],
+                                        patch.update, patch.remove)
+        return [item.id for item in added] if found else None
+    
+    # Group Constraint Management
+    async def save_constraints(self, session_id: str, constraints: List[GroupConstraintCreate]) -> bool:
+        """Save the together/apart constraints of a session"""
+        constraint_objects = [GroupConstraint(**item.dict(), session_id=session_id) for item in constraints]
+        await self.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": _accessed({"constraints": [item.dict() for item in constraint_objects]})},
+            upsert=True
+        )
+        return True
+    
+    async def get_constraints(self, session_id: str) -> List[GroupConstraint]:
+        """Get the together/apart constraints of a session"""
+        session_doc = await self._find_session(session_id, {"constraints": 1})
+        if session_doc and session_doc.get("constraints"):
+            return [GroupConstraint(**item) for item in session_doc["constraints"]]
+        return []
+    
+    async def _patch_array(self, session_id: str, field: str, add: List[Dict[str, Any]],
+                           update: List[BaseModel], remove: List[str]) -> bool:
+        """Apply element-level changes to an embedded array in one ordered bulk write.
+
+        Updates address elements by ID through array filters, so the write only
+        carries the changed fields, never the whole array.
+        """
+        session_filter = {"session_id": session_id}
+        operations = []
+        if remove:
+            operations.append(UpdateOne(session_filter, {"$pull": {field: {"id": {"$in": remove}}}}))
+        changes, array_filters = {}, []
+        for index, item in enumerate(update):
+            values = item.dict(exclude_unset=True, exclude={"id"})
+            if not values:
+                continue
+            for name, value in values.items():
+                changes[f"{field}.$[e{index}].{name}"] = value
+            array_filters.append({f"e{index}.id": item.id})
+        if changes:
+            operations.append(UpdateOne(session_filter, {"$set": changes}, array_filters=array_filters))
+        if add:
+            operations.append(UpdateOne(session_filter, {"$push": {field: {"$each": add}}}))
+        
+        if not operations:
+            return await self.sessions.count_documents(session_filter, limit=1) > 0
+        operations.append(UpdateOne(session_filter, {"$set": _accessed({})}))
+        result = await self.sessions.bulk_write(operations, ordered=True)
+        return result.matched_count > 0
+    
     # Restriction Priorities Management
     async def save_priorities(self, session_id: str, priorities: RestrictionPrioritiesCreate) -> bool:
         """Save restriction priorities for a session"""
         priorities_obj = RestrictionPriorities(session_id=session_id, priorities=priorities.priorities)
         await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": {"priorities": priorities_obj.dict()}},
+            {"$set": _accessed({"priorities": priorities_obj.dict()})},
             upsert=True
         )
         return True
@@ -117,19 +473,54 @@ class Database:
             return session.priorities
         return None
     
+    # Whole Configuration
+    @staticmethod
+    def configuration_fields(people: List[Person], limits: SectionLimits, continuity_list: List[ContinuityItem],
+                             priorities: Optional[RestrictionPriorities],
+                             sections: Optional[List[str]] = None,
+                             constraints: Optional[List[GroupConstraint]] = None) -> Dict[str, Any]:
+        """Session fields for a whole configuration, to be written together with its assignment"""
+        fields = {
+            "people": [person.dict() for person in people],
+            "limits": limits.dict(),
+            "continuity_list": [item.dict() for item in continuity_list]
+        }
+        if priorities is not None:
+            fields["priorities"] = priorities.dict()
+        if sections is not None:
+            fields["sections"] = sections
+        if constraints is not None:
+            fields["constraints"] = [item.dict() for item in constraints]
+        return fields
+    
     # Assignment Management
-    async def save_assignment(self, assignment: Assignment) -> bool:
-        """Save assignment result"""
-        # Save to assignments collection
-        result = await self.assignments.insert_one(assignment.dict())
+    async def save_assignment(self, assignment: Assignment,
+                              configuration: Optional[Dict[str, Any]] = None) -> bool:
+        """Add the assignment to the history and make it the current one, in one transaction where supported.
+
+        configuration (see configuration_fields) is written by the same session
+        update, so a setup and its result are saved together or not at all.
+        """
+        document = assignment.dict()
+        session_fields = {**(configuration or {}), "current_assignment": document}
         
-        # Update session with current assignment
-        await self.sessions.update_one(
-            {"session_id": assignment.session_id},
-            {"$set": {"current_assignment": assignment.dict()}}
-        )
+        async def write(session):
+            # insert_one adds an _id to the document it is given
+            await self.assignments.insert_one(dict(document), session=session)
+            try:
+                await self.sessions.update_one(
+                    {"session_id": assignment.session_id},
+                    {"$set": _accessed(session_fields)},
+                    upsert=configuration is not None,
+                    session=session
+                )
+            except Exception:
+                if session is None:
+                    # No transaction to abort: take the history entry back out
+                    await self.assignments.delete_one({"id": assignment.id})
+                raise
         
-        return result.inserted_id is not None
+        return await self._grouped_write(write)
     
     async def get_assignment(self, session_id: str) -> Optional[Assignment]:
         """Get latest assignment for a session"""
@@ -142,6 +533,46 @@ class Database:
                 return Assignment(**session.current_assignment)
         return None
     
+    async def get_assignment_summary(self, session_id: str, names: bool) -> Optional[Dict[str, Any]]:
+        """The current assignment without its person documents: metadata, statistics and optionally names per section"""
+        summary = {
+            "_id": 0,
+            "id": "$current_assignment.id",
+            "session_id": "$current_assignment.session_id",
+            "created_at": "$current_assignment.created_at",
+            "statistics": "$current_assignment.statistics"
+        }
+        if names:
+            # Only the names leave the database, not the full person documents
+            summary["assignments"] = {"$arrayToObject": {"$map": {
+                "input": {"$objectToArray": "$current_assignment.assignments"},
+                "as": "section",
+                "in": {"k": "$$section.k", "v": "$$section.v.name"}
+            }}}
+        pipeline = [
+            {"$match": {"session_id": session_id, "current_assignment": {"$ne": None}}},
+            {"$project": summary}
+        ]
+        result = await self.sessions.aggregate(pipeline).to_list(length=1)
+        if result:
+            await self.touch(session_id)
+        return result[0] if result else None
+    
+    async def get_assignment_sections(self, session_id: str) -> Optional[List[str]]:
+        """Get the section names of the current assignment without loading its people"""
+        session_doc = await self._find_session(session_id, {"current_assignment.statistics.sectionCounts": 1})
+        if not session_doc or not session_doc.get("current_assignment"):
+            return None
+        return list(session_doc["current_assignment"]["statistics"]["sectionCounts"])
+    
+    async def get_assignment_section(self, session_id: str, section: str) -> List[Dict[str, Any]]:
+        """Get the raw person documents of one section of the current assignment"""
+        field = f"current_assignment.assignments.{section}"
+        session_doc = await self.sessions.find_one({"session_id": session_id}, {field: 1})
+        if not session_doc:
+            return []
+        return session_doc.get("current_assignment", {}).get("assignments", {}).get(section, [])
+    
     async def update_assignment(self, session_id: str, assignments: Dict[str, List[Person]], 
                               statistics: AssignmentStatistics) -> bool:
         """Update assignment after manual changes"""
@@ -162,22 +593,351 @@ class Database:
         
         result = await self.sessions.update_one(
             {"session_id": session_id},
-            {"$set": update_data}
+            {"$set": _accessed(update_data)}
         )
         
         return result.modified_count > 0
     
+    # Operation Log (undo/redo)
+    async def record_move(self, assignment: Assignment, operation: AssignmentOperation,
+                          person: Person, statistics: AssignmentStatistics) -> bool:
+        """Append a move to the log and apply it; False if another edit got there first"""
+        scope = {"session_id": operation.session_id, "assignment_id": operation.assignment_id}
+        discard_redo = assignment.op_head > assignment.op_seq
+        log_writes = [InsertOne(operation.dict())]
+        if discard_redo:
+            # A new edit discards the redo history
+            log_writes.insert(0, DeleteMany({**scope, "seq": {"$gt": assignment.op_seq}}))
+        
+        async def write(session):
+            if discard_redo:
+                await self.snapshots.delete_many({**scope, "seq": {"$gt": assignment.op_seq}}, session=session)
+            try:
+                await self.operations.bulk_write(log_writes, ordered=True, session=session)
+            except BulkWriteError as error:
+                if any(e.get("code") == 11000 for e in error.details.get("writeErrors", [])):
+                    raise _Rollback()
+                raise
+            applied = await self.apply_move(
+                operation.session_id, operation.assignment_id, assignment.op_seq, operation.seq, operation.seq,
+                person, operation.from_section, operation.to_section, statistics, session=session
+            )
+            if not applied:
+                if session is None:
+                    await self.operations.delete_one({**scope, "seq": operation.seq})
+                raise _Rollback()
+            if operation.seq % SNAPSHOT_INTERVAL == 0:
+                await self.snapshots.insert_one({
+                    **scope,
+                    "seq": operation.seq,
+                    "sections": compact_snapshot(assignment.assignments)
+                }, session=session)
+        
+        return await self._grouped_write(write)
+    
+    async def apply_move(self, session_id: str, assignment_id: str, expected_seq: int, new_seq: int,
+                         new_head: int, person: Person, from_section: str, to_section: str,
+                         statistics: AssignmentStatistics, session=None) -> bool:
+        """Move one person inside current_assignment without rewriting the other sections"""
+        # Documents written before the log existed have no op_seq yet
+        seq_filter = {"$in": [0, None]} if expected_seq == 0 else expected_seq
+        result = await self.sessions.update_one(
+            {
+                "session_id": session_id,
+                "current_assignment.id": assignment_id,
+                "current_assignment.op_seq": seq_filter
+            },
+            {
+                "$pull": {f"current_assignment.assignments.{from_section}": {"id": person.id}},
+                "$push": {f"current_assignment.assignments.{to_section}": person.dict()},
+                "$set": _accessed({
+                    "current_assignment.statistics": statistics.dict(),
+                    "current_assignment.op_seq": new_seq,
+                    "current_assignment.op_head": new_head
+                })
+            },
+            session=session
+        )
+        return result.modified_count > 0
+    
+    async def get_operation(self, session_id: str, assignment_id: str, seq: int) -> Optional[AssignmentOperation]:
+        """Get one logged operation"""
+        operation_doc = await self.operations.find_one(
+            {"session_id": session_id, "assignment_id": assignment_id, "seq": seq}
+        )
+        if operation_doc:
+            return AssignmentOperation(**operation_doc)
+        return None
+    
+    async def get_operations(self, session_id: str, assignment_id: str,
+                             after_seq: int = 0, upto_seq: Optional[int] = None) -> List[AssignmentOperation]:
+        """Get logged operations in (after_seq, upto_seq], in order"""
+        seq_range = {"$gt": after_seq}
+        if upto_seq is not None:
+            seq_range["$lte"] = upto_seq
+        cursor = self.operations.find(
+            {"session_id": session_id, "assignment_id": assignment_id, "seq": seq_range}
+        ).sort("seq", ASCENDING)
+        return [AssignmentOperation(**doc) async for doc in cursor]
+    
+    async def get_nearest_snapshot(self, session_id: str, assignment_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        """Get the latest compacted snapshot at or before seq"""
+        return await self.snapshots.find_one(
+            {"session_id": session_id, "assignment_id": assignment_id, "seq": {"$lte": seq}},
+            sort=[("seq", DESCENDING)]
+        )
+    
+    async def get_assignment_record(self, assignment_id: str) -> Optional[Assignment]:
+        """Get an assignment as originally computed, from the history collection"""
+        assignment_doc = await self.assignments.find_one({"id": assignment_id})
+        if not assignment_doc:
+            return None
+        if _missing_person_ids(assignment_doc["assignments"]):
+            # Take the IDs the current assignment was backfilled with, so logs and snapshots line up
+            session = await self.get_session(assignment_doc["session_id"])
+            people = list(session.people) if session else []
+            if session and session.current_assignment and session.current_assignment.id == assignment_id:
+                people = [p for section_people in session.current_assignment.assignments.values()
+                          for p in section_people]
+            sections = _fill_person_ids(assignment_doc["assignments"], people)
+            await self.assignments.update_one({"id": assignment_id}, {"$set": {"assignments": sections}})
+            assignment_doc["assignments"] = sections
+        return Assignment(**assignment_doc)
+    
+    # Cross-worker Locks
+    async def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take a named lock unless another owner holds an unexpired one"""
+        now = datetime.utcnow()
+        try:
+            # If the lock is held by someone else the filter misses and the upsert hits the unique _id
+            await self.locks.update_one(
+                {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    async def release_lock(self, name: str, owner: str) -> bool:
+        """Release a lock if we still own it"""
+        result = await self.locks.delete_one({"_id": name, "owner": owner})
+        return result.deleted_count > 0
+    
+    # Event Relay
+    async def ensure_event_log(self):
+        """Create the capped collection the event relay appends to and tails"""
+        try:
+            await self._get_db().create_collection("events", capped=True, size=EVENT_LOG_BYTES)
+        except CollectionInvalid:
+            pass  # Another worker created it
+    
+    async def append_event(self, event: Dict[str, Any]):
+        await self.events.insert_one(event)
+    
+    async def last_event_id(self) -> Optional[Any]:
+        """ID of the newest event, where a relay starting now begins"""
+        event = await self.events.find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+        return event["_id"] if event else None
+    
+    def tail_events(self, after_id: Optional[Any] = None):
+        """Awaiting cursor over the events after after_id, in insertion order"""
+        query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+        return self.events.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+    
+    # Cross-session Analytics
+    async def demand_summary(self) -> Dict[str, Any]:
+        """Preference and veto counts per section over every session, computed in Mongo"""
+        def count_by(expression: Any) -> List[Dict[str, Any]]:
+            return [{"$group": {"_id": expression, "count": {"$sum": 1}}}]
+        
+        # People saved before ranked lists existed only have option1/option2/veto
+        has_lists = {"$isArray": "$people.preferences"}
+        pipeline = [
+            {"$project": {"people.option1": 1, "people.option2": 1, "people.veto": 1,
+                          "people.preferences": 1, "people.vetoes": 1}},
+            {"$unwind": "$people"},
+            {"$facet": {
+                "firstChoice": count_by("$people.option1"),
+                "secondChoice": count_by(
+                    {"$cond": [has_lists, {"$arrayElemAt": ["$people.preferences", 1]}, "$people.option2"]}
+                ),
+                "veto": [
+                    # $unwind treats the single legacy veto as a one-element list
+                    {"$project": {"veto": {"$ifNull": ["$people.vetoes", "$people.veto"]}}},
+                    {"$unwind": "$veto"},
+                    *count_by("$veto")
+                ],
+                "sessions": [{"$group": {"_id": "$_id"}}, {"$count": "count"}]
+            }}
+        ]
+        result = await self.sessions.aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
+        summary = {
+            name: {row["_id"]: row["count"] for row in facets.get(name, []) if row["_id"] is not None}
+            for name in ("firstChoice", "secondChoice", "veto")
+        }
+        summary["sessions"] = facets["sessions"][0]["count"] if facets.get("sessions") else 0
+        return summary
+    
+    async def assignment_trends(self, date_format: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Per-period averages of assignment satisfaction and limit violations, computed in Mongo"""
+        def rate(field: str) -> Dict[str, Any]:
+            return {"$avg": {"$cond": [
+                {"$gt": ["$statistics.totalPeople", 0]},
+                {"$divide": [f"$statistics.satisfaction.{field}", "$statistics.totalPeople"]},
+                None
+            ]}}
+        
+        pipeline = []
+        if since is not None:
+            pipeline.append({"$match": {"created_at": {"$gte": since}}})
+        pipeline += [
+            {"$project": {
+                "period": {"$dateToString": {"format": date_format, "date": "$created_at"}},
+                "statistics": 1
+            }},
+            {"$group": {
+                "_id": "$period",
+                "assignments": {"$sum": 1},
+                "people": {"$sum": "$statistics.totalPeople"},
+                "firstChoiceRate": rate("firstChoice"),
+                "secondChoiceRate": rate("secondChoice"),
+                "vetoRate": rate("veto"),
+                "limitViolations": {"$sum": {"$cond": ["$statistics.withinLimits", 0, 1]}}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        return await self.assignments.aggregate(pipeline).to_list(length=None)
+    
+    # Session Archives
+    async def iter_archive(self, session_ids: Optional[List[str]] = None,
+                           batch_size: int = 1000) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Every document of the given sessions (all if None) as (collection, batch), one collection after another"""
+        query = {} if session_ids is None else {"session_id": {"$in": session_ids}}
+        db = self._get_db()
+        for name in ARCHIVE_COLLECTIONS:
+            batch = []
+            async for doc in db[name].find(query, {"_id": 0}, batch_size=batch_size):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    yield name, batch
+                    batch = []
+            if batch:
+                yield name, batch
+    
+    async def import_archive(self, batches: AsyncIterator[Tuple[str, List[Dict[str, Any]]]],
+                             replace: bool = False) -> ArchiveImportResult:
+        """Insert archived documents batch by batch with unordered insert_many.
+
+        Sessions that already exist are skipped together with their history,
+        or deleted first when replace is set. Batches are written as they
+        arrive, so an archive that breaks halfway leaves the earlier ones in.
+        """
+        db = self._get_db()
+        inserted = {name: 0 for name in ARCHIVE_COLLECTIONS}
+        skipped = set()
+        async for name, docs in batches:
+            if name not in ARCHIVE_COLLECTIONS:
+                raise ValueError(f"colección desconocida: {name}")
+            if name == "sessions":
+                # An archived season gets a full expiry period from the day it comes back
+                accessed = _accessed({})
+                for doc in docs:
+                    doc.update(accessed)
+                ids = [doc["session_id"] for doc in docs]
+                existing = [doc["session_id"] async for doc in
+                            self.sessions.find({"session_id": {"$in": ids}}, {"session_id": 1})]
+                if replace:
+                    await self.delete_sessions(existing)
+                else:
+                    skipped.update(existing)
+            docs = [doc for doc in docs if doc.get("session_id") not in skipped]
+            if not docs:
+                continue
+            try:
+                result = await db[name].insert_many(docs, ordered=False)
+                inserted[name] += len(result.inserted_ids)
+            except BulkWriteError as error:
+                # Operations already logged under the same seq are left as they are
+                if any(e.get("code") != 11000 for e in error.details.get("writeErrors", [])):
+                    raise
+                inserted[name] += error.details.get("nInserted", 0)
+        return ArchiveImportResult(inserted=inserted, skipped_sessions=len(skipped))
+    
     # Utility Methods
     async def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its data"""
-        result = await self.sessions.delete_one({"session_id": session_id})
-        await self.assignments.delete_many({"session_id": session_id})
-        return result.deleted_count > 0
+        return await self.delete_sessions([session_id]) > 0
+    
+    async def delete_sessions(self, session_ids: List[str]) -> int:
+        """Delete several sessions and all their data; returns how many sessions existed"""
+        if not session_ids:
+            return 0
+        result = await self.sessions.delete_many({"session_id": {"$in": session_ids}})
+        await self._delete_history(session_ids)
+        return result.deleted_count
+    
+    async def _delete_history(self, session_ids: List[str]) -> Dict[str, int]:
+        """Delete the assignment history, operation log and snapshots of sessions; documents deleted per collection"""
+        query = {"session_id": {"$in": session_ids}}
+        db = self._get_db()
+        deleted = {}
+        for name in ARCHIVE_COLLECTIONS[1:]:
+            result = await db[name].delete_many(query)
+            deleted[name] = result.deleted_count
+        return deleted
+    
+    async def expire_sessions(self, cutoff: datetime, batch_size: int = 1000) -> Dict[str, int]:
+        """Delete the sessions nobody accessed since cutoff with all their data; documents deleted per collection.
+
+        Sessions saved before access tracking existed are stamped instead, so
+        they get a full period from the first sweep.
+        """
+        await self.sessions.update_many({"last_accessed": {"$exists": False}}, {"$set": _accessed({})})
+        deleted = {name: 0 for name in ARCHIVE_COLLECTIONS}
+        idle = {"last_accessed": {"$lt": cutoff}}
+        while True:
+            batch = await self.sessions.find(idle, {"session_id": 1}).limit(batch_size).to_list(length=None)
+            ids = [doc.get("session_id") for doc in batch]
+            if not ids:
+                return deleted
+            result = await self.sessions.delete_many({"session_id": {"$in": ids}, **idle})
+            deleted["sessions"] += result.deleted_count
+            # A session used again since the find survives, and so does its history
+            kept = set(await self.sessions.distinct("session_id", {"session_id": {"$in": ids}}))
+            expired = [session_id for session_id in ids if session_id not in kept]
+            for name, count in (await self._delete_history(expired)).items():
+                deleted[name] += count
     
     async def get_all_sessions(self) -> List[str]:
         """Get all session IDs"""
         sessions = await self.sessions.find({}, {"session_id": 1}).to_list(length=None)
         return [session["session_id"] for session in sessions]
 
+def _accessed(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """$set fields plus the access time the expiry sweep goes by"""
+    return {**fields, "last_accessed": datetime.utcnow()}
+
+def _missing_person_ids(sections: Dict[str, List[Dict[str, Any]]]) -> bool:
+    return any("id" not in doc for docs in sections.values() for doc in docs)
+
+def _fill_person_ids(sections: Dict[str, List[Dict[str, Any]]], people: List[Person]) -> Dict[str, List[Dict[str, Any]]]:
+    """Give person documents saved without an ID the ID of an unused person with the same name"""
+    ids_by_name: Dict[str, List[str]] = {}
+    for person in people:
+        ids_by_name.setdefault(person.name, []).append(person.id)
+    used = {doc["id"] for docs in sections.values() for doc in docs if "id" in doc}
+    filled = {}
+    for section, docs in sections.items():
+        filled[section] = []
+        for doc in docs:
+            if "id" not in doc:
+                free = [person_id for person_id in ids_by_name.get(doc["name"], []) if person_id not in used]
+                doc = {**doc, "id": free[0] if free else str(uuid.uuid4())}
+                used.add(doc["id"])
+            filled[section].append(doc)
+    return filled
+
 # Global database instance
 database = Database()
\ No newline at end of file
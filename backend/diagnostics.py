@@ -0,0 +1,252 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+from models import (Person, SectionLimits, ContinuityItem, DiagnosticIssue, DiagnosticsReport,
+                    SatisfactionBounds, GroupConstraint, SECTIONS)
+from flow import MinCostFlow
+from groups import GroupPlan
+from name_index import NameIndex
+
+
+class FeasibilityChecker:
+    """Cheap checks that tell whether the inputs can be satisfied at all, before any solve.
+
+    Everything here is O(n) plus max-flow problems over classes of people
+    (grouped by veto or by preference pair), so the graphs stay tiny whatever
+    the roster size.
+    """
+
+    def __init__(self, people: List[Person], limits: SectionLimits,
+                 continuity_list: List[ContinuityItem], sections: Optional[List[str]] = None,
+                 constraints: Optional[List[GroupConstraint]] = None):
+        self.people = people
+        self.limits = limits.limits
+        self.continuity_list = continuity_list
+        self.constraints = constraints or []
+        self.sections = sections or SECTIONS
+        self.issues: List[DiagnosticIssue] = []
+        self.continuity_section: Dict[str, str] = {}
+
+    def run(self) -> DiagnosticsReport:
+        """Run every check and return the report"""
+        self.issues = []
+        structurally_valid = self._check_structure()
+        fixed, free_people = self._check_continuity()
+        self._check_groups()
+        bounds = None
+        if structurally_valid:
+            self._check_totals()
+            self._check_flow(fixed, free_people)
+            bounds = self._satisfaction_bounds(fixed, free_people)
+        return DiagnosticsReport(
+            feasible=not any(issue.severity == "error" for issue in self.issues),
+            issues=self.issues,
+            bounds=bounds
+        )
+
+    def _error(self, code: str, message: str, section: Optional[str] = None, names: List[str] = ()):
+        self.issues.append(DiagnosticIssue(code=code, severity="error", message=message,
+                                           section=section, names=list(names)))
+
+    def _warning(self, code: str, message: str, section: Optional[str] = None, names: List[str] = ()):
+        self.issues.append(DiagnosticIssue(code=code, severity="warning", message=message,
+                                           section=section, names=list(names)))
+
+    def _check_structure(self) -> bool:
+        """Limits for every section and only known section names in the preferences"""
+        valid = True
+        for section in self.sections:
+            limit = self.limits.get(section)
+            if limit is None:
+                self._error("missing_limits", f"No hay límites para la sección {section}", section)
+                valid = False
+            elif limit.min > limit.max:
+                self._error("min_above_max", f"El mínimo de {section} ({limit.min}) supera su máximo ({limit.max})", section)
+
+        known = set(self.sections)
+        unknown = [p.name for p in self.people
+                   if not known.issuperset(p.preferences) or not known.issuperset(p.vetoes)]
+        if unknown:
+            self._error("unknown_section", f"{len(unknown)} personas indican secciones desconocidas", names=unknown)
+            valid = False
+        return valid
+
+    def _check_continuity(self):
+        """Resolve the continuity list like the assigner does; returns (fixed counts, free people)"""
+        name_index = NameIndex(self.people)
+        people_by_id = {person.id: person for person in self.people}
+
+        fixed: Counter = Counter()
+        placed: Dict[str, str] = {}
+        unknown_people, ambiguous, unknown_sections, repeated = [], [], [], []
+        for item in self.continuity_list:
+            if item.person_id is not None:
+                person = people_by_id.get(item.person_id)
+            else:
+                person = name_index.find(item.name)
+            if person is None and item.person_id is None and name_index.candidates(item.name):
+                ambiguous.append(item.name)
+            elif person is None:
+                unknown_people.append(item.name)
+            elif item.section not in self.sections:
+                unknown_sections.append(item.name)
+            elif person.id in placed:
+                repeated.append(item.name)
+            else:
+                fixed[item.section] += 1
+                placed[person.id] = item.section
+
+        if unknown_people:
+            self._warning("continuity_unknown_person",
+                          f"{len(unknown_people)} personas de la lista de continuidad no están registradas",
+                          names=unknown_people)
+        if ambiguous:
+            self._warning("continuity_ambiguous",
+                          f"{len(ambiguous)} nombres de la lista de continuidad corresponden a varias personas",
+                          names=ambiguous)
+        if unknown_sections:
+            self._error("continuity_unknown_section",
+                        f"{len(unknown_sections)} elementos de continuidad indican secciones desconocidas",
+                        names=unknown_sections)
+        if repeated:
+            self._warning("continuity_repeated",
+                          f"{len(repeated)} personas aparecen más de una vez en la lista de continuidad",
+                          names=repeated)
+        for section, count in fixed.items():
+            limit = self.limits.get(section)
+            if limit is not None and count > limit.max:
+                self._error("continuity_overfill",
+                            f"La lista de continuidad asigna {count} personas a {section}, por encima del máximo {limit.max}",
+                            section)
+
+        self.continuity_section = placed
+        free_people = [p for p in self.people if p.id not in placed]
+        return fixed, free_people
+
+    def _check_groups(self):
+        """Group constraints that contradict each other, the limits or the continuity list"""
+        groups = GroupPlan(self.people, self.constraints)
+        if groups.unknown:
+            self._warning("constraint_unknown_person",
+                          f"{len(groups.unknown)} personas de las restricciones de grupo no están registradas",
+                          names=groups.unknown)
+        if groups.conflicts:
+            self._error("constraint_conflict",
+                        f"{len(groups.conflicts)} parejas deben ir separadas pero pertenecen al mismo grupo",
+                        names=[f"{a.name} / {b.name}" for a, b in groups.conflicts])
+
+        largest = max((limit.max for limit in self.limits.values()), default=0)
+        unit_sections = []
+        for unit in groups.units:
+            names = [person.name for person in unit]
+            if len(unit) > largest:
+                self._error("group_too_large",
+                            f"Un grupo de {len(unit)} personas no cabe en ninguna sección (máximo {largest})",
+                            names=names)
+            sections = {self.continuity_section[p.id] for p in unit if p.id in self.continuity_section}
+            if len(sections) > 1:
+                self._error("group_continuity_split",
+                            f"La lista de continuidad reparte un grupo entre {', '.join(sorted(sections))}",
+                            names=names)
+            unit_sections.append(sections)
+        clashes = [f"{groups.units[a][0].name} / {groups.units[b][0].name}"
+                   for a, others in enumerate(groups.apart) for b in others
+                   if a < b and unit_sections[a] & unit_sections[b]]
+        if clashes:
+            self._error("apart_continuity",
+                        f"La lista de continuidad junta {len(clashes)} parejas que deben ir separadas",
+                        names=clashes)
+
+    def _check_totals(self):
+        total = len(self.people)
+        min_total = sum(self.limits[s].min for s in self.sections)
+        max_total = sum(self.limits[s].max for s in self.sections)
+        if min_total > total:
+            self._error("min_total_exceeds_people",
+                        f"La suma de mínimos ({min_total}) supera el número de personas ({total})")
+        if max_total < total:
+            self._error("max_total_below_people",
+                        f"La suma de máximos ({max_total}) es menor que el número de personas ({total})")
+
+    def _check_flow(self, fixed: Counter, free_people: List[Person]):
+        """Can everyone be placed within [min, max] without breaking a veto?
+
+        People are grouped by their set of vetoes; filling each section up to its minimum is
+        rewarded, so the min-cost max-flow also shows which minimums can't be met.
+        """
+        by_veto = Counter(frozenset(p.vetoes) for p in free_people)
+        solver = MinCostFlow(2)
+        source, sink = 0, 1
+        min_edges = {}
+        section_nodes = {}
+        for section in self.sections:
+            limit = self.limits[section]
+            node = solver.add_node()
+            section_nodes[section] = node
+            missing = max(limit.min - fixed[section], 0)
+            min_edges[section] = (solver.add_edge(node, sink, missing, -1), missing)
+            solver.add_edge(node, sink, max(limit.max - max(limit.min, fixed[section]), 0), 0)
+        for vetoes, count in by_veto.items():
+            node = solver.add_node()
+            solver.add_edge(source, node, count)
+            for section, section_node in section_nodes.items():
+                if section not in vetoes:
+                    solver.add_edge(node, section_node, count)
+
+        placed, _ = solver.solve(source, sink)
+        unplaced = len(free_people) - placed
+        if unplaced > 0:
+            self._error("veto_capacity",
+                        f"{unplaced} personas no caben en ninguna sección no vetada sin superar los máximos")
+        for section, (edge_id, missing) in min_edges.items():
+            shortfall = missing - solver.flow(edge_id)
+            if shortfall > 0:
+                self._error("min_unreachable",
+                            f"No se puede alcanzar el mínimo de {section}: faltan {shortfall} personas", section)
+
+    def _satisfaction_bounds(self, fixed: Counter, free_people: List[Person]) -> SatisfactionBounds:
+        """Upper bounds on first-choice and first-or-second-choice satisfaction"""
+        residual = {s: max(self.limits[s].max - fixed[s], 0) for s in self.sections}
+        fixed_first = fixed_top_two = 0
+        for person in self.people:
+            section = self.continuity_section.get(person.id)
+            if section is None:
+                continue
+            fixed_first += person.option1 == section
+            fixed_top_two += section in (person.option1, person.option2)
+
+        # Everyone has exactly one first choice, so the bound is per section
+        first_demand = Counter(p.option1 for p in free_people)
+        first_bound = 0
+        for section, demand in first_demand.items():
+            first_bound += min(demand, residual[section])
+            if demand > residual[section]:
+                self._warning("oversubscribed",
+                              f"{demand} personas quieren {section} como primera opción y solo quedan {residual[section]} plazas",
+                              section)
+
+        solver = MinCostFlow(2)
+        source, sink = 0, 1
+        section_nodes = {}
+        for section in self.sections:
+            section_nodes[section] = solver.add_node()
+            solver.add_edge(section_nodes[section], sink, residual[section])
+        for (option1, option2), count in Counter((p.option1, p.option2) for p in free_people).items():
+            node = solver.add_node()
+            solver.add_edge(source, node, count)
+            solver.add_edge(node, section_nodes[option1], count)
+            if option2 != option1:
+                solver.add_edge(node, section_nodes[option2], count)
+        top_two_bound, _ = solver.solve(source, sink)
+
+        return SatisfactionBounds(
+            firstChoice=fixed_first + first_bound,
+            firstOrSecondChoice=fixed_top_two + top_two_bound
+        )
+
+
+def diagnose(people: List[Person], limits: SectionLimits, continuity_list: List[ContinuityItem],
+             sections: Optional[List[str]] = None,
+             constraints: Optional[List[GroupConstraint]] = None) -> DiagnosticsReport:
+    """Run the feasibility checks for one session's inputs"""
+    return FeasibilityChecker(people, limits, continuity_list, sections, constraints).run()
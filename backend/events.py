@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds between SSE keep-alive comments, so proxies don't drop idle streams
+HEARTBEAT_INTERVAL = 15
+
+# Events buffered per subscriber before it is considered too slow and told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds before the relay reopens its cursor after it died or failed
+RELAY_RETRY_INTERVAL = 1
+
+
+class SessionEventBroker:
+    """In-process fan-out of assignment changes to the subscribers of each session.
+
+    Publishing never blocks: each subscriber has its own bounded queue, and a
+    subscriber that falls behind gets its backlog replaced by a single
+    ``resync`` event telling it to re-fetch the assignment. With a relay
+    attached, published events also reach the subscribers of other workers.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.relay: Optional["EventRelay"] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._event_ids: Dict[str, int] = {}
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[session_id]
+            self._event_ids.pop(session_id, None)
+
+    def subscriber_count(self, session_id: str) -> int:
+        return len(self._subscribers.get(session_id, ()))
+
+    def publish(self, session_id: str, event_type: str, data: Dict[str, Any]):
+        """Queue an event for every subscriber of the session, in this worker and through the relay"""
+        self.deliver(session_id, event_type, data)
+        if self.relay is not None:
+            self.relay.forward(session_id, event_type, data)
+
+    def deliver(self, session_id: str, event_type: str, data: Dict[str, Any]):
+        """Queue an event for the subscribers of the session in this worker"""
+        subscribers = self._subscribers.get(session_id)
+        if not subscribers:
+            return
+        event_id = self._event_ids.get(session_id, 0) + 1
+        self._event_ids[session_id] = event_id
+        message = _format_event(event_id, event_type, data)
+        for queue in subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_format_event(event_id, "resync", {}))
+
+    async def stream(self, session_id: str) -> AsyncIterator[str]:
+        """Server-sent events for one subscriber, until the client disconnects"""
+        queue = self.subscribe(session_id)
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(session_id, queue)
+
+
+class EventRelay:
+    """Carries published events between workers through a capped Mongo collection.
+
+    Every worker appends what it publishes and tails the collection with an
+    awaiting cursor, delivering the other workers' events to its own
+    subscribers. The cursor follows insertion order while open; on reopening it
+    resumes after the last event seen. Appends happen in the background, so a
+    slow or failing write delays or drops remote delivery but never a request.
+    """
+
+    def __init__(self, broker: SessionEventBroker, database, enabled: bool = True):
+        self.broker = broker
+        self.database = database
+        self.enabled = enabled
+        self.origin = str(uuid.uuid4())
+        self._appends: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, broker: SessionEventBroker, database) -> "EventRelay":
+        """EVENT_RELAY=off keeps events inside the worker (a single-worker deployment)"""
+        return cls(broker, database, enabled=os.environ.get("EVENT_RELAY", "on") != "off")
+
+    def forward(self, session_id: str, event_type: str, data: Dict[str, Any]):
+        task = asyncio.get_running_loop().create_task(self._append({
+            "origin": self.origin, "session_id": session_id, "type": event_type, "data": data
+        }))
+        self._appends.add(task)
+        task.add_done_callback(self._appends.discard)
+
+    async def _append(self, event: Dict[str, Any]):
+        try:
+            await self.database.append_event(event)
+        except Exception as e:
+            logger.error(f"Event relay append failed: {str(e)}")
+
+    def receive(self, event: Dict[str, Any]):
+        """Deliver an event read from the collection unless this worker published it"""
+        if event.get("origin") != self.origin:
+            self.broker.deliver(event["session_id"], event["type"], event["data"])
+
+    async def run(self):
+        """Attach to the broker and relay other workers' events until cancelled"""
+        self.broker.relay = self
+        started, last_id = False, None
+        try:
+            while True:
+                try:
+                    if not started:
+                        # Only events published from now on are relayed
+                        await self.database.ensure_event_log()
+                        last_id = await self.database.last_event_id()
+                        started = True
+                    # The cursor also ends when the collection is empty; it is reopened after a pause
+                    async for event in self.database.tail_events(last_id):
+                        last_id = event["_id"]
+                        self.receive(event)
+                except Exception as e:
+                    logger.error(f"Event relay failed: {str(e)}")
+                await asyncio.sleep(RELAY_RETRY_INTERVAL)
+        finally:
+            self.broker.relay = None
+
+
+def _format_event(event_id: int, event_type: str, data: Dict[str, Any]) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+# Global event broker instance
+broker = SessionEventBroker()
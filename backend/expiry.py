@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from models import SweepReport, SweepStatus
+from database import Database, ARCHIVE_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Days without any read or write after which a session and its history are deleted
+SESSION_TTL_DAYS = 90
+
+# Seconds between sweeps
+SWEEP_INTERVAL = 3600
+
+# Seconds a worker may hold the sweep lock; only one worker sweeps at a time
+SWEEP_LOCK_TTL = 600
+
+# Sweep reports kept in memory for the status endpoint
+SWEEP_HISTORY = 48
+
+
+class SessionSweeper:
+    """Periodic deletion of abandoned sessions, with a report per sweep.
+
+    Sessions that no request has read or written for ttl_days are deleted
+    together with their assignment history, operation log and snapshots.
+    Every worker runs the loop, but a Mongo lock lets only one of them sweep
+    at a time; the reports and totals are per worker.
+    """
+
+    def __init__(self, database: Database, ttl_days: float = SESSION_TTL_DAYS,
+                 interval: float = SWEEP_INTERVAL):
+        self.database = database
+        self.ttl_days = ttl_days
+        self.interval = interval
+        self.reports = deque(maxlen=SWEEP_HISTORY)
+        self.deleted: Dict[str, int] = {name: 0 for name in ARCHIVE_COLLECTIONS}
+
+    @classmethod
+    def from_env(cls, database: Database) -> "SessionSweeper":
+        """SESSION_TTL_DAYS=0 turns expiry off"""
+        return cls(
+            database,
+            ttl_days=float(os.environ.get("SESSION_TTL_DAYS", SESSION_TTL_DAYS)),
+            interval=float(os.environ.get("SESSION_SWEEP_INTERVAL", SWEEP_INTERVAL))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_days > 0
+
+    async def sweep(self) -> Optional[SweepReport]:
+        """Expire idle sessions now; None if another worker is already sweeping"""
+        owner = str(uuid.uuid4())
+        if not await self.database.acquire_lock("sweep:sessions", owner, SWEEP_LOCK_TTL):
+            return None
+        try:
+            started_at = datetime.utcnow()
+            cutoff = started_at - timedelta(days=self.ttl_days)
+            clock = time.perf_counter()
+            deleted = await self.database.expire_sessions(cutoff)
+            report = SweepReport(started_at=started_at, cutoff=cutoff,
+                                 duration_ms=round((time.perf_counter() - clock) * 1000, 1), deleted=deleted)
+        finally:
+            await self.database.release_lock("sweep:sessions", owner)
+        self.reports.appendleft(report)
+        for name, count in deleted.items():
+            self.deleted[name] += count
+        logger.info(f"Session sweep: {deleted} in {report.duration_ms} ms")
+        return report
+
+    async def run(self):
+        """Sweep every interval until cancelled"""
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> SweepStatus:
+        return SweepStatus(ttl_days=self.ttl_days, interval_seconds=self.interval,
+                           deleted=self.deleted, sweeps=list(self.reports))
@@ -0,0 +1,154 @@
+import csv
+import io
+import json
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from models import Person
+from assignment_algorithm import satisfaction_category, preference_rank
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# choice is the placed section's position in the ranked preferences, 1 = first choice; empty if unranked
+COLUMNS = ["section", "name", "option1", "option2", "veto", "satisfaction", "preferences", "vetoes", "choice"]
+
+# Joins the ranked lists into one cell in CSV and XLSX; NDJSON keeps them as arrays
+LIST_SEPARATOR = " > "
+
+# Sections are fed one at a time as (section name, raw person documents)
+SectionStream = AsyncIterator[Tuple[str, List[Dict[str, Any]]]]
+
+
+def _rows(section: str, people: List[Dict[str, Any]]):
+    for person_doc in people:
+        person = Person(**person_doc)
+        rank = preference_rank(person, section)
+        yield [section, person.name, person.option1, person.option2, person.veto,
+               satisfaction_category(person, section), person.preferences, person.vetoes,
+               rank + 1 if rank is not None else None]
+
+
+def _cells(row: List[Any]) -> List[Any]:
+    """A row with its lists joined and missing values blank, for the tabular formats"""
+    return [LIST_SEPARATOR.join(value) if isinstance(value, list) else "" if value is None else value
+            for value in row]
+
+
+async def export_csv(sections: SectionStream) -> AsyncIterator[bytes]:
+    """CSV with a UTF-8 BOM so spreadsheet apps keep the accents"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for section, people in sections:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_cells(row) for row in _rows(section, people))
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def export_ndjson(sections: SectionStream) -> AsyncIterator[bytes]:
+    """One JSON object per person"""
+    async for section, people in sections:
+        lines = [json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) for row in _rows(section, people)]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object collecting zip output until the generator drains it"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Asignacion" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values: List[str]) -> str:
+    cells = "".join(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>' for value in values)
+    return f"<row>{cells}</row>"
+
+
+async def export_xlsx(sections: SectionStream) -> AsyncIterator[bytes]:
+    """Single-sheet workbook written straight into a streamed zip (inline strings, no styles)"""
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    for name, content in _XLSX_STATIC_PARTS.items():
+        archive.writestr(name, content)
+
+    with archive.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+        sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            + _xlsx_row(COLUMNS)
+        ).encode("utf-8"))
+        async for section, people in sections:
+            sheet.write("".join(_xlsx_row(_cells(row)) for row in _rows(section, people)).encode("utf-8"))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        sheet.write(b"</sheetData></worksheet>")
+
+    archive.close()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "csv": export_csv,
+    "ndjson": export_ndjson,
+    "xlsx": export_xlsx,
+}
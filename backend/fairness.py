@@ -0,0 +1,248 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import (Person, SectionLimits, ContinuityItem, RestrictionPriorities, GroupConstraint,
+                    PersonFairness, FairnessMetrics)
+from assignment_algorithm import SectionAssigner, satisfaction_category
+
+# Hard cap on the number of simulations in a single report
+MAX_SIMULATIONS = 10000
+
+# Cap when group constraints are set: every simulation is then a whole assigner run
+MAX_GROUPED_SIMULATIONS = 1000
+
+# Upper bound on simulations x people held in memory at once
+BATCH_CELLS = 16_000_000
+
+# Column order of the probability matrix, as in SatisfactionStats
+CATEGORIES = ["firstChoice", "secondChoice", "other", "veto"]
+
+
+class FairnessSimulator:
+    """Per-person placement probabilities under a strategy's random tie-breaking.
+
+    The greedy strategies are replayed as array operations over a batch of
+    simulations at once: one step per person instead of one run per
+    simulation. The lexicographic strategy only randomizes which members of a
+    class of identical people get each of the class's seats, so its
+    probabilities are exact from a single solve.
+
+    The minimum-quota rebalancing pass of the greedy strategies is not
+    modelled; how often it would have kicked in is reported as belowMinimumRate.
+    Group constraints can't be expressed as array operations, so with any in
+    play every simulation is a whole assigner run instead.
+    """
+
+    def __init__(self, people: List[Person], limits: SectionLimits,
+                 continuity_list: List[ContinuityItem], priorities: RestrictionPriorities,
+                 strategy: str = "greedy", sections: Optional[List[str]] = None,
+                 constraints: Optional[List[GroupConstraint]] = None):
+        self.people = people
+        self.strategy = strategy
+        self.assigner = SectionAssigner(people, limits, continuity_list, priorities,
+                                        strategy=strategy, sections=sections, constraints=constraints)
+        self.grouped = bool(self.assigner.groups.units)
+        self.analytic = strategy == "lexicographic" and not self.grouped
+        self.sections = self.assigner.sections
+        index = {section: i for i, section in enumerate(self.sections)}
+        # Ranked preferences as section indices, padded with -1, and vetoes as a mask
+        self.ranks = np.full((len(people), max(self.assigner.max_rank, 2)), -1, dtype=np.int16)
+        self.vetoed = np.zeros((len(people), len(self.sections)), dtype=bool)
+        for i, person in enumerate(people):
+            self.ranks[i, :len(person.preferences)] = [index[s] for s in person.preferences]
+            self.vetoed[i, [index[s] for s in person.vetoes if s in index]] = True
+        self.min = np.array([limits.limits[s].min for s in self.sections])
+        self.max = np.array([limits.limits[s].max for s in self.sections])
+
+    def run(self, simulations: int, seed: int) -> Tuple[np.ndarray, float]:
+        """Probability matrix (people x CATEGORIES) and the share of runs left below a minimum"""
+        if self.grouped:
+            return self._whole_runs(simulations, seed)
+        if self.analytic:
+            return self._analytic(), 0.0
+
+        base, remaining = self.assigner.assign_continuity()
+        position = {id(person): i for i, person in enumerate(self.people)}
+        rows = np.array([position[id(p)] for p in remaining], dtype=np.int64)
+        totals = np.zeros((len(self.people), len(CATEGORIES)))
+        for section, section_people in base.items():
+            for person in section_people:
+                totals[position[id(person)], CATEGORIES.index(satisfaction_category(person, section))] = simulations
+        base_counts = np.array([len(base[s]) for s in self.sections])
+
+        strict = self.assigner._get_priority("sectionLimits") == 1
+        rng = np.random.default_rng(seed)
+        batch = max(1, min(simulations, BATCH_CELLS // max(len(rows), 1)))
+        below_minimum = 0
+        done = 0
+        while done < simulations:
+            size = min(batch, simulations - done)
+            counts = np.tile(base_counts, (size, 1))
+            if strict:
+                placed = self._simulate_strict(rows, counts, rng)
+            else:
+                placed = self._simulate_preference(rows, counts, rng)
+            below_minimum += int((counts < self.min).any(axis=1).sum())
+            for category, mask in enumerate(self._categories(placed, rows)):
+                totals[rows, category] += mask.sum(axis=0)
+            done += size
+        return totals / simulations, below_minimum / simulations
+
+    def _whole_runs(self, simulations: int, seed: int) -> Tuple[np.ndarray, float]:
+        """Repeated assigner runs, for group constraints; rebalancing is included, so the
+        below-minimum share counts runs that end below a minimum"""
+        self.assigner.rng = random.Random(seed)
+        position = {id(person): i for i, person in enumerate(self.people)}
+        totals = np.zeros((len(self.people), len(CATEGORIES)))
+        below_minimum = 0
+        for _ in range(simulations):
+            assignments = self.assigner.assign_people()
+            for section, section_people in assignments.items():
+                for person in section_people:
+                    totals[position[id(person)], CATEGORIES.index(satisfaction_category(person, section))] += 1
+            counts = np.array([len(assignments[s]) for s in self.sections])
+            below_minimum += int((counts < self.min).any())
+        return totals / simulations, below_minimum / simulations
+
+    def _categories(self, placed: np.ndarray, rows: np.ndarray) -> List[np.ndarray]:
+        """Boolean masks (simulations x people) per category, in CATEGORIES order"""
+        first = placed == self.ranks[rows, 0]
+        second = placed == self.ranks[rows, 1]
+        ranked = first | second
+        for rank in range(2, self.ranks.shape[1]):
+            ranked |= placed == self.ranks[rows, rank]
+        veto = ~ranked & self.vetoed[rows, placed]
+        return [first, second, ~first & ~second & ~veto, veto]
+
+    def _fallback(self, counts: np.ndarray, vetoed: np.ndarray) -> np.ndarray:
+        """First non-vetoed section with space, else the least full one, per simulation"""
+        allowed = (counts < self.max) & ~vetoed
+        return np.where(allowed.any(axis=1), allowed.argmax(axis=1), counts.argmin(axis=1))
+
+    def _simulate_strict(self, rows: np.ndarray, counts: np.ndarray, rng) -> np.ndarray:
+        """Shuffle, then the first ranked section with room, first free section, least full section"""
+        size, people = counts.shape[0], len(rows)
+        batch_rows = np.arange(size)
+        order = rng.permuted(np.tile(np.arange(people, dtype=np.int32), (size, 1)), axis=1)
+        placed = np.empty((size, people), dtype=np.int16)
+        for step in range(people):
+            who = order[:, step]
+            person = rows[who]
+            choice = self.ranks[person, 0]
+            # Only the simulations whose first choice is full need the slower paths
+            full = np.flatnonzero(counts[batch_rows, choice] >= self.max[choice])
+            for rank in range(1, self.ranks.shape[1]):
+                if not len(full):
+                    break
+                section = self.ranks[person[full], rank]
+                fits = (section >= 0) & (counts[full, section] < self.max[section])
+                choice[full[fits]] = section[fits]
+                full = full[~fits]
+            if len(full):
+                choice[full] = self._fallback(counts[full], self.vetoed[person[full]])
+            counts[batch_rows, choice] += 1
+            placed[batch_rows, who] = choice
+        return placed
+
+    def _simulate_preference(self, rows: np.ndarray, counts: np.ndarray, rng) -> np.ndarray:
+        """Rank by rank a random subset per oversubscribed section, then the rest in order"""
+        size, people = counts.shape[0], len(rows)
+        placed = np.full((size, people), -1, dtype=np.int16)
+        for rank in range(self.ranks.shape[1]):
+            wanted = self.ranks[rows, rank]
+            for section in np.unique(wanted[wanted >= 0]):
+                members = np.flatnonzero(wanted == section)
+                waiting = placed[:, members] < 0
+                available = np.maximum(self.max[section] - counts[:, section], 0)
+                if (waiting.sum(axis=1) <= available).all():
+                    take = waiting
+                else:
+                    # Uniform random subset of the waiting members per simulation, like random.sample
+                    keys = np.where(waiting, rng.random((size, len(members))), 2.0)
+                    take = waiting & (keys.argsort(axis=1).argsort(axis=1) < available[:, None])
+                block = placed[:, members]
+                block[take] = section
+                placed[:, members] = block
+                counts[:, section] += take.sum(axis=1)
+
+        for column, person in enumerate(rows):
+            waiting = np.flatnonzero(placed[:, column] < 0)
+            if not len(waiting):
+                continue
+            choice = self._fallback(counts[waiting], self.vetoed[person])
+            placed[waiting, column] = choice
+            counts[waiting, choice] += 1
+        return placed
+
+    def _analytic(self) -> np.ndarray:
+        """Exact probabilities for the lexicographic strategy from one solve"""
+        continuity_section = self.assigner._continuity_sections()
+        assignments = self.assigner.assign_people()
+        key = lambda p: self.assigner.class_key(p, continuity_section)
+
+        class_sizes: Dict[Tuple, int] = {}
+        for person in self.people:
+            class_sizes[key(person)] = class_sizes.get(key(person), 0) + 1
+        seats: Dict[Tuple, Dict[str, int]] = {}
+        for section, section_people in assignments.items():
+            for person in section_people:
+                class_seats = seats.setdefault(key(person), {})
+                class_seats[section] = class_seats.get(section, 0) + 1
+
+        probabilities = np.zeros((len(self.people), len(CATEGORIES)))
+        for i, person in enumerate(self.people):
+            person_class = key(person)
+            for section, count in seats.get(person_class, {}).items():
+                category = CATEGORIES.index(satisfaction_category(person, section))
+                probabilities[i, category] += count / class_sizes[person_class]
+        return probabilities
+
+
+def gini(values: np.ndarray) -> float:
+    """Gini coefficient of non-negative values (0 = everyone equal)"""
+    if not len(values) or values.sum() == 0:
+        return 0.0
+    ordered = np.sort(values)
+    n = len(ordered)
+    return float((2 * np.arange(1, n + 1) - n - 1) @ ordered / (n * ordered.sum()))
+
+
+def summarize(people: List[Person], probabilities: np.ndarray,
+              below_minimum_rate: float) -> Tuple[List[PersonFairness], FairnessMetrics]:
+    """Per-person rows plus aggregate fairness metrics"""
+    rows = [
+        PersonFairness(id=person.id, name=person.name,
+                       **{category: round(float(p), 6) for category, p in zip(CATEGORIES, probabilities[i])})
+        for i, person in enumerate(people)
+    ]
+    first = probabilities[:, 0]
+    top_two = first + probabilities[:, 1]
+    by_preference = {}
+    for section in sorted({p.option1 for p in people}):
+        mask = np.array([p.option1 == section for p in people])
+        by_preference[section] = round(float(first[mask].mean()), 6)
+
+    metrics = FairnessMetrics(
+        expectedFirstChoice=round(float(first.sum()), 3),
+        expectedFirstOrSecondChoice=round(float(top_two.sum()), 3),
+        minFirstChoiceProbability=round(float(first.min(initial=1.0)), 6),
+        minFirstOrSecondChoiceProbability=round(float(top_two.min(initial=1.0)), 6),
+        maxVetoProbability=round(float(probabilities[:, 3].max(initial=0.0)), 6),
+        firstChoiceGini=round(gini(first), 6),
+        firstChoiceByPreference=by_preference,
+        belowMinimumRate=round(below_minimum_rate, 6)
+    )
+    return rows, metrics
+
+
+def fairness_report(people: List[Person], limits: SectionLimits, continuity_list: List[ContinuityItem],
+                    priorities: RestrictionPriorities, strategy: str, simulations: int,
+                    seed: int, sections: Optional[List[str]] = None,
+                    constraints: Optional[List[GroupConstraint]] = None
+                    ) -> Tuple[List[PersonFairness], FairnessMetrics, bool]:
+    """Simulate (or solve) and summarize one session; the flag is True for exact probabilities"""
+    simulator = FairnessSimulator(people, limits, continuity_list, priorities, strategy, sections, constraints)
+    probabilities, below_minimum_rate = simulator.run(simulations, seed)
+    return (*summarize(people, probabilities, below_minimum_rate), simulator.analytic)
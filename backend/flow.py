@@ -0,0 +1,153 @@
+import heapq
+from collections import deque
+from typing import List, Optional, Tuple
+
+
+class MinCostFlow:
+    """Successive-shortest-path min-cost flow.
+
+    Edge costs may be negative as long as the initial graph has no negative
+    cycle (our assignment graphs are DAGs). Potentials are seeded with one
+    Bellman-Ford pass and then maintained so every augmentation is a Dijkstra.
+    After each Dijkstra every shortest path is saturated with a depth-first
+    search over the zero reduced-cost edges, so graphs with many unit-capacity
+    classes don't pay one Dijkstra per unit of flow.
+    """
+
+    def __init__(self, node_count: int):
+        self.node_count = node_count
+        self.graph: List[List[int]] = [[] for _ in range(node_count)]
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+
+    def add_node(self) -> int:
+        """Append a node and return its index"""
+        self.graph.append([])
+        self.node_count += 1
+        return self.node_count - 1
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int = 0) -> int:
+        """Add a directed edge and return its id (its reverse edge is id ^ 1)"""
+        edge_id = len(self.to)
+        self.to.extend((v, u))
+        self.cap.extend((cap, 0))
+        self.cost.extend((cost, -cost))
+        self.graph[u].append(edge_id)
+        self.graph[v].append(edge_id + 1)
+        return edge_id
+
+    def flow(self, edge_id: int) -> int:
+        """Flow currently pushed through an edge"""
+        return self.cap[edge_id ^ 1]
+
+    def solve(self, source: int, sink: int, max_flow: Optional[int] = None) -> Tuple[int, int]:
+        """Push up to max_flow units at minimum cost; returns (flow, cost)"""
+        limit = max_flow if max_flow is not None else float("inf")
+        dual = self._initial_potentials(source)
+        total_flow = 0
+        total_cost = 0
+
+        while total_flow < limit:
+            dist = [None] * self.node_count
+            visited = [False] * self.node_count
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                dist_v, v = heapq.heappop(heap)
+                if visited[v]:
+                    continue
+                visited[v] = True
+                if v == sink:
+                    break
+                dual_v = dual[v]
+                for edge_id in self.graph[v]:
+                    if not self.cap[edge_id]:
+                        continue
+                    w = self.to[edge_id]
+                    if visited[w]:
+                        continue
+                    candidate = dist_v + self.cost[edge_id] - dual[w] + dual_v
+                    if dist[w] is None or candidate < dist[w]:
+                        dist[w] = candidate
+                        heapq.heappush(heap, (candidate, w))
+            if not visited[sink]:
+                break
+
+            for v in range(self.node_count):
+                if visited[v]:
+                    dual[v] -= dist[sink] - dist[v]
+
+            pushed, cost = self._augment_shortest_paths(source, sink, dual, limit - total_flow)
+            total_flow += pushed
+            total_cost += cost
+
+        return total_flow, total_cost
+
+    def _augment_shortest_paths(self, source: int, sink: int, dual: List[int], limit) -> Tuple[int, int]:
+        """Push flow along zero reduced-cost paths until none is left (or limit is reached)"""
+        graph, to, cap, cost = self.graph, self.to, self.cap, self.cost
+        current = [0] * self.node_count
+        on_path = [False] * self.node_count
+        total_flow = 0
+        total_cost = 0
+        while total_flow < limit:
+            path = []
+            v = source
+            on_path[source] = True
+            while v != sink:
+                edges = graph[v]
+                dual_v = dual[v]
+                index = current[v]
+                while index < len(edges):
+                    edge_id = edges[index]
+                    w = to[edge_id]
+                    if cap[edge_id] and not on_path[w] and cost[edge_id] + dual_v == dual[w]:
+                        break
+                    index += 1
+                current[v] = index
+                if index < len(edges):
+                    path.append(edge_id)
+                    v = w
+                    on_path[v] = True
+                    continue
+                # Dead end: retreat and skip the edge that led here
+                on_path[v] = False
+                if not path:
+                    return total_flow, total_cost
+                v = to[path.pop() ^ 1]
+                current[v] += 1
+
+            pushed = limit - total_flow
+            for edge_id in path:
+                pushed = min(pushed, cap[edge_id])
+            for edge_id in path:
+                cap[edge_id] -= pushed
+                cap[edge_id ^ 1] += pushed
+                total_cost += pushed * cost[edge_id]
+                on_path[to[edge_id]] = False
+            on_path[source] = False
+            total_flow += pushed
+        return total_flow, total_cost
+
+    def _initial_potentials(self, source: int) -> List[int]:
+        """Shortest distances from the source (SPFA); unreachable nodes get 0"""
+        dist = [None] * self.node_count
+        dist[source] = 0
+        queue = deque([source])
+        in_queue = [False] * self.node_count
+        in_queue[source] = True
+        while queue:
+            v = queue.popleft()
+            in_queue[v] = False
+            for edge_id in self.graph[v]:
+                if not self.cap[edge_id]:
+                    continue
+                w = self.to[edge_id]
+                candidate = dist[v] + self.cost[edge_id]
+                if dist[w] is None or candidate < dist[w]:
+                    dist[w] = candidate
+                    if not in_queue[w]:
+                        in_queue[w] = True
+                        queue.append(w)
+        return [d if d is not None else 0 for d in dist]
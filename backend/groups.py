@@ -0,0 +1,98 @@
+import itertools
+from typing import Dict, List, Set, Tuple
+
+from models import Person, GroupConstraint
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> int:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+
+class GroupPlan:
+    """People collapsed into placement units by the group constraints.
+
+    "together" constraints are merged with union-find, so chains of pairs end
+    up in one unit. Only constrained people get a unit: every together group,
+    plus anyone in an "apart" constraint (alone if not in a group). Apart
+    constraints become edges between units; an apart pair that ends up inside
+    one unit can't be satisfied and is reported in conflicts.
+    """
+
+    def __init__(self, people: List[Person], constraints: List[GroupConstraint]):
+        position = {person.id: i for i, person in enumerate(people)}
+        sets = UnionFind(len(people))
+        apart_pairs: List[Tuple[int, int]] = []
+        involved: Set[int] = set()
+        self.unknown: List[str] = []
+        for constraint in constraints:
+            members = [position[pid] for pid in constraint.person_ids if pid in position]
+            self.unknown.extend(pid for pid in constraint.person_ids if pid not in position)
+            involved.update(members)
+            if constraint.kind == "together":
+                for member in members[1:]:
+                    sets.union(members[0], member)
+            else:
+                apart_pairs.extend(itertools.combinations(members, 2))
+
+        unit_of_root: Dict[int, int] = {}
+        self.units: List[List[Person]] = []
+        self.unit_of: Dict[str, int] = {}
+        for i in sorted(involved):
+            root = sets.find(i)
+            if root not in unit_of_root:
+                unit_of_root[root] = len(self.units)
+                self.units.append([])
+            self.units[unit_of_root[root]].append(people[i])
+            self.unit_of[people[i].id] = unit_of_root[root]
+
+        self.apart: List[Set[int]] = [set() for _ in self.units]
+        self.conflicts: List[Tuple[Person, Person]] = []
+        for a, b in apart_pairs:
+            unit_a, unit_b = self.unit_of[people[a].id], self.unit_of[people[b].id]
+            if unit_a == unit_b:
+                self.conflicts.append((people[a], people[b]))
+            else:
+                self.apart[unit_a].add(unit_b)
+                self.apart[unit_b].add(unit_a)
+
+    def choices(self, unit: int) -> Tuple[List[str], Set[str]]:
+        """Ranked sections for a whole unit (Borda count of its members) and the sections any member vetoes"""
+        members = self.units[unit]
+        vetoes = {section for person in members for section in person.vetoes}
+        depth = max(len(person.preferences) for person in members)
+        scores: Dict[str, int] = {}
+        for person in members:
+            for rank, section in enumerate(person.preferences):
+                if section not in vetoes:
+                    scores[section] = scores.get(section, 0) + depth - rank
+        # Stable sort: equal scores keep the order in which members listed them
+        return sorted(scores, key=lambda section: -scores[section]), vetoes
+
+    def violations(self, section_of: Dict[str, str]) -> int:
+        """Split together groups plus apart pairs of units sharing a section"""
+        unit_sections = [{section_of[p.id] for p in unit if p.id in section_of} for unit in self.units]
+        split = sum(1 for unit, sections in zip(self.units, unit_sections) if len(sections) > 1)
+        shared = sum(1 for a, others in enumerate(self.apart) for b in others
+                     if a < b and unit_sections[a] & unit_sections[b])
+        return split + shared
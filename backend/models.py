@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 import uuid
@@ -7,23 +7,142 @@ import uuid
 SECTIONS = ["Colonia", "Manada", "Tropa", "Esculta", "Clan"]
 VETO_OPTIONS = SECTIONS + ["Ninguna"]
 
+# Assignment strategies understood by SectionAssigner
+ASSIGNMENT_STRATEGIES = ["greedy", "lexicographic"]
+
+# Group constraints: members share one section / members are all in different sections
+CONSTRAINT_KINDS = ["together", "apart"]
+
+# Response views of the heavy read endpoints: everything, names per section, statistics only
+RESPONSE_VIEWS = ["full", "compact", "stats"]
+
+# Why the assigner put a person where it did, as reported by the trace mode
+PLACEMENT_REASONS = [
+    "continuity",  # continuity list
+    "group",       # placed whole with their together/apart unit
+    "kept",        # incremental run: left where they were
+    "preference",  # one of their ranked sections (see rank)
+    "fallback",    # first section with room that they don't veto
+    "forced",      # nothing fitted: least full section, or a vetoed one
+    "rebalanced",  # moved to fill a section below its minimum
+]
+
+# Person fields kept in agreement by sync_ranked_choices
+CHOICE_FIELDS = ["option1", "option2", "veto", "preferences", "vetoes"]
+
+def _unique_sections(sections: List[str]) -> List[str]:
+    return list(dict.fromkeys(s for s in sections if s and s != "Ninguna"))
+
+def sync_ranked_choices(person):
+    """Keep the ranked lists and the legacy option1/option2/veto fields in agreement.
+
+    The legacy fields mirror the first two preferences and the first veto.
+    When a legacy field was set explicitly and disagrees with the lists (a
+    client that only knows the old fields edited it), it replaces that slot.
+    """
+    explicit = person.model_fields_set
+    preferences = _unique_sections(person.preferences)
+    legacy = _unique_sections([person.option1, person.option2])
+    derived = preferences[:2] if len(preferences) > 1 else preferences * 2
+    if legacy and {"option1", "option2"} & explicit and [person.option1, person.option2] != derived:
+        preferences = legacy + [s for s in preferences[2:] if s not in legacy]
+    if not preferences:
+        raise ValueError("Se necesita al menos una preferencia")
+
+    vetoes = _unique_sections(person.vetoes)
+    if "veto" in explicit and person.veto != (vetoes[0] if vetoes else "Ninguna"):
+        # "Ninguna" from a legacy client means no vetoes at all
+        vetoes = _unique_sections([person.veto] + vetoes[1:]) if person.veto != "Ninguna" else []
+
+    person.preferences = preferences
+    person.vetoes = vetoes
+    person.option1 = preferences[0]
+    person.option2 = preferences[1] if len(preferences) > 1 else preferences[0]
+    person.veto = vetoes[0] if vetoes else "Ninguna"
+    return person
+
+def check_choice_overlap(preferences: List[str], vetoes: List[str]):
+    """A section both ranked and vetoed means different things to the greedy and lexicographic engines"""
+    overlap = [section for section in preferences if section in vetoes]
+    if overlap:
+        raise ValueError(f"Una sección no puede estar a la vez en preferencias y vetos: {', '.join(overlap)}")
+
 class Person(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
-    option1: str  # Primera preferencia
-    option2: str  # Segunda preferencia
-    veto: str     # Sección vetada
+    option1: str = ""  # Primera preferencia
+    option2: str = ""  # Segunda preferencia
+    veto: str = "Ninguna"  # Sección vetada
+    preferences: List[str] = []  # Secciones en orden de preferencia
+    vetoes: List[str] = []       # Secciones vetadas
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
+    @model_validator(mode="after")
+    def _sync_choices(self):
+        return sync_ranked_choices(self)
+
 class PersonCreate(BaseModel):
+    id: Optional[str] = None  # Known ID of a person being re-uploaded; matched by name when missing
     name: str
-    option1: str
-    option2: str
-    veto: str
+    option1: str = ""
+    option2: str = ""
+    veto: str = "Ninguna"
+    preferences: List[str] = []
+    vetoes: List[str] = []
+
+    @model_validator(mode="after")
+    def _sync_choices(self):
+        sync_ranked_choices(self)
+        check_choice_overlap(self.preferences, self.vetoes)
+        return self
 
 class PersonList(BaseModel):
     people: List[PersonCreate]
     session_id: Optional[str] = None
 
+def reject_nulls(update, fields: List[str]):
+    """An explicit null would be written into the stored element and break every later read"""
+    for field in fields:
+        if field in update.model_fields_set and getattr(update, field) is None:
+            raise ValueError(f"El campo {field} no puede ser nulo")
+    return update
+
+class PersonUpdate(BaseModel):
+    id: str
+    name: Optional[str] = None
+    option1: Optional[str] = None
+    option2: Optional[str] = None
+    veto: Optional[str] = None
+    preferences: Optional[List[str]] = None
+    vetoes: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def _sync_choices(self):
+        """New ranked lists also rewrite the legacy fields they mirror"""
+        reject_nulls(self, ["name", "option1", "option2", "veto", "preferences", "vetoes"])
+        if self.preferences is not None and not _unique_sections(self.preferences):
+            raise ValueError("Se necesita al menos una preferencia")
+        if self.preferences:
+            preferences = _unique_sections(self.preferences)
+            self.preferences = preferences
+            self.option1 = preferences[0]
+            self.option2 = preferences[1] if len(preferences) > 1 else preferences[0]
+        if self.vetoes is not None:
+            self.vetoes = _unique_sections(self.vetoes)
+            self.veto = self.vetoes[0] if self.vetoes else "Ninguna"
+        if self.preferences is not None and self.vetoes is not None:
+            check_choice_overlap(self.preferences, self.vetoes)
+        return self
+
+class PeoplePatch(BaseModel):
+    add: List[PersonCreate] = []
+    update: List[PersonUpdate] = []
+    remove: List[str] = []
+
+class SectionList(BaseModel):
+    sections: List[str] = Field(min_length=1)
+    session_id: Optional[str] = None
+
 class SectionLimit(BaseModel):
     min: int = Field(ge=0)
     max: int = Field(ge=1)
@@ -36,18 +155,66 @@ class SectionLimitsCreate(BaseModel):
     limits: Dict[str, SectionLimit]
 
 class ContinuityItem(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     section: str
+    person_id: Optional[str] = None  # Takes precedence over the name when set
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
 class ContinuityItemCreate(BaseModel):
     name: str
     section: str
+    person_id: Optional[str] = None
 
 class ContinuityList(BaseModel):
     continuity_list: List[ContinuityItemCreate]
     session_id: Optional[str] = None
 
+class ContinuityItemUpdate(BaseModel):
+    id: str
+    name: Optional[str] = None
+    section: Optional[str] = None
+    person_id: Optional[str] = None  # null unlinks the item, which then matches by name
+
+    @model_validator(mode="after")
+    def _check_nulls(self):
+        return reject_nulls(self, ["name", "section"])
+
+class ContinuityPatch(BaseModel):
+    add: List[ContinuityItemCreate] = []
+    update: List[ContinuityItemUpdate] = []
+    remove: List[str] = []
+
+class GroupConstraint(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str  # "together" o "apart"
+    person_ids: List[str] = Field(min_length=2)
+    session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+
+class GroupConstraintCreate(BaseModel):
+    kind: str
+    person_ids: List[str] = Field(min_length=2)
+
+class GroupConstraintList(BaseModel):
+    constraints: List[GroupConstraintCreate]
+    session_id: Optional[str] = None
+
+class ContinuityMatch(BaseModel):
+    id: str
+    name: str
+    status: str  # "id", "exact", "normalized", "ambiguous" or "unmatched"
+    person_id: Optional[str] = None
+    person_name: Optional[str] = None
+    candidates: List[str] = []   # Registered names an ambiguous item could refer to
+    suggestions: List[str] = []  # Closest registered names for an unmatched item
+
+class ContinuityMatchReport(BaseModel):
+    session_id: str
+    matched: int
+    ambiguous: int
+    unmatched: int
+    items: List[ContinuityMatch]
+
 class RestrictionPriorities(BaseModel):
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     priorities: Dict[str, int] = {
@@ -63,8 +230,9 @@ class RestrictionPrioritiesCreate(BaseModel):
 class SatisfactionStats(BaseModel):
     firstChoice: int = 0
     secondChoice: int = 0
-    other: int = 0
+    other: int = 0   # Neither first nor second choice (lower ranks included) and not vetoed
     veto: int = 0
+    rankHistogram: List[int] = []  # People placed in their 1st, 2nd, 3rd... choice
 
 class AssignmentStatistics(BaseModel):
     totalPeople: int
@@ -72,6 +240,7 @@ class AssignmentStatistics(BaseModel):
     satisfaction: SatisfactionStats
     sectionCounts: Dict[str, int]
     withinLimits: bool
+    groupViolations: int = 0  # Split together groups plus apart pairs sharing a section
 
 class Assignment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -79,25 +248,182 @@ class Assignment(BaseModel):
     assignments: Dict[str, List[Person]]
     created_at: datetime = Field(default_factory=datetime.utcnow)
     statistics: AssignmentStatistics
+    op_seq: int = 0   # Operations currently applied on top of the original result
+    op_head: int = 0  # Operations logged (op_seq < op_head means redo is possible)
 
 class AssignmentRequest(BaseModel):
     session_id: str
+    strategy: str = "greedy"
+    incremental: bool = False  # Keep the current assignment and only place new or changed people
+    trace: bool = False  # Return why each person was placed and what each phase cost
+
+class SessionSetupRequest(BaseModel):
+    session_id: Optional[str] = None
+    people: List[PersonCreate]
+    limits: Dict[str, SectionLimit]
+    continuity_list: List[ContinuityItemCreate] = []
+    priorities: Optional[Dict[str, int]] = None
+    sections: Optional[List[str]] = Field(None, min_length=1)
+    constraints: Optional[List[GroupConstraintCreate]] = None  # None keeps the session's stored constraints
+    strategy: str = "greedy"
 
 class PersonMoveRequest(BaseModel):
+    person_id: Optional[str] = None
+    person_name: Optional[str] = None  # Only used when no person_id is given
+    from_section: str
+    to_section: str
+
+class AssignmentOperation(BaseModel):
+    session_id: str
+    assignment_id: str
+    seq: int
+    person_id: Optional[str] = None  # Missing on operations logged before IDs existed
     person_name: str
     from_section: str
     to_section: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class SessionData(BaseModel):
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    sections: List[str] = Field(default_factory=lambda: list(SECTIONS))
     people: List[Person] = []
     limits: Optional[SectionLimits] = None
     continuity_list: List[ContinuityItem] = []
+    constraints: List[GroupConstraint] = []
     priorities: Optional[RestrictionPriorities] = None
     current_assignment: Optional[Assignment] = None
+    last_accessed: datetime = Field(default_factory=datetime.utcnow)
+
+class PlacementTrace(BaseModel):
+    id: str
+    name: str
+    section: str
+    reason: str  # One of PLACEMENT_REASONS
+    rank: Optional[int] = None  # Position of section in the person's preferences, 0 = first choice
+    lost_draws: List[str] = []  # Ranked sections that were full or drawn for others before this person
+    moved_from: Optional[str] = None  # Section before rebalancing
+
+class PhaseProfile(BaseModel):
+    phase: str
+    duration_ms: float
+    allocated_blocks: int  # Net change in sys.getallocatedblocks() over the phase
+
+class AssignmentTrace(BaseModel):
+    placements: List[PlacementTrace]
+    phases: List[PhaseProfile]
 
 class AssignmentResponse(BaseModel):
     success: bool
     session_id: str
     assignment: Assignment
-    message: str = "Asignación completada exitosamente"
\ No newline at end of file
+    message: str = "Asignación completada exitosamente"
+    trace: Optional[AssignmentTrace] = None
+
+class DiagnosticIssue(BaseModel):
+    code: str
+    severity: str  # "error" blocks the assignment, "warning" is informative
+    message: str
+    section: Optional[str] = None
+    names: List[str] = []
+
+class SatisfactionBounds(BaseModel):
+    firstChoice: int
+    firstOrSecondChoice: int
+
+class DiagnosticsReport(BaseModel):
+    feasible: bool
+    issues: List[DiagnosticIssue] = []
+    bounds: Optional[SatisfactionBounds] = None
+
+class ScenarioRequest(BaseModel):
+    session_id: str
+    limits_variants: List[Dict[str, SectionLimit]] = []
+    priorities_variants: List[Dict[str, int]] = []
+    strategy: str = "greedy"
+    seed: Optional[int] = None
+
+class ScenarioResult(BaseModel):
+    limits_variant: Optional[int] = None
+    priorities_variant: Optional[int] = None
+    statistics: AssignmentStatistics
+
+class ScenarioResponse(BaseModel):
+    session_id: str
+    seed: int
+    scenarios: List[ScenarioResult]
+
+class FairnessRequest(BaseModel):
+    session_id: str
+    strategy: str = "greedy"
+    simulations: int = Field(1000, ge=1)
+    seed: Optional[int] = None
+
+class PersonFairness(BaseModel):
+    id: str
+    name: str
+    firstChoice: float
+    secondChoice: float
+    other: float
+    veto: float
+
+class FairnessMetrics(BaseModel):
+    expectedFirstChoice: float
+    expectedFirstOrSecondChoice: float
+    minFirstChoiceProbability: float
+    minFirstOrSecondChoiceProbability: float
+    maxVetoProbability: float
+    firstChoiceGini: float
+    firstChoiceByPreference: Dict[str, float]  # Mean first-choice probability per first preference
+    belowMinimumRate: float  # Share of simulations the (unmodelled) minimum rebalancing would have touched
+
+class FairnessReport(BaseModel):
+    session_id: str
+    strategy: str
+    simulations: int
+    seed: int
+    analytic: bool  # Exact probabilities instead of a simulation (lexicographic strategy)
+    people: List[PersonFairness]
+    metrics: FairnessMetrics
+
+class SectionDemand(BaseModel):
+    section: str
+    firstChoice: int
+    secondChoice: int
+    veto: int
+    firstChoiceShare: float  # Share of all people who want this section first
+    vetoRate: float          # Share of all people who veto this section
+
+class DemandSummary(BaseModel):
+    sessions: int
+    people: int
+    sections: List[SectionDemand]
+
+class TrendPoint(BaseModel):
+    period: str
+    assignments: int
+    people: int
+    firstChoiceRate: Optional[float] = None
+    secondChoiceRate: Optional[float] = None
+    vetoRate: Optional[float] = None
+    limitViolations: int
+
+class AssignmentTrends(BaseModel):
+    bucket: str
+    days: Optional[int] = None
+    points: List[TrendPoint]
+
+class ArchiveImportResult(BaseModel):
+    inserted: Dict[str, int]  # documents per collection
+    skipped_sessions: int = 0
+
+class SweepReport(BaseModel):
+    started_at: datetime
+    cutoff: datetime  # Sessions last accessed before this were expired
+    duration_ms: float
+    deleted: Dict[str, int]  # documents per collection
+
+class SweepStatus(BaseModel):
+    ttl_days: float
+    interval_seconds: float
+    deleted: Dict[str, int]  # documents per collection since the worker started
+    sweeps: List[SweepReport]  # most recent first
@@ -0,0 +1,69 @@
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from models import Person
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy suggestion
+SUGGESTION_THRESHOLD = 0.4
+MAX_SUGGESTIONS = 3
+
+
+def normalize_name(name: str) -> str:
+    """Case-folded, accent-free name with runs of whitespace collapsed to one space"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Lookup of people by normalized name, built once per roster.
+
+    Lookups are O(1). Two people whose names normalize to the same key make
+    that key ambiguous, unless the name given matches exactly one of them;
+    two people with the very same name always are. The trigram index for
+    suggestions is only built when first used.
+    """
+
+    def __init__(self, people: List[Person]):
+        self.people = people
+        self.by_key: Dict[str, List[Person]] = {}
+        for person in people:
+            self.by_key.setdefault(normalize_name(person.name), []).append(person)
+        self._trigrams: Optional[Dict[str, List[str]]] = None
+
+    def candidates(self, name: str) -> List[Person]:
+        """Everyone whose name normalizes like this one"""
+        return self.by_key.get(normalize_name(name), [])
+
+    def find(self, name: str) -> Optional[Person]:
+        """The person this name refers to, or None if unknown or ambiguous"""
+        candidates = self.candidates(name)
+        exact = [person for person in candidates if person.name == name]
+        if exact:
+            candidates = exact
+        # Several people with this very name can only be told apart by ID
+        return candidates[0] if len(candidates) == 1 else None
+
+    def suggest(self, name: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        """Closest registered names by trigram similarity"""
+        if self._trigrams is None:
+            self._trigrams = {}
+            for key in self.by_key:
+                for gram in trigrams(key):
+                    self._trigrams.setdefault(gram, []).append(key)
+
+        grams = trigrams(normalize_name(name))
+        shared = Counter(key for gram in grams for key in self._trigrams.get(gram, ()))
+        scored = []
+        for key, common in shared.items():
+            similarity = 2 * common / (len(grams) + len(trigrams(key)))
+            if similarity >= SUGGESTION_THRESHOLD:
+                scored.append((-similarity, key))
+        scored.sort()
+        return [self.by_key[key][0].name for _, key in scored[:limit]]
@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, Optional
+from models import Person, AssignmentOperation
+
+# A compacted snapshot is stored every this many operations, bounding replay length
+SNAPSHOT_INTERVAL = 50
+
+
+class AssignmentIndex:
+    """Sections as insertion-ordered dicts keyed by person ID, for replaying many operations.
+
+    Building it is O(n); after that, looking a person up, removing them from a
+    section and appending them to another are all O(1), and the order inside
+    each section is the same as with the plain lists (a moved person goes to
+    the end). A single move is cheaper with move_in_lists.
+    """
+
+    def __init__(self, assignments: Dict[str, List[Person]]):
+        self.sections: Dict[str, Dict[str, Person]] = {
+            section: {person.id: person for person in people} for section, people in assignments.items()
+        }
+        self.location: Dict[str, str] = {
+            person_id: section for section, people in self.sections.items() for person_id in people
+        }
+
+    def find(self, section: str, person_id: Optional[str] = None,
+             person_name: Optional[str] = None) -> Optional[Person]:
+        """A person in a section by ID; by name (linear) only when no ID is known"""
+        people = self.sections.get(section, {})
+        if person_id is not None:
+            return people.get(person_id)
+        for person in people.values():
+            if person.name == person_name:
+                return person
+        return None
+
+    def section_of(self, person_id: str) -> Optional[str]:
+        return self.location.get(person_id)
+
+    def move(self, person_id: str, to_section: str) -> Person:
+        person = self.sections[self.location[person_id]].pop(person_id)
+        self.sections[to_section][person_id] = person
+        self.location[person_id] = to_section
+        return person
+
+    def to_assignments(self) -> Dict[str, List[Person]]:
+        return {section: list(people.values()) for section, people in self.sections.items()}
+
+
+def apply_move(index: AssignmentIndex, from_section: str, to_section: str,
+               person_id: Optional[str] = None, person_name: Optional[str] = None) -> Optional[Person]:
+    """Move a person between sections in the index; returns the person or None if not found"""
+    person = index.find(from_section, person_id, person_name)
+    if person is None:
+        return None
+    return index.move(person.id, to_section)
+
+
+def move_in_lists(assignments: Dict[str, List[Person]], from_section: str, to_section: str,
+                  person_id: Optional[str] = None, person_name: Optional[str] = None) -> Optional[Person]:
+    """Move one person between section lists in place, scanning only the source section.
+
+    Without an ID the first person with the name is moved; callers check for namesakes first.
+    """
+    people = assignments[from_section]
+    for position, person in enumerate(people):
+        if person.id == person_id if person_id is not None else person.name == person_name:
+            assignments[to_section].append(people.pop(position))
+            return person
+    return None
+
+
+def replay(assignments: Dict[str, List[Person]], operations: Iterable[AssignmentOperation]) -> Dict[str, List[Person]]:
+    """Apply logged operations in order on top of a base state"""
+    index = AssignmentIndex(assignments)
+    for operation in operations:
+        # Operations logged before person IDs existed only carry the name
+        apply_move(index, operation.from_section, operation.to_section,
+                   operation.person_id, operation.person_name)
+    return index.to_assignments()
+
+
+def compact_snapshot(assignments: Dict[str, List[Person]]) -> Dict[str, List[str]]:
+    """Snapshot as person IDs per section; person data never changes during edits"""
+    return {section: [person.id for person in people] for section, people in assignments.items()}
+
+
+def restore_snapshot(sections: Dict[str, List[str]], base: Dict[str, List[Person]]) -> Dict[str, List[Person]]:
+    """Rebuild a full state from a compact snapshot using the people of the base assignment"""
+    # Snapshots written before person IDs existed hold names instead
+    people_by_key = {person.name: person for people in base.values() for person in people}
+    people_by_key.update({person.id: person for people in base.values() for person in people})
+    return {section: [people_by_key[key] for key in keys] for section, keys in sections.items()}
@@ -0,0 +1,126 @@
+import itertools
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from models import (Person, SectionLimit, SectionLimits, ContinuityItem, RestrictionPriorities,
+                    ScenarioResult, GroupConstraint)
+from assignment_algorithm import SectionAssigner
+
+# Hard cap on the size of a single sweep (limits variants x priorities variants)
+MAX_SCENARIOS = 1000
+
+# Below this many scenarios the process pool costs more than it saves
+PARALLEL_THRESHOLD = 32
+
+# Scenarios per pool task; the evaluator is pickled once per task
+SCENARIOS_PER_TASK = 16
+
+# (limits variant index, priorities variant index); None means "use the session's saved value"
+ScenarioKey = Tuple[Optional[int], Optional[int]]
+
+
+class ScenarioEvaluator:
+    """Evaluates limit/priority variants of one session without touching the database.
+
+    The continuity placement and the pool of remaining people only depend on the
+    roster, so they are computed once and shared by every scenario.
+    """
+
+    def __init__(self, people: List[Person], limits: SectionLimits,
+                 continuity_list: List[ContinuityItem], priorities: RestrictionPriorities,
+                 strategy: str = "greedy", sections: Optional[List[str]] = None,
+                 constraints: Optional[List[GroupConstraint]] = None):
+        self.strategy = strategy
+        self.sections = sections
+        self.constraints = constraints
+        self.limits = limits
+        self.priorities = priorities
+        self.people = people
+        self.continuity_list = continuity_list
+        base = SectionAssigner(people, limits, continuity_list, priorities, sections=sections)
+        self.base_assignments, self.remaining_people = base.assign_continuity()
+
+    def evaluate(self, limits_override: Optional[Dict[str, SectionLimit]],
+                 priorities_override: Optional[Dict[str, int]], seed: int):
+        """Run one scenario and return its statistics"""
+        limits = self.limits
+        if limits_override:
+            limits = SectionLimits(session_id=self.limits.session_id,
+                                   limits={**self.limits.limits, **limits_override})
+        priorities = self.priorities
+        if priorities_override:
+            priorities = RestrictionPriorities(session_id=self.priorities.session_id,
+                                               priorities={**self.priorities.priorities, **priorities_override})
+
+        assigner = SectionAssigner(self.people, limits, self.continuity_list, priorities,
+                                   rng=random.Random(seed), strategy=self.strategy, sections=self.sections,
+                                   constraints=self.constraints)
+        if self.strategy == "lexicographic":
+            # The solver places continuity itself, according to its priority level
+            assignments = assigner.assign_people()
+        else:
+            assignments = {section: list(people) for section, people in self.base_assignments.items()}
+            assignments = assigner.assign_remaining(assignments, list(self.remaining_people))
+        return assigner.calculate_statistics(assignments)
+
+
+def build_grid(limits_variants: List[Dict[str, SectionLimit]],
+               priorities_variants: List[Dict[str, int]]) -> List[ScenarioKey]:
+    """Cartesian product of the variant indexes; an empty axis means the saved value"""
+    limit_keys = list(range(len(limits_variants))) or [None]
+    priority_keys = list(range(len(priorities_variants))) or [None]
+    return list(itertools.product(limit_keys, priority_keys))
+
+
+def create_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """Long-lived pool for large sweeps (SCENARIO_WORKERS, default one per CPU); None on a single CPU.
+
+    Workers are spawned, not forked: a fork of the server copies the Mongo
+    driver's background threads' locks in whatever state they were in.
+    """
+    workers = workers or int(os.environ.get("SCENARIO_WORKERS", 0)) or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _evaluate_keys(evaluator: ScenarioEvaluator, keys: List[ScenarioKey],
+                   limits_variants, priorities_variants, seed: int) -> List[ScenarioResult]:
+    results = []
+    for limits_index, priorities_index in keys:
+        statistics = evaluator.evaluate(
+            limits_variants[limits_index] if limits_index is not None else None,
+            priorities_variants[priorities_index] if priorities_index is not None else None,
+            seed
+        )
+        results.append(ScenarioResult(
+            limits_variant=limits_index,
+            priorities_variant=priorities_index,
+            statistics=statistics
+        ))
+    return results
+
+
+def evaluate_scenarios(evaluator: ScenarioEvaluator,
+                       limits_variants: List[Dict[str, SectionLimit]],
+                       priorities_variants: List[Dict[str, int]],
+                       seed: int, pool: Optional[ProcessPoolExecutor] = None) -> List[ScenarioResult]:
+    """Evaluate the whole grid, fanning large sweeps out to pool (see create_pool).
+
+    Every scenario uses the same seed so differences between rows come from the
+    configuration and not from the random tie-breaking.
+    """
+    keys = build_grid(limits_variants, priorities_variants)
+    if pool is None or len(keys) < PARALLEL_THRESHOLD:
+        return _evaluate_keys(evaluator, keys, limits_variants, priorities_variants, seed)
+
+    chunks = [keys[i:i + SCENARIOS_PER_TASK] for i in range(0, len(keys), SCENARIOS_PER_TASK)]
+    results = []
+    for chunk_results in pool.map(_evaluate_keys, itertools.repeat(evaluator), chunks,
+                                  itertools.repeat(limits_variants), itertools.repeat(priorities_variants),
+                                  itertools.repeat(seed)):
+        results.extend(chunk_results)
+    return results
@@ -1,22 +1,45 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
+from contextlib import asynccontextmanager
 import os
+import asyncio
+import json
 import logging
+import random
 import uuid
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
 
 # Import our models and services
 from models import *
 from database import database
 from assignment_algorithm import SectionAssigner
+from coalescing import SingleFlight
+from diagnostics import diagnose
+from events import broker, EventRelay
+from operation_log import move_in_lists, replay, restore_snapshot
+from exporters import EXPORTERS, EXPORT_FORMATS
+from archive import read_archive, write_archive
+from expiry import SessionSweeper
+from name_index import NameIndex
+from analytics import analytics_cache, TREND_BUCKETS
+from scenarios import ScenarioEvaluator, evaluate_scenarios, build_grid, create_pool, MAX_SCENARIOS
+from fairness import fairness_report, MAX_SIMULATIONS, MAX_GROUPED_SIMULATIONS
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create the main app
-app = FastAPI()
+# Deletes sessions nobody has used for SESSION_TTL_DAYS
+session_sweeper = SessionSweeper.from_env(database)
+
+# Delivers SSE events published by the other workers
+event_relay = EventRelay.from_env(broker, database)
+
+# Process pool for large scenario sweeps, created by lifespan; None on a single CPU
+scenario_pool = None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -33,6 +56,21 @@ logger = logging.getLogger(__name__)
 async def root():
     return {"message": "Organizador de Secciones API"}
 
+@api_router.get("/health/live")
+async def liveness():
+    """The process is up; never touches the database"""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def readiness(request: Request):
+    """Ready once the connection pool is warm and the database answers"""
+    warm_up = getattr(request.app.state, "warm_up", None)
+    if warm_up is not None and not warm_up.done():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    if not await database.ping():
+        return JSONResponse(status_code=503, content={"status": "database_unavailable"})
+    return {"status": "ready"}
+
 # Session Management
 @api_router.post("/session")
 async def create_session():
@@ -60,12 +98,85 @@ async def save_people(people_data: PersonList):
     raise HTTPException(status_code=500, detail="Error al guardar la lista de personas")
 
 @api_router.get("/people/{session_id}")
-async def get_people(session_id: str):
-    """Get people list for a session"""
+async def get_people(session_id: str, view: str = Query("full")):
+    """Get people list for a session: full records, names only ("compact") or counts ("stats")"""
+    _check_view(view)
+    if view == "compact":
+        return {"people": await database.get_people_field(session_id, "name")}
+    if view == "stats":
+        first_choices = await database.get_people_field(session_id, "option1")
+        counts: Dict[str, int] = {}
+        for section in first_choices:
+            counts[section] = counts.get(section, 0) + 1
+        return {"total": len(first_choices), "firstChoice": counts}
     people = await database.get_people(session_id)
     return {"people": [person.dict() for person in people]}
 
+@api_router.patch("/people/{session_id}")
+async def patch_people(session_id: str, patch: PeoplePatch):
+    """Add, update or remove individual people by ID"""
+    given_ids = {person.id for person in patch.add if person.id}
+    if given_ids:
+        existing = given_ids.intersection(await database.get_people_field(session_id, "id"))
+        if existing:
+            raise HTTPException(status_code=400, detail=f"Ya existen personas con estos IDs: {', '.join(sorted(existing))}")
+    named = []
+    for person in [*patch.add, *patch.update]:
+        named += [person.option1, person.option2, person.veto, *(person.preferences or []), *(person.vetoes or [])]
+    await _check_known_sections(session_id, named)
+    try:
+        added_ids = await database.patch_people(session_id, patch)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if added_ids is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {
+        "session_id": session_id,
+        "added": added_ids,
+        "message": f"{len(patch.add)} añadidas, {len(patch.update)} actualizadas, {len(patch.remove)} eliminadas"
+    }
+
+async def _check_known_sections(session_id: str, named: List[Optional[str]]):
+    """Reject section names outside the session's section set; "Ninguna" means no veto"""
+    named = {section for section in named if section and section != "Ninguna"}
+    if not named:
+        return
+    unknown = named.difference(await database.get_sections(session_id))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Secciones desconocidas: {', '.join(sorted(unknown))}")
+
 # Section Limits Management
+@api_router.post("/sections")
+async def save_sections(section_data: SectionList):
+    """Save the section set of a session (defaults to the five scout sections)"""
+    session_id = section_data.session_id or str(uuid.uuid4())
+    sections = _clean_sections(section_data.sections)
+    
+    success = await database.save_sections(session_id, sections)
+    if success:
+        return {"session_id": session_id, "message": f"{len(sections)} secciones guardadas"}
+    raise HTTPException(status_code=500, detail="Error al guardar las secciones")
+
+def _clean_sections(sections: List[str]) -> List[str]:
+    """Trimmed section names, or an HTTP error if they can't be used as a section set"""
+    sections = [section.strip() for section in sections]
+    if any(not section for section in sections):
+        raise HTTPException(status_code=400, detail="Los nombres de sección no pueden estar vacíos")
+    if len(set(sections)) != len(sections):
+        raise HTTPException(status_code=400, detail="Hay secciones repetidas")
+    if "Ninguna" in sections:
+        raise HTTPException(status_code=400, detail="'Ninguna' no puede ser el nombre de una sección")
+    # Section names are keys of the stored assignment, and Mongo reads "." and "$" in keys as paths and operators
+    if any("." in section or "$" in section for section in sections):
+        raise HTTPException(status_code=400, detail="Los nombres de sección no pueden contener '.' ni '$'")
+    return sections
+
+@api_router.get("/sections/{session_id}")
+async def get_sections(session_id: str):
+    """Get the section set of a session"""
+    sections = await database.get_sections(session_id)
+    return {"sections": sections}
+
 @api_router.post("/limits")
 async def save_limits(limits_data: SectionLimitsCreate, session_id: Optional[str] = None):
     """Save section limits for a session"""
@@ -100,6 +211,81 @@ async def get_continuity_list(session_id: str):
     continuity_list = await database.get_continuity_list(session_id)
     return {"continuity_list": [item.dict() for item in continuity_list]}
 
+@api_router.get("/continuity/{session_id}/matches", response_model=ContinuityMatchReport)
+async def match_continuity_list(session_id: str):
+    """Report how each continuity item resolves to a registered person"""
+    people = await database.get_people(session_id)
+    continuity_list = await database.get_continuity_list(session_id)
+    
+    name_index = NameIndex(people)
+    people_by_id = {person.id: person for person in people}
+    items = []
+    for item in continuity_list:
+        match = ContinuityMatch(id=item.id, name=item.name, status="unmatched")
+        if item.person_id is not None:
+            person = people_by_id.get(item.person_id)
+        else:
+            person = name_index.find(item.name)
+        if person is not None:
+            if item.person_id is not None:
+                match.status = "id"
+            else:
+                match.status = "exact" if person.name == item.name else "normalized"
+            match.person_id = person.id
+            match.person_name = person.name
+        elif item.person_id is None and name_index.candidates(item.name):
+            match.status = "ambiguous"
+            match.candidates = [candidate.name for candidate in name_index.candidates(item.name)]
+        else:
+            match.suggestions = name_index.suggest(item.name)
+        items.append(match)
+    
+    statuses = [match.status for match in items]
+    return ContinuityMatchReport(
+        session_id=session_id,
+        matched=statuses.count("id") + statuses.count("exact") + statuses.count("normalized"),
+        ambiguous=statuses.count("ambiguous"),
+        unmatched=statuses.count("unmatched"),
+        items=items
+    )
+
+@api_router.patch("/continuity/{session_id}")
+async def patch_continuity_list(session_id: str, patch: ContinuityPatch):
+    """Add, update or remove individual continuity items by ID"""
+    await _check_known_sections(session_id, [item.section for item in [*patch.add, *patch.update]])
+    added_ids = await database.patch_continuity_list(session_id, patch)
+    if added_ids is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {
+        "session_id": session_id,
+        "added": added_ids,
+        "message": f"{len(patch.add)} añadidos, {len(patch.update)} actualizados, {len(patch.remove)} eliminados"
+    }
+
+# Group Constraints Management
+@api_router.post("/constraints")
+async def save_constraints(constraint_data: GroupConstraintList):
+    """Save the together/apart constraints of a session (people are referenced by ID)"""
+    session_id = constraint_data.session_id or str(uuid.uuid4())
+    _check_constraint_kinds(constraint_data.constraints)
+    
+    success = await database.save_constraints(session_id, constraint_data.constraints)
+    if success:
+        return {"session_id": session_id,
+                "message": f"{len(constraint_data.constraints)} restricciones de grupo guardadas"}
+    raise HTTPException(status_code=500, detail="Error al guardar las restricciones de grupo")
+
+def _check_constraint_kinds(constraints: List[GroupConstraintCreate]):
+    for constraint in constraints:
+        if constraint.kind not in CONSTRAINT_KINDS:
+            raise HTTPException(status_code=400, detail=f"Tipo de restricción desconocido: {constraint.kind}")
+
+@api_router.get("/constraints/{session_id}")
+async def get_constraints(session_id: str):
+    """Get the together/apart constraints of a session"""
+    constraints = await database.get_constraints(session_id)
+    return {"constraints": [constraint.dict() for constraint in constraints]}
+
 # Restriction Priorities Management
 @api_router.post("/priorities")
 async def save_priorities(priorities_data: RestrictionPrioritiesCreate, session_id: Optional[str] = None):
@@ -120,9 +306,73 @@ async def get_priorities(session_id: str):
     raise HTTPException(status_code=404, detail="Prioridades no encontradas para esta sesión")
 
 # Main Assignment Algorithm
+# Concurrent identical /assign requests handled by this worker share one computation
+assign_flights = SingleFlight()
+
+# Seconds a worker may hold a session's assignment lock, and how long others wait for it
+ASSIGN_LOCK_TTL = 60
+ASSIGN_LOCK_WAIT = 30
+
+@asynccontextmanager
+async def _session_lock(session_id: str):
+    """Cross-worker lock in Mongo so only one assignment run per session writes at a time"""
+    loop = asyncio.get_running_loop()
+    name = f"assign:{session_id}"
+    owner = str(uuid.uuid4())
+    deadline = loop.time() + ASSIGN_LOCK_WAIT
+    delay = 0.05
+    while not await database.acquire_lock(name, owner, ASSIGN_LOCK_TTL):
+        if loop.time() >= deadline:
+            raise HTTPException(status_code=409, detail="Ya hay una asignación en curso para esta sesión")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    try:
+        yield
+    finally:
+        await database.release_lock(name, owner)
+
 @api_router.post("/assign", response_model=AssignmentResponse)
-async def assign_people(request: AssignmentRequest):
-    """Execute the assignment algorithm"""
+async def assign_people(request: AssignmentRequest, view: str = Query("full")):
+    """Execute the assignment algorithm; view="compact" or "stats" returns a slimmer response"""
+    _check_view(view)
+    key = json.dumps(request.dict(), sort_keys=True)
+    response = await assign_flights.run(key, lambda: _assign_with_lock(request))
+    if view == "full":
+        return response
+    # Skips the response model: only the requested parts are built and serialized
+    data = {
+        "success": response.success,
+        "session_id": response.session_id,
+        "assignment": _assignment_view(response.assignment, view),
+        "message": response.message
+    }
+    if response.trace is not None:
+        data["trace"] = response.trace.dict()
+    return JSONResponse(data)
+
+def _check_view(view: str):
+    if view not in RESPONSE_VIEWS:
+        raise HTTPException(status_code=400, detail=f"Vista desconocida: {view}")
+
+def _assignment_view(assignment: Assignment, view: str) -> Dict:
+    """An assignment with names instead of person records ("compact") or without people ("stats")"""
+    data = {
+        "id": assignment.id,
+        "session_id": assignment.session_id,
+        "created_at": assignment.created_at.isoformat(),
+        "statistics": assignment.statistics.dict()
+    }
+    if view == "compact":
+        data["assignments"] = {section: [person.name for person in people]
+                               for section, people in assignment.assignments.items()}
+    return data
+
+async def _assign_with_lock(request: AssignmentRequest) -> AssignmentResponse:
+    async with _session_lock(request.session_id):
+        return await _run_assignment(request)
+
+async def _run_assignment(request: AssignmentRequest) -> AssignmentResponse:
+    """Load the session, run the algorithm and save the result"""
     session_id = request.session_id
     
     # Get all required data
@@ -130,21 +380,76 @@ async def assign_people(request: AssignmentRequest):
     limits = await database.get_limits(session_id)
     continuity_list = await database.get_continuity_list(session_id)
     priorities = await database.get_priorities(session_id)
+    sections = await database.get_sections(session_id)
+    constraints = await database.get_constraints(session_id)
     
+    _validate_assignment_inputs(people, limits, continuity_list, request.strategy, sections, constraints)
+    
+    previous = None
+    if request.incremental:
+        current = await database.get_assignment(session_id)
+        previous = current.assignments if current else None
+    return await _execute_assignment(session_id, people, limits, continuity_list, priorities,
+                                     request.strategy, sections, previous, constraints, trace=request.trace)
+
+def _validate_assignment_inputs(people: List[Person], limits: Optional[SectionLimits],
+                                continuity_list: List[ContinuityItem], strategy: str,
+                                sections: List[str], constraints: Optional[List[GroupConstraint]] = None):
+    """Raise an HTTP error for inputs the algorithm can't work with"""
     # Validate required data
     if not people:
         raise HTTPException(status_code=400, detail="No hay personas registradas para esta sesión")
     if not limits:
         raise HTTPException(status_code=400, detail="No hay límites configurados para esta sesión")
     
+    if strategy not in ASSIGNMENT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Estrategia de asignación desconocida: {strategy}")
+    
+    # Reject inputs that can't be satisfied before running the algorithm
+    report = diagnose(people, limits, continuity_list, sections, constraints)
+    if not report.feasible:
+        raise InfeasibleInputs([issue for issue in report.issues if issue.severity == "error"])
+
+class InfeasibleInputs(Exception):
+    """Inputs the diagnostics reject; answered with 422 by _infeasible_inputs_response"""
+    
+    def __init__(self, issues: List[DiagnosticIssue]):
+        super().__init__("La configuración no se puede satisfacer")
+        self.issues = issues
+
+async def _infeasible_inputs_response(request: Request, error: InfeasibleInputs) -> JSONResponse:
+    """detail stays a readable string for clients that show it as is; the issues go alongside"""
+    return JSONResponse(status_code=422, content={
+        "detail": f"{error}: " + "; ".join(issue.message for issue in error.issues),
+        "issues": [issue.dict() for issue in error.issues]
+    })
+
+async def _execute_assignment(session_id: str, people: List[Person], limits: SectionLimits,
+                              continuity_list: List[ContinuityItem],
+                              priorities: Optional[RestrictionPriorities], strategy: str, sections: List[str],
+                              previous: Optional[Dict[str, List[Person]]] = None,
+                              constraints: Optional[List[GroupConstraint]] = None,
+                              configuration: Optional[Dict[str, Any]] = None,
+                              trace: bool = False) -> AssignmentResponse:
+    """Run the algorithm on validated inputs and save the result; warm-started when previous is given.
+
+    configuration holds session fields saved in the same write as the result. With trace the
+    response also explains every placement and profiles each phase, saving included.
+    """
     # Use default priorities if not set
     if not priorities:
         priorities = RestrictionPriorities(session_id=session_id)
     
     try:
         # Execute assignment algorithm
-        assigner = SectionAssigner(people, limits, continuity_list, priorities)
-        assignments = assigner.assign_people()
+        assigner = SectionAssigner(people, limits, continuity_list, priorities,
+                                   strategy=strategy, sections=sections, constraints=constraints, trace=trace)
+        message = "Asignación completada exitosamente"
+        if previous is None:
+            assignments = assigner.assign_people()
+        else:
+            assignments, reassigned = assigner.assign_incremental(previous)
+            message = f"Reasignación incremental completada: {len(reassigned)} personas reubicadas"
         statistics = assigner.calculate_statistics(assignments)
         
         # Create assignment object
@@ -155,29 +460,193 @@ async def assign_people(request: AssignmentRequest):
         )
         
         # Save assignment
-        success = await database.save_assignment(assignment)
+        success = await database.save_assignment(assignment, configuration)
         if not success:
             raise HTTPException(status_code=500, detail="Error al guardar la asignación")
+        assigner.lap("save")
+        
+        broker.publish(session_id, "assignment", {
+            "assignment_id": assignment.id,
+            "statistics": statistics.dict()
+        })
         
         return AssignmentResponse(
             success=True,
             session_id=session_id,
-            assignment=assignment
+            assignment=assignment,
+            message=message,
+            trace=assigner.trace_report(assignments)
         )
         
     except Exception as e:
         logger.error(f"Error in assignment algorithm: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error en el algoritmo de asignación: {str(e)}")
 
+@api_router.post("/run", response_model=AssignmentResponse)
+async def setup_and_assign(setup: SessionSetupRequest):
+    """Save a whole configuration and run the assignment in a single request"""
+    session_id = setup.session_id or str(uuid.uuid4())
+    people = await database.stable_people(session_id, setup.people)
+    limits = SectionLimits(session_id=session_id, limits=setup.limits)
+    setup_sections = _clean_sections(setup.sections) if setup.sections is not None else None
+    sections = setup_sections or await database.get_sections(session_id)
+    continuity_list = [ContinuityItem(**item.dict(), session_id=session_id) for item in setup.continuity_list]
+    priorities = None
+    if setup.priorities is not None:
+        priorities = RestrictionPriorities(session_id=session_id, priorities=setup.priorities)
+    if setup.constraints is not None:
+        _check_constraint_kinds(setup.constraints)
+        constraints = [GroupConstraint(**item.dict(), session_id=session_id) for item in setup.constraints]
+    else:
+        constraints = await database.get_constraints(session_id)
+    
+    # Validate once, before anything is written
+    _validate_assignment_inputs(people, limits, continuity_list, setup.strategy, sections, constraints)
+    
+    # The configuration is only stored together with its result
+    configuration = database.configuration_fields(people, limits, continuity_list, priorities, setup_sections,
+                                                  constraints if setup.constraints is not None else None)
+    async with _session_lock(session_id):
+        return await _execute_assignment(session_id, people, limits, continuity_list, priorities,
+                                         setup.strategy, sections, constraints=constraints,
+                                         configuration=configuration)
+
+# Feasibility Diagnostics
+@api_router.post("/diagnostics", response_model=DiagnosticsReport)
+async def run_diagnostics(request: AssignmentRequest):
+    """Check whether a session's inputs can be satisfied and bound the achievable satisfaction"""
+    session_id = request.session_id
+    people = await database.get_people(session_id)
+    limits = await database.get_limits(session_id)
+    continuity_list = await database.get_continuity_list(session_id)
+    sections = await database.get_sections(session_id)
+    constraints = await database.get_constraints(session_id)
+    
+    if not limits:
+        raise HTTPException(status_code=400, detail="No hay límites configurados para esta sesión")
+    return diagnose(people, limits, continuity_list, sections, constraints)
+
+# What-if Scenario Sweep
+@api_router.post("/scenarios", response_model=ScenarioResponse)
+async def run_scenarios(request: ScenarioRequest):
+    """Evaluate a grid of limit and priority variants without saving anything"""
+    session_id = request.session_id
+    
+    people = await database.get_people(session_id)
+    limits = await database.get_limits(session_id)
+    continuity_list = await database.get_continuity_list(session_id)
+    priorities = await database.get_priorities(session_id) or RestrictionPriorities(session_id=session_id)
+    
+    if not people:
+        raise HTTPException(status_code=400, detail="No hay personas registradas para esta sesión")
+    if not limits:
+        raise HTTPException(status_code=400, detail="No hay límites configurados para esta sesión")
+    if request.strategy not in ASSIGNMENT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Estrategia de asignación desconocida: {request.strategy}")
+    if len(build_grid(request.limits_variants, request.priorities_variants)) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Se permiten como máximo {MAX_SCENARIOS} escenarios por petición")
+    
+    seed = request.seed if request.seed is not None else random.randrange(2 ** 32)
+    try:
+        sections = await database.get_sections(session_id)
+        constraints = await database.get_constraints(session_id)
+        evaluator = ScenarioEvaluator(people, limits, continuity_list, priorities, request.strategy,
+                                      sections, constraints)
+        # CPU-bound: keep it off the event loop
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, evaluate_scenarios, evaluator,
+            request.limits_variants, request.priorities_variants, seed, scenario_pool
+        )
+    except Exception as e:
+        logger.error(f"Error in scenario sweep: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al evaluar los escenarios: {str(e)}")
+    
+    return ScenarioResponse(session_id=session_id, seed=seed, scenarios=results)
+
+# Fairness Analysis
+@api_router.post("/fairness", response_model=FairnessReport)
+async def run_fairness_report(request: FairnessRequest):
+    """Per-person probabilities of getting each preference, over many seeded runs"""
+    session_id = request.session_id
+    
+    people = await database.get_people(session_id)
+    limits = await database.get_limits(session_id)
+    continuity_list = await database.get_continuity_list(session_id)
+    priorities = await database.get_priorities(session_id) or RestrictionPriorities(session_id=session_id)
+    sections = await database.get_sections(session_id)
+    constraints = await database.get_constraints(session_id)
+    
+    _validate_assignment_inputs(people, limits, continuity_list, request.strategy, sections, constraints)
+    if request.simulations > MAX_SIMULATIONS:
+        raise HTTPException(status_code=400, detail=f"Se permiten como máximo {MAX_SIMULATIONS} simulaciones por petición")
+    if constraints and request.simulations > MAX_GROUPED_SIMULATIONS:
+        raise HTTPException(status_code=400, detail=f"Con restricciones de grupo se permiten como máximo "
+                                                    f"{MAX_GROUPED_SIMULATIONS} simulaciones por petición")
+    
+    seed = request.seed if request.seed is not None else random.randrange(2 ** 32)
+    try:
+        # CPU-bound: keep it off the event loop
+        rows, metrics, analytic = await asyncio.get_running_loop().run_in_executor(
+            None, fairness_report, people, limits, continuity_list, priorities,
+            request.strategy, request.simulations, seed, sections, constraints
+        )
+    except Exception as e:
+        logger.error(f"Error in fairness report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al calcular el informe de equidad: {str(e)}")
+    
+    return FairnessReport(
+        session_id=session_id,
+        strategy=request.strategy,
+        simulations=1 if analytic else request.simulations,
+        seed=seed,
+        analytic=analytic,
+        people=rows,
+        metrics=metrics
+    )
+
 # Assignment Results and Statistics
 @api_router.get("/assignments/{session_id}")
-async def get_assignment(session_id: str):
-    """Get latest assignment for a session"""
-    assignment = await database.get_assignment(session_id)
+async def get_assignment(session_id: str, view: str = Query("full")):
+    """Get latest assignment for a session; view="compact" or "stats" is read without the person records"""
+    _check_view(view)
+    if view == "full":
+        assignment = await database.get_assignment(session_id)
+    else:
+        assignment = await database.get_assignment_summary(session_id, names=view == "compact")
     if assignment:
-        return assignment.dict()
+        return assignment.dict() if view == "full" else assignment
     raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
 
+@api_router.get("/assignments/{session_id}/export")
+async def export_assignment(session_id: str, export_format: str = Query("csv", alias="format")):
+    """Stream the current assignment section by section as CSV, NDJSON or XLSX"""
+    if export_format not in EXPORTERS:
+        raise HTTPException(status_code=400, detail=f"Formato de exportación no soportado: {export_format}")
+    sections = await database.get_assignment_sections(session_id)
+    if sections is None:
+        raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
+    
+    async def section_stream():
+        # Only one section's people are held in memory at a time
+        for section in sections:
+            yield section, await database.get_assignment_section(session_id, section)
+    
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        EXPORTERS[export_format](section_stream()),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="asignacion-{session_id}.{extension}"'}
+    )
+
+@api_router.get("/assignments/{session_id}/events")
+async def assignment_events(session_id: str):
+    """Server-sent events with move and statistics deltas for a session"""
+    return StreamingResponse(
+        broker.stream(session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/statistics/{session_id}")
 async def get_statistics(session_id: str):
     """Get assignment statistics for a session"""
@@ -187,53 +656,244 @@ async def get_statistics(session_id: str):
     raise HTTPException(status_code=404, detail="No hay estadísticas para esta sesión")
 
 # Manual Person Movement
+async def _calculate_statistics(session_id: str, assignments: Dict[str, List[Person]]) -> AssignmentStatistics:
+    """Recalculate statistics for an edited assignment with the session's current configuration"""
+    people = await database.get_people(session_id)
+    limits = await database.get_limits(session_id)
+    sections = await database.get_sections(session_id)
+    # The sections or limits can change after the assignment was made
+    if (set(assignments) != set(sections) or limits is None
+            or any(section not in limits.limits for section in assignments)):
+        raise HTTPException(status_code=409, detail="Las secciones de la sesión han cambiado, vuelve a ejecutar la asignación")
+    continuity_list = await database.get_continuity_list(session_id)
+    priorities = await database.get_priorities(session_id) or RestrictionPriorities(session_id=session_id)
+    
+    constraints = await database.get_constraints(session_id)
+    
+    assigner = SectionAssigner(people, limits, continuity_list, priorities, sections=sections,
+                               constraints=constraints)
+    return assigner.calculate_statistics(assignments)
+
+def _publish_move(session_id: str, person: Person, from_section: str, to_section: str,
+                  statistics: AssignmentStatistics):
+    broker.publish(session_id, "move", {
+        "person_id": person.id,
+        "person_name": person.name,
+        "from_section": from_section,
+        "to_section": to_section,
+        "sectionCounts": {
+            from_section: statistics.sectionCounts[from_section],
+            to_section: statistics.sectionCounts[to_section]
+        },
+        "satisfaction": statistics.satisfaction.dict(),
+        "withinLimits": statistics.withinLimits
+    })
+
 @api_router.post("/assignments/{session_id}/move")
 async def move_person(session_id: str, move_request: PersonMoveRequest):
     """Move a person between sections manually"""
+    if move_request.person_id is None and move_request.person_name is None:
+        raise HTTPException(status_code=400, detail="Indica el ID o el nombre de la persona")
+    
     assignment = await database.get_assignment(session_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
     
-    # Find and move the person
-    person_to_move = None
-    assignments = assignment.assignments
-    
-    # Find person in from_section
-    for person in assignments[move_request.from_section]:
-        if person.name == move_request.person_name:
-            person_to_move = person
-            break
+    if move_request.from_section not in assignment.assignments or move_request.to_section not in assignment.assignments:
+        raise HTTPException(status_code=400, detail="Sección desconocida")
+    if move_request.from_section == move_request.to_section:
+        raise HTTPException(status_code=400, detail="La sección de origen y destino son la misma")
+    if move_request.person_id is None:
+        namesakes = [person.id for person in assignment.assignments[move_request.from_section]
+                     if person.name == move_request.person_name]
+        if len(namesakes) > 1:
+            raise HTTPException(status_code=409, detail=f"Hay varias personas llamadas {move_request.person_name} "
+                                                        f"en {move_request.from_section}, indica su ID: {', '.join(namesakes)}")
     
+    # Find and move the person
+    person_to_move = move_in_lists(assignment.assignments, move_request.from_section, move_request.to_section,
+                                   move_request.person_id, move_request.person_name)
     if not person_to_move:
         raise HTTPException(status_code=404, detail="Persona no encontrada en la sección especificada")
     
-    # Remove from source section
-    assignments[move_request.from_section] = [
-        p for p in assignments[move_request.from_section] 
-        if p.name != move_request.person_name
-    ]
-    
-    # Add to target section
-    assignments[move_request.to_section].append(person_to_move)
-    
     # Recalculate statistics
-    people = await database.get_people(session_id)
-    limits = await database.get_limits(session_id)
-    continuity_list = await database.get_continuity_list(session_id)
-    priorities = await database.get_priorities(session_id) or RestrictionPriorities(session_id=session_id)
+    new_statistics = await _calculate_statistics(session_id, assignment.assignments)
     
-    assigner = SectionAssigner(people, limits, continuity_list, priorities)
-    new_statistics = assigner.calculate_statistics(assignments)
-    
-    # Update assignment in database
-    success = await database.update_assignment(session_id, assignments, new_statistics)
+    # Append the move to the operation log and apply it in place
+    operation = AssignmentOperation(
+        session_id=session_id,
+        assignment_id=assignment.id,
+        seq=assignment.op_seq + 1,
+        person_id=person_to_move.id,
+        person_name=person_to_move.name,
+        from_section=move_request.from_section,
+        to_section=move_request.to_section
+    )
+    success = await database.record_move(assignment, operation, person_to_move, new_statistics)
     if success:
+        _publish_move(session_id, person_to_move, move_request.from_section,
+                      move_request.to_section, new_statistics)
         return {
-            "message": f"{move_request.person_name} movido de {move_request.from_section} a {move_request.to_section}",
-            "statistics": new_statistics.dict()
+            "message": f"{person_to_move.name} movido de {move_request.from_section} a {move_request.to_section}",
+            "statistics": new_statistics.dict(),
+            "op_seq": operation.seq
         }
     
-    raise HTTPException(status_code=500, detail="Error al actualizar la asignación")
+    raise HTTPException(status_code=409, detail="La asignación ha sido modificada por otra persona, recárgala")
+
+async def _step_history(session_id: str, undo: bool):
+    """Undo the last applied operation or redo the next one"""
+    assignment = await database.get_assignment(session_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
+    
+    if undo:
+        if assignment.op_seq == 0:
+            raise HTTPException(status_code=400, detail="No hay cambios para deshacer")
+        operation = await database.get_operation(session_id, assignment.id, assignment.op_seq)
+        new_seq = assignment.op_seq - 1
+    else:
+        if assignment.op_seq >= assignment.op_head:
+            raise HTTPException(status_code=400, detail="No hay cambios para rehacer")
+        operation = await database.get_operation(session_id, assignment.id, assignment.op_seq + 1)
+        new_seq = assignment.op_seq + 1
+    if not operation:
+        raise HTTPException(status_code=409, detail="El historial de cambios no está disponible")
+    
+    # Undo replays the inverse move
+    from_section, to_section = operation.from_section, operation.to_section
+    if undo:
+        from_section, to_section = to_section, from_section
+    
+    person = move_in_lists(assignment.assignments, from_section, to_section,
+                           operation.person_id, operation.person_name)
+    if not person:
+        raise HTTPException(status_code=409, detail="La asignación no coincide con el historial de cambios")
+    
+    new_statistics = await _calculate_statistics(session_id, assignment.assignments)
+    success = await database.apply_move(session_id, assignment.id, assignment.op_seq, new_seq,
+                                        assignment.op_head, person, from_section, to_section, new_statistics)
+    if not success:
+        raise HTTPException(status_code=409, detail="La asignación ha sido modificada por otra persona, recárgala")
+    
+    _publish_move(session_id, person, from_section, to_section, new_statistics)
+    return {
+        "message": f"{operation.person_name} movido de {from_section} a {to_section}",
+        "statistics": new_statistics.dict(),
+        "op_seq": new_seq
+    }
+
+@api_router.post("/assignments/{session_id}/undo")
+async def undo_move(session_id: str):
+    """Undo the last manual move"""
+    return await _step_history(session_id, undo=True)
+
+@api_router.post("/assignments/{session_id}/redo")
+async def redo_move(session_id: str):
+    """Redo the last undone manual move"""
+    return await _step_history(session_id, undo=False)
+
+@api_router.get("/assignments/{session_id}/history")
+async def get_history(session_id: str):
+    """Get the operation log of the current assignment"""
+    assignment = await database.get_assignment(session_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
+    operations = await database.get_operations(session_id, assignment.id)
+    return {
+        "assignment_id": assignment.id,
+        "op_seq": assignment.op_seq,
+        "op_head": assignment.op_head,
+        "operations": [operation.dict() for operation in operations]
+    }
+
+@api_router.get("/assignments/{session_id}/history/{seq}")
+async def get_history_state(session_id: str, seq: int):
+    """Reconstruct the assignment as it was after a given number of operations"""
+    assignment = await database.get_assignment(session_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="No hay asignaciones para esta sesión")
+    if seq < 0 or seq > assignment.op_head:
+        raise HTTPException(status_code=404, detail="Paso de historial no encontrado")
+    
+    base = await database.get_assignment_record(assignment.id)
+    if not base:
+        raise HTTPException(status_code=404, detail="Asignación original no encontrada")
+    
+    # Start from the nearest snapshot and replay the operations after it
+    snapshot = await database.get_nearest_snapshot(session_id, assignment.id, seq)
+    if snapshot:
+        assignments = restore_snapshot(snapshot["sections"], base.assignments)
+        start_seq = snapshot["seq"]
+    else:
+        assignments = base.assignments
+        start_seq = 0
+    operations = await database.get_operations(session_id, assignment.id, start_seq, seq)
+    assignments = replay(assignments, operations)
+    
+    statistics = await _calculate_statistics(session_id, assignments)
+    return {
+        "seq": seq,
+        "assignments": {section: [person.dict() for person in people] for section, people in assignments.items()},
+        "statistics": statistics.dict()
+    }
+
+# Cross-session Analytics
+@api_router.get("/analytics/demand", response_model=DemandSummary)
+async def get_demand_analytics():
+    """First-choice, second-choice and veto demand per section across all sessions"""
+    async def compute():
+        counts = await database.demand_summary()
+        people = sum(counts["firstChoice"].values())
+        # Sessions can define their own sections; the default ones are listed first
+        seen = set(counts["firstChoice"]) | set(counts["secondChoice"]) | set(counts["veto"])
+        names = SECTIONS + sorted(seen - set(SECTIONS) - {"Ninguna"})
+        sections = [
+            SectionDemand(
+                section=section,
+                firstChoice=counts["firstChoice"].get(section, 0),
+                secondChoice=counts["secondChoice"].get(section, 0),
+                veto=counts["veto"].get(section, 0),
+                firstChoiceShare=round(counts["firstChoice"].get(section, 0) / people, 4) if people else 0.0,
+                vetoRate=round(counts["veto"].get(section, 0) / people, 4) if people else 0.0
+            )
+            for section in names
+        ]
+        return DemandSummary(sessions=counts["sessions"], people=people, sections=sections)
+    
+    return await analytics_cache.get("demand", compute)
+
+@api_router.get("/analytics/trends", response_model=AssignmentTrends)
+async def get_trend_analytics(bucket: str = "day", days: Optional[int] = Query(None, ge=1)):
+    """Average satisfaction and limit violations of assignment runs per day, week or month"""
+    if bucket not in TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Periodo desconocido: {bucket}")
+    
+    async def compute():
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        rows = await database.assignment_trends(TREND_BUCKETS[bucket], since)
+        points = [TrendPoint(period=row["_id"], **{k: v for k, v in row.items() if k != "_id"}) for row in rows]
+        return AssignmentTrends(bucket=bucket, days=days, points=points)
+    
+    return await analytics_cache.get(("trends", bucket, days), compute)
+
+# Session Archives
+@api_router.get("/sessions/archive")
+async def export_sessions(session_id: Optional[List[str]] = Query(None)):
+    """Stream the given sessions (all if none given) with their history as a gzip-compressed NDJSON archive"""
+    return StreamingResponse(
+        write_archive(database.iter_archive(session_id)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="sesiones.ndjson.gz"'}
+    )
+
+@api_router.post("/sessions/archive", response_model=ArchiveImportResult)
+async def import_sessions(request: Request, replace: bool = False):
+    """Load an archive from the request body; existing sessions are skipped unless replace is set"""
+    try:
+        return await database.import_archive(read_archive(request.stream()), replace=replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Archivo de sesiones no válido: {str(e)}")
 
 # Session Cleanup
 @api_router.delete("/session/{session_id}")
@@ -241,28 +901,74 @@ async def delete_session(session_id: str):
     """Delete a session and all its data"""
     success = await database.delete_session(session_id)
     if success:
+        broker.publish(session_id, "deleted", {})
         return {"message": "Sesión eliminada exitosamente"}
     raise HTTPException(status_code=404, detail="Sesión no encontrada")
 
-# Include the router in the main app
-app.include_router(api_router)
+# Session Expiry
+@api_router.get("/maintenance/sweeps", response_model=SweepStatus)
+async def get_sweeps():
+    """Expiry settings and how much the recent sweeps of this worker deleted"""
+    return session_sweeper.status()
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.post("/maintenance/sweep", response_model=SweepReport)
+async def sweep_sessions():
+    """Expire idle sessions now instead of waiting for the next sweep"""
+    if not session_sweeper.enabled:
+        raise HTTPException(status_code=400, detail="La caducidad de sesiones está desactivada")
+    report = await session_sweeper.sweep()
+    if report is None:
+        raise HTTPException(status_code=409, detail="Ya hay una limpieza de sesiones en curso")
+    return report
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    """Close database connection on shutdown"""
-    # Note: Motor handles connection pooling automatically
-    pass
+async def _warm_up_database():
+    try:
+        await database.warm_up()
+    except Exception as e:
+        logger.error(f"Database warm-up failed: {str(e)}")
 
-import os
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the Mongo client on startup, warm it in the background and close it on shutdown"""
+    global scenario_pool
+    database.connect()
+    scenario_pool = create_pool()
+    # Warm-up runs in the background so the worker starts serving (and answering liveness) at once
+    app.state.warm_up = asyncio.create_task(_warm_up_database())
+    background = [app.state.warm_up]
+    if session_sweeper.enabled:
+        background.append(asyncio.create_task(session_sweeper.run()))
+    if event_relay.enabled:
+        background.append(asyncio.create_task(event_relay.run()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        if scenario_pool is not None:
+            scenario_pool.shutdown(wait=False, cancel_futures=True)
+            scenario_pool = None
+        database.close()
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application"""
+    app = FastAPI(lifespan=lifespan)
+    app.add_exception_handler(InfeasibleInputs, _infeasible_inputs_response)
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
 
 port = int(os.environ.get("PORT", 8000))
 
@@ -0,0 +1,62 @@
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+from models import Person, PlacementTrace, PhaseProfile, AssignmentTrace
+
+
+class AssignmentTracer:
+    """Why each person was placed where they were, plus time and allocations per phase.
+
+    The assigner calls place() where a person gets a section and lap() at the
+    end of each phase; a phase lasts from the previous lap. Allocations are
+    the net change in live memory blocks (sys.getallocatedblocks), which is
+    cheap enough to read at every lap, unlike tracemalloc; they include the
+    tracer's own bookkeeping.
+    """
+
+    def __init__(self):
+        self.reasons: Dict[int, str] = {}
+        self.lost_draws: Dict[int, List[str]] = {}
+        self.moved_from: Dict[int, str] = {}
+        self.phases: List[PhaseProfile] = []
+        self.start()
+
+    def start(self):
+        """Reset the phase clock, e.g. before the first phase of a run"""
+        self._clock = time.perf_counter()
+        self._blocks = sys.getallocatedblocks()
+
+    def lap(self, phase: str):
+        clock, blocks = time.perf_counter(), sys.getallocatedblocks()
+        self.phases.append(PhaseProfile(phase=phase, duration_ms=round((clock - self._clock) * 1000, 3),
+                                        allocated_blocks=blocks - self._blocks))
+        # Measured after building the profile, so the tracer's own allocation isn't charged to the next phase
+        self.start()
+
+    def place(self, person: Person, reason: str):
+        self.reasons[id(person)] = reason
+
+    def place_all(self, people: Iterable[Person], reason: str):
+        for person in people:
+            self.reasons[id(person)] = reason
+
+    def lose_draw(self, person: Person, section: str):
+        self.lost_draws.setdefault(id(person), []).append(section)
+
+    def move(self, person: Person, source: str):
+        # A person can be moved twice; keep the section the earlier phases chose
+        self.moved_from.setdefault(id(person), source)
+        self.reasons[id(person)] = "rebalanced"
+
+    def report(self, assignments: Dict[str, List[Person]]) -> AssignmentTrace:
+        """Placements in final section order, with each person's rank in the section they ended up in"""
+        placements = []
+        for section, section_people in assignments.items():
+            for person in section_people:
+                rank: Optional[int] = person.preferences.index(section) if section in person.preferences else None
+                placements.append(PlacementTrace(
+                    id=person.id, name=person.name, section=section, reason=self.reasons[id(person)], rank=rank,
+                    lost_draws=self.lost_draws.get(id(person), []), moved_from=self.moved_from.get(id(person))
+                ))
+        return AssignmentTrace(placements=placements, phases=self.phases)
@@ -213,7 +213,7 @@ const Home = () => {
     try {
       const result = await sectionOrganizerAPI.movePerson(
         sessionId, 
-        person.name, 
+        person, 
         fromSection, 
         toSection
       );
@@ -224,7 +224,7 @@ const Home = () => {
           const newAssignments = { ...prev };
           
           // Remove from source section
-          newAssignments[fromSection] = newAssignments[fromSection].filter(p => p.name !== person.name);
+          newAssignments[fromSection] = newAssignments[fromSection].filter(p => p.id !== person.id);
           
           // Add to target section
           newAssignments[toSection] = [...newAssignments[toSection], person];
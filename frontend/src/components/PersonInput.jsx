@@ -17,7 +17,9 @@ const PersonInput = ({ people, setPeople }) => {
   const sections = ['Colonia', 'Manada', 'Tropa', 'Esculta', 'Clan'];
 
   const addPerson = () => {
-    if (newPerson.name && newPerson.option1 && newPerson.option2 && newPerson.veto) {
+    // The server rejects a section that is both preferred and vetoed
+    const vetoesChoice = [newPerson.option1, newPerson.option2].includes(newPerson.veto);
+    if (newPerson.name && newPerson.option1 && newPerson.option2 && newPerson.veto && !vetoesChoice) {
       setPeople([...people, { ...newPerson }]);
       setNewPerson({ name: '', option1: '', option2: '', veto: '' });
     }
@@ -159,10 +159,11 @@ class SectionOrganizerAPI {
     }
   }
 
-  async movePerson(sessionId, personName, fromSection, toSection) {
+  async movePerson(sessionId, person, fromSection, toSection) {
     try {
       const payload = {
-        person_name: personName,
+        person_id: person.id,
+        person_name: person.name,
         from_section: fromSection,
         to_section: toSection
       };
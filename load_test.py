@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Load Testing Harness for Scout Section Organizer
+Replays section-day traffic against the FastAPI app, in-process or on a local URL,
+and reports latency percentiles and throughput per endpoint
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+SECTIONS = ["Colonia", "Manada", "Tropa", "Esculta", "Clan"]
+FIRST_NAMES = ["Juan", "María", "Carlos", "Ana", "Diego", "Sofía", "Miguel", "Lucía", "Andrés", "Valentina"]
+LAST_NAMES = ["Pérez", "García", "López", "Martínez", "Rodríguez", "Hernández", "Torres", "Morales", "Jiménez", "Castro"]
+
+# Collapse IDs so latencies are grouped per endpoint, not per session
+ID_PATTERN = re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class LoadTester:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._lifespan = None
+
+    async def __aenter__(self):
+        if self.args.base_url:
+            self.client = httpx.AsyncClient(base_url=self.args.base_url, timeout=60)
+            return self
+
+        # In-process: import the app and point it at the chosen Mongo
+        sys.path.insert(0, str(BACKEND_DIR))
+        import server
+        from database import database, DatabaseSettings
+        if self.args.mongo == "memory":
+            from mongomock_motor import AsyncMongoMockClient
+            database.connect(DatabaseSettings(mongo_url="mongodb://memory", db_name="loadtest"),
+                             client=AsyncMongoMockClient())
+        else:
+            database.connect(DatabaseSettings(mongo_url=self.args.mongo, db_name="loadtest"))
+        self._lifespan = server.lifespan(server.app)
+        await self._lifespan.__aenter__()
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                        base_url="http://loadtest", timeout=60)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.client:
+            await self.client.aclose()
+        if self._lifespan:
+            await self._lifespan.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request and record its latency under its endpoint template"""
+        endpoint = f"{method} {ID_PATTERN.sub('/{id}', path.split('?')[0])}"
+        start = time.perf_counter()
+        response = await self.client.request(method, f"/api{path}", **kwargs)
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    def make_roster(self, size: int) -> List[dict]:
+        """Random people with realistic names and preferences"""
+        people = []
+        for index in range(size):
+            option1, option2 = self.rng.sample(SECTIONS, 2)
+            veto = self.rng.choice([s for s in SECTIONS if s not in (option1, option2)] + ["Ninguna"])
+            name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {index}"
+            people.append({"name": name, "option1": option1, "option2": option2, "veto": veto})
+        return people
+
+    def make_limits(self, size: int) -> Dict[str, dict]:
+        share = size // len(SECTIONS)
+        return {s: {"min": max(share - share // 4, 0), "max": share + share // 2 + 1} for s in SECTIONS}
+
+    async def setup_group(self, size: int) -> Optional[str]:
+        """Bulk setup: half the groups use the one-shot endpoint, half the step-by-step flow"""
+        people = self.make_roster(size)
+        limits = self.make_limits(size)
+        continuity = [{"name": p["name"], "section": p["option1"]} for p in self.rng.sample(people, size // 20)]
+
+        if self.rng.random() < 0.5:
+            response = await self.request("POST", "/run", json={
+                "people": people, "limits": limits, "continuity_list": continuity
+            })
+            return response.json().get("session_id") if response.status_code == 200 else None
+
+        response = await self.request("POST", "/session")
+        if response.status_code != 200:
+            return None
+        session_id = response.json()["session_id"]
+        await self.request("POST", "/people", json={"people": people, "session_id": session_id})
+        await self.request("POST", f"/limits?session_id={session_id}", json={"limits": limits})
+        await self.request("POST", "/continuity", json={"continuity_list": continuity, "session_id": session_id})
+        await self.request("POST", "/assign", json={"session_id": session_id})
+        return session_id
+
+    async def leader(self, session_id: str, actions: int):
+        """One leader on section day: mostly polling, some manual moves"""
+        for _ in range(actions):
+            if self.rng.random() < self.args.move_ratio:
+                response = await self.request("GET", f"/assignments/{session_id}")
+                if response.status_code != 200:
+                    continue
+                assignments = response.json()["assignments"]
+                from_section = self.rng.choice([s for s in SECTIONS if assignments.get(s)])
+                to_section = self.rng.choice([s for s in SECTIONS if s != from_section])
+                person = self.rng.choice(assignments[from_section])
+                await self.request("POST", f"/assignments/{session_id}/move", json={
+                    "person_id": person["id"], "person_name": person["name"],
+                    "from_section": from_section, "to_section": to_section
+                })
+            else:
+                await self.request("GET", f"/statistics/{session_id}")
+
+    async def run_group(self, size: int):
+        session_id = await self.setup_group(size)
+        if not session_id:
+            return
+        # Assign burst: double-clicks and several open tabs
+        await asyncio.gather(*[
+            self.request("POST", "/assign", json={"session_id": session_id})
+            for _ in range(self.args.assign_burst)
+        ])
+        await asyncio.gather(*[self.leader(session_id, self.args.actions) for _ in range(self.args.leaders)])
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def bounded(size: int):
+            async with semaphore:
+                await self.run_group(size)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[bounded(self.args.roster_size) for _ in range(self.args.groups)])
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float):
+        print(f"\n📊 LOAD TEST SUMMARY ({elapsed:.2f}s, {sum(len(v) for v in self.latencies.values())} requests)")
+        header = f"{'endpoint':<44}{'count':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status"
+        print(header)
+        print("-" * len(header))
+        for endpoint in sorted(self.latencies):
+            samples = sorted(self.latencies[endpoint])
+            statuses = ", ".join(f"{code}×{count}" for code, count in sorted(self.statuses[endpoint].items()))
+            print(f"{endpoint:<44}{len(samples):>7}{len(samples) / elapsed:>9.1f}"
+                  f"{percentile(samples, 50):>9.1f}{percentile(samples, 95):>9.1f}{percentile(samples, 99):>9.1f}"
+                  f"  {statuses}")
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile, in milliseconds"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)] * 1000
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Hit a running server (e.g. http://localhost:8000) instead of the in-process app")
+    parser.add_argument("--mongo", default="memory",
+                        help="'memory' for an in-memory Mongo stand-in, or a local mongodb:// URL (in-process only)")
+    parser.add_argument("--groups", type=int, default=20, help="Scout groups (sessions) to simulate")
+    parser.add_argument("--roster-size", type=int, default=200, help="People per group")
+    parser.add_argument("--concurrency", type=int, default=10, help="Groups running at the same time")
+    parser.add_argument("--assign-burst", type=int, default=3, help="Concurrent /assign calls per group")
+    parser.add_argument("--leaders", type=int, default=5, help="Concurrent leaders editing each group")
+    parser.add_argument("--actions", type=int, default=20, help="Polls and moves per leader")
+    parser.add_argument("--move-ratio", type=float, default=0.3, help="Share of leader actions that are moves")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    """Main load test runner"""
+    args = parse_args(argv)
+    async with LoadTester(args) as tester:
+        elapsed = await tester.run()
+        tester.report(elapsed)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Load test interrupted by user")
+        sys.exit(1)
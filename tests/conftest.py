@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import UpdateOne
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Sweeps run serially, no background sweeper deletes test sessions and events stay in the process
+# (mongomock has neither capped collections nor tailable cursors)
+os.environ.setdefault("SCENARIO_WORKERS", "1")
+os.environ.setdefault("SESSION_TTL_DAYS", "0")
+os.environ.setdefault("EVENT_RELAY", "off")
+
+from database import Database, DatabaseSettings  # noqa: E402
+from models import SECTIONS  # noqa: E402
+
+SETTINGS = DatabaseSettings(mongo_url="mongodb://localhost", db_name="test", transactions=False)
+
+
+@pytest.fixture
+def db():
+    """A Database on an in-memory Mongo"""
+    database = Database()
+    database.connect(SETTINGS, client=AsyncMongoMockClient())
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def client():
+    """TestClient for the API, with the app's Database on an in-memory Mongo"""
+    from fastapi.testclient import TestClient
+    import server
+
+    server.database.close()
+    server.database.connect(SETTINGS, client=AsyncMongoMockClient())
+    with TestClient(server.app) as test_client:
+        yield test_client
+    server.database.close()
+
+
+class ArrayFilterCollection:
+    """Wraps a mongomock collection and resolves array filters, which mongomock lacks, into element indexes"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, ordered=True):
+        matched = 0
+        # One at a time: an earlier $pull shifts the indexes a later filter resolves to
+        for operation in operations:
+            if operation._array_filters:
+                operation = await self._resolve(operation)
+            matched += (await self.collection.bulk_write([operation])).matched_count
+        return type("Result", (), {"matched_count": matched})()
+
+    async def _resolve(self, operation):
+        document = await self.collection.find_one(operation._filter) or {}
+        filters = {}
+        for array_filter in operation._array_filters:
+            (key, value), = array_filter.items()
+            tag, field = key.split(".", 1)
+            filters[tag] = (field, value)
+        changes = {}
+        for path, value in operation._doc["$set"].items():
+            array, tag, rest = re.fullmatch(r"(\w+)\.\$\[(\w+)\]\.(.+)", path).groups()
+            field, wanted = filters[tag]
+            for index, element in enumerate(document.get(array, [])):
+                if element.get(field) == wanted:
+                    changes[f"{array}.{index}.{rest}"] = value
+        return UpdateOne(operation._filter, {"$set": changes})
+
+
+@pytest.fixture
+def array_filters(monkeypatch, client):
+    """Lets PATCH updates run against the in-memory Mongo"""
+    from database import Database
+    sessions = Database.sessions.fget
+    monkeypatch.setattr(Database, "sessions", property(lambda self: ArrayFilterCollection(sessions(self))))
+
+
+@pytest.fixture
+def assigned_session(client):
+    """ID of a session of ten people over the scout sections, with a saved assignment"""
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name=f"P{i}", option1=SECTIONS[i % 5], option2=SECTIONS[(i + 1) % 5]) for i in range(10)]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 10} for section in SECTIONS}})
+    assert client.post("/api/assign", json={"session_id": session_id}).status_code == 200
+    return session_id
@@ -0,0 +1,30 @@
+from analytics import analytics_cache
+
+
+def demand(client):
+    analytics_cache.clear()
+    response = client.get("/api/analytics/demand")
+    assert response.status_code == 200
+    return {row["section"]: row for row in response.json()["sections"]}
+
+
+def test_demand_follows_legacy_patches(client, array_filters):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name="Ana", preferences=["Tropa", "Clan", "Manada"], vetoes=["Colonia"]),
+              dict(name="Luis", option1="Tropa", option2="Clan", veto="Esculta")]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    stored = client.get(f"/api/people/{session_id}").json()["people"]
+    before = demand(client)
+    assert (before["Clan"]["secondChoice"], before["Colonia"]["veto"], before["Esculta"]["veto"]) == (2, 1, 1)
+
+    response = client.patch(f"/api/people/{session_id}", json={"update": [
+        {"id": stored[0]["id"], "option2": "Manada", "veto": "Clan"},
+        {"id": stored[1]["id"], "veto": "Ninguna"},
+    ]})
+    assert response.status_code == 200
+
+    after = demand(client)
+    assert after["Manada"]["secondChoice"] == 1 and after["Clan"]["secondChoice"] == 1
+    assert (after["Clan"]["veto"], after["Colonia"]["veto"], after["Esculta"]["veto"]) == (1, 0, 0)
+    ana = client.get(f"/api/people/{session_id}").json()["people"][0]
+    assert (ana["preferences"], ana["vetoes"]) == (["Tropa", "Manada"], ["Clan"])
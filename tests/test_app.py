@@ -0,0 +1,46 @@
+import time
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from database import Database, DatabaseSettings
+from tests.conftest import SETTINGS
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "mongodb://db:27017")
+    monkeypatch.setenv("DB_NAME", "secciones")
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_MAX_IDLE_TIME_MS", "60000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    monkeypatch.setenv("MONGO_TRANSACTIONS", "off")
+    settings = DatabaseSettings.from_env()
+
+    assert (settings.mongo_url, settings.db_name, settings.transactions) == ("mongodb://db:27017", "secciones", False)
+    assert settings.client_options() == {"maxPoolSize": 20, "minPoolSize": 0, "serverSelectionTimeoutMS": 5000,
+                                         "connectTimeoutMS": 5000, "maxIdleTimeMS": 60000, "compressors": "zstd,zlib"}
+
+
+def test_the_client_is_created_on_first_use():
+    database = Database(DatabaseSettings(mongo_url="mongodb://localhost", db_name="lazy"))
+    assert database.client is None
+    assert database.sessions.name == "sessions"
+    assert database.client is not None and database.db.name == "lazy"
+    database.close()
+    assert database.client is None
+
+
+def test_lifespan_warms_up_and_closes_the_client():
+    import server
+    server.database.close()
+    server.database.connect(SETTINGS, client=AsyncMongoMockClient())
+    app = server.create_app()
+    with TestClient(app) as client:
+        assert client.get("/api/health/live").json() == {"status": "ok"}
+        for _ in range(50):
+            ready = client.get("/api/health/ready")
+            if ready.status_code == 200:
+                break
+            time.sleep(0.02)
+        assert ready.json() == {"status": "ready"}
+    assert server.database.client is None
@@ -0,0 +1,106 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from archive import ArchiveReader, read_archive, write_archive
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def _batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+async def _chunks(data, size=7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def encode(*batches):
+    return b"".join(asyncio.run(_collect(write_archive(_batches(*batches)))))
+
+
+def decode(data):
+    return asyncio.run(_collect(read_archive(_chunks(data))))
+
+
+def test_round_trip_keeps_dates_and_batches_collections():
+    created = datetime(2025, 9, 1, 10, 30)
+    sessions = [{"session_id": "a", "created_at": created, "people": [{"name": "Ñandú", "$note": "x"}]}]
+    assignments = [{"session_id": "a", "id": str(i)} for i in range(3)]
+
+    result = decode(encode(("sessions", sessions), ("assignments", assignments)))
+
+    assert result == [("sessions", sessions), ("assignments", assignments)]
+    assert isinstance(result[0][1][0]["created_at"], datetime)
+
+
+def test_concatenated_archives_read_as_one():
+    first = encode(("sessions", [{"session_id": "a"}]))
+    second = encode(("sessions", [{"session_id": "b"}]))
+    assert decode(first + second) == [("sessions", [{"session_id": "a"}, {"session_id": "b"}])]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"not gzip at all", "gzip"),
+    (encode(("sessions", [{"session_id": "a"}]))[:-12], "incompleto"),
+    (gzip.compress(b'{"collection": "sessions", "document": {}}\n'), "cabecera"),
+    (gzip.compress(json.dumps({"format": "other", "version": 1}).encode() + b"\n"), "formato"),
+])
+def test_broken_archives_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        decode(data)
+
+
+def test_reader_handles_records_split_across_chunks():
+    data = encode(("sessions", [{"session_id": str(i)} for i in range(50)]))
+    reader = ArchiveReader()
+    records = []
+    for byte in range(len(data)):
+        records += reader.feed(data[byte:byte + 1])
+    records += reader.finish()
+    assert [document["session_id"] for _, document in records] == [str(i) for i in range(50)]
+
+
+def snapshot(client, session_id):
+    """Everything an archive should bring back for a session"""
+    return {
+        "people": client.get(f"/api/people/{session_id}").json(),
+        "assignment": client.get(f"/api/assignments/{session_id}").json(),
+        "history": client.get(f"/api/assignments/{session_id}/history").json(),
+    }
+
+
+def test_export_delete_import_restores_the_session(client, assigned_session):
+    session_id = assigned_session
+    name = snapshot(client, session_id)["assignment"]["assignments"]["Colonia"][0]["name"]
+    client.post(f"/api/assignments/{session_id}/move",
+                json={"person_name": name, "from_section": "Colonia", "to_section": "Clan"})
+    before = snapshot(client, session_id)
+
+    archive = client.get("/api/sessions/archive", params={"session_id": session_id}).content
+    assert client.delete(f"/api/session/{session_id}").status_code == 200
+    assert client.get(f"/api/assignments/{session_id}").status_code == 404
+
+    result = client.post("/api/sessions/archive", content=archive).json()
+    assert result["skipped_sessions"] == 0
+    assert result["inserted"]["sessions"] == 1 and result["inserted"]["operations"] == 1
+    assert snapshot(client, session_id) == before
+
+    # Importing again skips the session unless asked to replace it
+    assert client.post("/api/sessions/archive", content=archive).json()["skipped_sessions"] == 1
+    replaced = client.post("/api/sessions/archive?replace=true", content=archive).json()
+    assert replaced["skipped_sessions"] == 0 and replaced["inserted"]["sessions"] == 1
+    assert snapshot(client, session_id) == before
+
+
+def test_import_rejects_a_broken_archive(client):
+    response = client.post("/api/sessions/archive", content=b"garbage")
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Archivo de sesiones no válido")
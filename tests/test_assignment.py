@@ -0,0 +1,165 @@
+import random
+
+import pytest
+
+from models import (Person, SectionLimit, SectionLimits, ContinuityItem, RestrictionPriorities,
+                    GroupConstraint)
+from assignment_algorithm import SectionAssigner
+from groups import GroupPlan
+
+SECTIONS = ["A", "B", "C"]
+
+# Default priorities take the strict-limits path, the second mode the rank-by-rank preference path;
+# both rebalance minimums since the limits don't rank below the first preference
+PRIORITY_MODES = [
+    RestrictionPriorities(),
+    RestrictionPriorities(priorities={"sectionLimits": 2, "continuityList": 1,
+                                      "firstPreference": 2, "secondPreference": 3}),
+]
+
+PREFERENCES_FIRST = RestrictionPriorities(priorities={"sectionLimits": 3, "continuityList": 1,
+                                                      "firstPreference": 2, "secondPreference": 4})
+
+
+def limits(**bounds):
+    return SectionLimits(limits={section: SectionLimit(min=low, max=high) for section, (low, high) in bounds.items()})
+
+
+def section_of(assignments):
+    return {person.id: section for section, people in assignments.items() for person in people}
+
+
+@pytest.mark.parametrize("priorities", PRIORITY_MODES)
+def test_rebalance_fills_minimums_with_second_choices_first(priorities):
+    second_b = [Person(name=f"SB{i}", preferences=["A", "B", "C"]) for i in range(3)]
+    second_c = [Person(name=f"SC{i}", preferences=["A", "C", "B"]) for i in range(6)]
+    people = second_b + second_c
+    assigner = SectionAssigner(people, limits(A=(0, 9), B=(3, 9), C=(0, 9)), [], priorities,
+                               rng=random.Random(1), sections=SECTIONS)
+    result = assigner.assign_people()
+
+    assert len(result["B"]) == 3
+    assert {person.id for person in result["B"]} == {person.id for person in second_b}
+    assert assigner.calculate_statistics(result).withinLimits
+
+
+@pytest.mark.parametrize("priorities", PRIORITY_MODES)
+def test_rebalance_leaves_continuity_and_vetoes_alone(priorities):
+    staying = Person(name="Staying", preferences=["A", "B"])
+    vetoing = [Person(name=f"V{i}", preferences=["A", "C"], vetoes=["B"]) for i in range(4)]
+    movable = [Person(name=f"M{i}", preferences=["A", "C"]) for i in range(2)]
+    people = [staying] + vetoing + movable
+    continuity = [ContinuityItem(name=staying.name, person_id=staying.id, section="A")]
+    assigner = SectionAssigner(people, limits(A=(0, 9), B=(2, 9), C=(0, 9)), continuity, priorities,
+                               rng=random.Random(1), sections=SECTIONS)
+    result = assigner.assign_people()
+
+    where = section_of(result)
+    assert where[staying.id] == "A"
+    assert all(where[person.id] != "B" for person in vetoing)
+    assert {person.id for person in result["B"]} == {person.id for person in movable}
+
+
+def test_rebalance_stops_at_the_donor_minimum():
+    people = [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(4)]
+    assigner = SectionAssigner(people, limits(A=(3, 9), B=(3, 9), C=(0, 9)), [], RestrictionPriorities(),
+                               rng=random.Random(1), sections=SECTIONS)
+    result = assigner.assign_people()
+    # Not enough people for both minimums: A keeps its own and B gets what is left
+    assert (len(result["A"]), len(result["B"])) == (3, 1)
+
+
+def test_no_rebalance_when_preferences_outrank_limits():
+    people = [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(5)]
+    assigner = SectionAssigner(people, limits(A=(0, 9), B=(3, 9), C=(0, 9)), [], PREFERENCES_FIRST,
+                               rng=random.Random(1), sections=SECTIONS)
+    assert len(assigner.assign_people()["A"]) == 5
+
+
+def test_group_plan_merges_chains_and_reports_conflicts():
+    people = [Person(name=name, preferences=["A"]) for name in "abcdef"]
+    ids = [person.id for person in people]
+    plan = GroupPlan(people, [
+        GroupConstraint(kind="together", person_ids=[ids[0], ids[1]]),
+        GroupConstraint(kind="together", person_ids=[ids[1], ids[2]]),
+        GroupConstraint(kind="apart", person_ids=[ids[0], ids[2]]),
+        GroupConstraint(kind="apart", person_ids=[ids[3], ids[4]]),
+        GroupConstraint(kind="together", person_ids=["unknown", ids[5]]),
+    ])
+
+    assert plan.unit_of[ids[0]] == plan.unit_of[ids[1]] == plan.unit_of[ids[2]]
+    assert plan.unit_of[ids[3]] != plan.unit_of[ids[4]]
+    assert [(a.name, b.name) for a, b in plan.conflicts] == [("a", "c")]
+    assert plan.unknown == ["unknown"]
+
+
+def random_groups(rng, count=60):
+    people = [Person(name=f"P{i}", preferences=rng.sample(SECTIONS, 2)) for i in range(count)]
+    ids = [person.id for person in people]
+    rng.shuffle(ids)
+    constraints = [GroupConstraint(kind="together", person_ids=ids[i:i + 3]) for i in range(0, 15, 3)]
+    constraints += [GroupConstraint(kind="apart", person_ids=ids[i:i + 3]) for i in range(15, 24, 3)]
+    # Keep one together group apart from one member of another
+    constraints.append(GroupConstraint(kind="apart", person_ids=[ids[0], ids[3]]))
+    return people, constraints
+
+
+@pytest.mark.parametrize("strategy", ["greedy", "lexicographic"])
+@pytest.mark.parametrize("priorities", PRIORITY_MODES)
+def test_group_constraints_are_met(strategy, priorities):
+    rng = random.Random(7)
+    people, constraints = random_groups(rng)
+    assigner = SectionAssigner(people, limits(A=(10, 25), B=(10, 25), C=(10, 25)), [], priorities,
+                               rng=random.Random(3), strategy=strategy, sections=SECTIONS,
+                               constraints=constraints)
+    result = assigner.assign_people()
+
+    where = section_of(result)
+    assert len(where) == len(people)
+    for constraint in constraints:
+        sections = [where[person_id] for person_id in constraint.person_ids]
+        if constraint.kind == "together":
+            assert len(set(sections)) == 1
+        else:
+            assert len(set(sections)) == len(sections)
+    assert assigner.calculate_statistics(result).groupViolations == 0
+
+
+@pytest.mark.parametrize("strategy", ["greedy", "lexicographic"])
+def test_incremental_run_moves_a_changed_group_whole(strategy):
+    rng = random.Random(11)
+    people, constraints = random_groups(rng)
+    bounds = limits(A=(10, 25), B=(10, 25), C=(10, 25))
+    first = SectionAssigner(people, bounds, [], RestrictionPriorities(), rng=random.Random(1),
+                            strategy=strategy, sections=SECTIONS, constraints=constraints)
+    previous = first.assign_people()
+
+    changed_id = constraints[0].person_ids[0]
+    changed = [Person(id=person.id, name=person.name, preferences=list(reversed(person.preferences)))
+               if person.id == changed_id else person for person in people]
+    second = SectionAssigner(changed, bounds, [], RestrictionPriorities(), rng=random.Random(2),
+                             strategy=strategy, sections=SECTIONS, constraints=constraints)
+    result, reassigned = second.assign_incremental(previous)
+
+    assert {person.id for person in reassigned} == set(constraints[0].person_ids)
+    assert len({section_of(result)[person_id] for person_id in constraints[0].person_ids}) == 1
+    assert second.calculate_statistics(result).groupViolations == 0
+
+
+def test_incremental_run_matches_reuploaded_people_by_name():
+    people = [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(6)]
+    bounds = limits(A=(0, 4), B=(0, 4), C=(0, 4))
+    previous = SectionAssigner(people, bounds, [], RestrictionPriorities(), rng=random.Random(1),
+                               sections=SECTIONS).assign_people()
+
+    # Same roster with fresh IDs, plus one late registrant
+    reuploaded = [Person(name=person.name, preferences=person.preferences) for person in people]
+    late = Person(name="Late", preferences=["C"])
+    assigner = SectionAssigner(reuploaded + [late], bounds, [], RestrictionPriorities(), rng=random.Random(2),
+                               sections=SECTIONS)
+    result, reassigned = assigner.assign_incremental(previous)
+
+    assert reassigned == [late]
+    old = {person.name: section for section, members in previous.items() for person in members}
+    assert all(old[person.name] == section for section, members in result.items()
+               for person in members if person is not late)
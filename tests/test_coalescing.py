@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from coalescing import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+
+        async def compute(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key.upper()
+
+        results = await asyncio.gather(*[flights.run(key, lambda key=key: compute(key)) for key in "aab" * 3])
+        assert results == list("AAB" * 3) and sorted(calls) == ["a", "b"]
+        assert not flights.in_flight("a")
+        # Once finished, the next call computes again
+        assert await flights.run("a", lambda: compute("a")) == "A" and calls.count("a") == 2
+
+    asyncio.run(scenario())
+
+
+def test_a_waiter_that_goes_away_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight()
+        done = asyncio.Event()
+
+        async def compute():
+            await done.wait()
+            return 42
+
+        first = asyncio.create_task(flights.run("k", compute))
+        second = asyncio.create_task(flights.run("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        done.set()
+        assert await second == 42
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("roto")
+
+        results = await asyncio.gather(flights.run("k", fail), flights.run("k", fail), return_exceptions=True)
+        assert [str(result) for result in results] == ["roto", "roto"]
+
+    asyncio.run(scenario())
+
+
+def test_lock_excludes_other_owners_until_released_or_expired(db):
+    async def scenario():
+        assert await db.acquire_lock("assign:s", "a", 60)
+        assert await db.acquire_lock("assign:s", "a", 60)  # The owner can renew it
+        assert not await db.acquire_lock("assign:s", "b", 60)
+        assert not await db.release_lock("assign:s", "b")
+        assert await db.release_lock("assign:s", "a")
+        assert await db.acquire_lock("assign:s", "b", -1)  # Taken with a lease that has already run out
+        assert await db.acquire_lock("assign:s", "c", 60)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_assign_requests_run_once(client, assigned_session, monkeypatch):
+    import server
+    runs = []
+    run_assignment = server._run_assignment
+
+    async def counted(request):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.sleep(0.05)
+        response = await run_assignment(request)
+        runs.append((start, loop.time()))
+        return response
+
+    monkeypatch.setattr(server, "_run_assignment", counted)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            same = [http.post("/api/assign", json={"session_id": assigned_session}) for _ in range(5)]
+            other = http.post("/api/assign", json={"session_id": assigned_session, "strategy": "lexicographic"})
+            return await asyncio.gather(*same, other)
+
+    responses = asyncio.run(burst())
+    assert [response.status_code for response in responses] == [200] * 6
+    assert len({response.json()["assignment"]["id"] for response in responses[:5]}) == 1
+    # Different request bodies don't share a run, and the session lock keeps the two runs apart
+    assert len(runs) == 2
+    (first_start, first_end), (second_start, _) = sorted(runs)
+    assert second_start >= first_end
@@ -0,0 +1,58 @@
+from models import Person, SectionLimit, SectionLimits, ContinuityItem, SECTIONS
+from diagnostics import diagnose
+
+THREE = ["A", "B", "C"]
+
+
+def limits(**bounds):
+    return SectionLimits(limits={section: SectionLimit(min=low, max=high) for section, (low, high) in bounds.items()})
+
+
+def codes(report):
+    return sorted(issue.code for issue in report.issues)
+
+
+def test_vetoes_and_minimums_that_cannot_be_met():
+    people = [Person(name=f"P{i}", preferences=["A"], vetoes=["B", "C"]) for i in range(4)]
+    report = diagnose(people, limits(A=(0, 2), B=(1, 5), C=(0, 5)), [], THREE)
+
+    assert not report.feasible
+    assert codes(report) == ["min_unreachable", "oversubscribed", "veto_capacity"]
+    min_issue = next(issue for issue in report.issues if issue.code == "min_unreachable")
+    assert min_issue.section == "B" and "faltan 1" in min_issue.message
+
+
+def test_continuity_beyond_the_maximum_and_bounds():
+    people = [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(4)]
+    continuity = [ContinuityItem(name=person.name, person_id=person.id, section="C") for person in people[:3]]
+    report = diagnose(people, limits(A=(0, 1), B=(0, 4), C=(0, 2)), continuity, THREE)
+
+    assert "continuity_overfill" in codes(report) and not report.feasible
+
+
+def test_feasible_inputs_get_satisfaction_bounds():
+    people = [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(3)] + [Person(name="Q", preferences=["B", "C"])]
+    report = diagnose(people, limits(A=(0, 2), B=(0, 1), C=(0, 4)), [], THREE)
+
+    assert report.feasible and codes(report) == ["oversubscribed"]
+    # Two of the three who want A get it and Q gets B; the third can still have B if Q takes C
+    assert (report.bounds.firstChoice, report.bounds.firstOrSecondChoice) == (3, 4)
+
+
+def test_assign_rejects_hopeless_inputs_with_a_readable_detail(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name=f"P{i}", option1="Tropa", option2="Clan") for i in range(3)]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 1} for section in SECTIONS} | {"Colonia": {"min": 5, "max": 6}}})
+
+    response = client.post("/api/assign", json={"session_id": session_id})
+    assert response.status_code == 422
+    body = response.json()
+    assert body["detail"].startswith("La configuración no se puede satisfacer: ")
+    assert "min_total_exceeds_people" in {issue["code"] for issue in body["issues"]}
+    assert all(issue["severity"] == "error" for issue in body["issues"])
+
+    report = client.post("/api/diagnostics", json={"session_id": session_id}).json()
+    assert not report["feasible"] and {issue["code"] for issue in report["issues"]} >= {issue["code"] for issue in body["issues"]}
+    assert client.get(f"/api/assignments/{session_id}").status_code == 404
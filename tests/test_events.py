@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from events import SessionEventBroker, EventRelay
+
+
+class SharedLog:
+    """Stands in for the capped events collection that every worker's relay tails"""
+
+    def __init__(self):
+        self.events = []
+        self.changed = asyncio.Condition()
+
+    async def ensure_event_log(self):
+        pass
+
+    async def append_event(self, event):
+        event["_id"] = len(self.events) + 1
+        self.events.append(event)
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def last_event_id(self):
+        return self.events[-1]["_id"] if self.events else None
+
+    async def tail_events(self, after_id=None):
+        position = after_id or 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            async with self.changed:
+                await self.changed.wait()
+
+
+def test_slow_subscribers_get_a_single_resync():
+    async def scenario():
+        broker = SessionEventBroker(queue_size=2)
+        queue = broker.subscribe("s")
+        for seq in range(3):
+            broker.publish("s", "move", {"seq": seq})
+        assert queue.qsize() == 1 and "event: resync" in queue.get_nowait()
+        broker.unsubscribe("s", queue)
+        assert broker.subscriber_count("s") == 0
+
+    asyncio.run(scenario())
+
+
+def test_relay_delivers_events_from_other_workers_once():
+    async def scenario():
+        log = SharedLog()
+        log.events.append({"_id": 1, "origin": "old", "session_id": "s", "type": "move", "data": {}})
+        workers = [SessionEventBroker(), SessionEventBroker()]
+        tasks = [asyncio.create_task(EventRelay(worker, log).run()) for worker in workers]
+        await asyncio.sleep(0)
+        local, remote = workers[0].subscribe("s"), workers[1].subscribe("s")
+
+        workers[0].publish("s", "move", {"person_id": "p1"})
+        message = await asyncio.wait_for(remote.get(), 1)
+        assert "event: move" in message and '"person_id":"p1"' in message
+        assert '"person_id":"p1"' in local.get_nowait()
+        await asyncio.sleep(0.01)
+        # Neither the publisher's own copy nor the event from before the relays started comes back
+        assert local.empty() and remote.empty()
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(worker.relay is None for worker in workers)
+
+    asyncio.run(scenario())
+
+
+def test_moves_and_undo_publish_events(client, assigned_session):
+    from server import broker
+    session_id = assigned_session
+    name = client.get(f"/api/assignments/{session_id}").json()["assignments"]["Colonia"][0]["name"]
+    queue = broker.subscribe(session_id)
+    try:
+        client.post(f"/api/assignments/{session_id}/move",
+                    json={"person_name": name, "from_section": "Colonia", "to_section": "Clan"})
+        client.post(f"/api/assignments/{session_id}/undo")
+        messages = [queue.get_nowait() for _ in range(queue.qsize())]
+    finally:
+        broker.unsubscribe(session_id, queue)
+
+    events = [(message.split("\n")[1], json.loads(message.split("\n")[2][len("data: "):])) for message in messages]
+    assert [event for event, _ in events] == ["event: move", "event: move"]
+    assert [(data["from_section"], data["to_section"]) for _, data in events] == [("Colonia", "Clan"), ("Clan", "Colonia")]
+    assert events[0][1]["person_name"] == name
+    assert events[0][1]["sectionCounts"] == {"Colonia": 1, "Clan": 3}
+    assert [message.split("\n")[0] for message in messages] == ["id: 1", "id: 2"]
+
+
+def test_stream_opens_with_a_comment():
+    async def scenario():
+        broker = SessionEventBroker()
+        stream = broker.stream("s")
+        assert await stream.__anext__() == ": connected\n\n"
+        broker.publish("s", "deleted", {})
+        assert await stream.__anext__() == 'id: 1\nevent: deleted\ndata: {}\n\n'
+        await stream.aclose()
+        assert broker.subscriber_count("s") == 0
+
+    asyncio.run(scenario())
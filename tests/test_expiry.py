@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from expiry import SessionSweeper
+
+
+async def seed(db):
+    old = datetime.utcnow() - timedelta(days=40)
+    await db.sessions.insert_many([
+        {"session_id": "idle", "last_accessed": old},
+        {"session_id": "active", "last_accessed": datetime.utcnow()},
+        # Saved before access tracking: stamped, not deleted
+        {"session_id": "untracked"},
+    ])
+    await db.assignments.insert_many([{"session_id": "idle", "id": "a1"}, {"session_id": "active", "id": "a2"}])
+    await db.operations.insert_one({"session_id": "idle", "assignment_id": "a1", "seq": 1})
+
+
+async def remaining(db):
+    sessions = await db.sessions.distinct("session_id")
+    history = await db.assignments.distinct("session_id")
+    return sorted(sessions), sorted(history), await db.operations.count_documents({})
+
+
+def test_sweep_deletes_idle_sessions_with_their_history(db):
+    sweeper = SessionSweeper(db, ttl_days=30)
+    asyncio.run(seed(db))
+    report = asyncio.run(sweeper.sweep())
+
+    assert (report.deleted["sessions"], report.deleted["assignments"], report.deleted["operations"]) == (1, 1, 1)
+    assert asyncio.run(remaining(db)) == (["active", "untracked"], ["active"], 0)
+    untracked = asyncio.run(db.sessions.find_one({"session_id": "untracked"}))
+    assert "last_accessed" in untracked
+    assert sweeper.status().deleted["sessions"] == 1 and len(sweeper.status().sweeps) == 1
+
+
+def test_only_one_sweep_runs_at_a_time(db):
+    sweeper = SessionSweeper(db, ttl_days=30)
+    asyncio.run(seed(db))
+    assert asyncio.run(db.acquire_lock("sweep:sessions", "other worker", 60))
+    assert asyncio.run(sweeper.sweep()) is None
+    assert asyncio.run(remaining(db))[0] == ["active", "idle", "untracked"]
+
+    asyncio.run(db.release_lock("sweep:sessions", "other worker"))
+    assert asyncio.run(sweeper.sweep()).deleted["sessions"] == 1
+
+
+def test_requests_keep_a_session_alive(client):
+    import server
+
+    session_id = client.post("/api/session").json()["session_id"]
+    stale = datetime.utcnow() - timedelta(days=40)
+    asyncio.run(server.database.sessions.update_one({"session_id": session_id}, {"$set": {"last_accessed": stale}}))
+    server.database._touched.clear()
+    client.post("/api/people", json={"session_id": session_id, "people": [{"name": "Ana", "option1": "Tropa"}]})
+
+    session = asyncio.run(server.database.sessions.find_one({"session_id": session_id}))
+    assert session["last_accessed"] > stale + timedelta(days=39)
+
+
+def test_manual_sweeps_need_expiry_enabled(client):
+    assert client.post("/api/maintenance/sweep").status_code == 400
+    status = client.get("/api/maintenance/sweeps").json()
+    assert status["ttl_days"] == 0 and status["sweeps"] == []
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import re
+import zipfile
+
+import pytest
+
+from models import SECTIONS
+
+
+def export(client, session_id, export_format):
+    response = client.get(f"/api/assignments/{session_id}/export", params={"format": export_format})
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_lists_everyone_by_section(client, assigned_session):
+    response = export(client, assigned_session, "csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.content.startswith("\ufeff".encode("utf-8"))
+
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assignments = client.get(f"/api/assignments/{assigned_session}").json()["assignments"]
+    assert [(row["section"], row["name"]) for row in rows] == [
+        (section, person["name"]) for section in SECTIONS for person in assignments[section]]
+    assert {(row["satisfaction"], row["choice"]) for row in rows} == {("firstChoice", "1")}
+    assert rows[0]["preferences"] == " > ".join(assignments[rows[0]["section"]][0]["preferences"])
+
+
+def test_ndjson_keeps_lists_and_blank_choices(client, assigned_session):
+    session_id = assigned_session
+    name = client.get(f"/api/assignments/{session_id}").json()["assignments"]["Colonia"][0]["name"]
+    # P0 ranks Colonia and Manada only, so Clan is unranked
+    client.post(f"/api/assignments/{session_id}/move",
+                json={"person_name": name, "from_section": "Colonia", "to_section": "Clan"})
+
+    lines = [json.loads(line) for line in export(client, session_id, "ndjson").text.splitlines()]
+    moved = next(line for line in lines if line["name"] == name)
+    assert moved["section"] == "Clan" and moved["choice"] is None and moved["satisfaction"] == "other"
+    assert moved["preferences"] == ["Colonia", "Manada"] and moved["vetoes"] == []
+    assert len(lines) == 10
+
+
+def test_xlsx_is_a_readable_workbook(client, assigned_session):
+    content = export(client, assigned_session, "xlsx").content
+    with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+        assert workbook.testzip() is None
+        sheet = workbook.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    rows = re.findall(r"<row>(.*?)</row>", sheet)
+    assert len(rows) == 11
+    assert re.findall(r"<t>(.*?)</t>", rows[0])[:2] == ["section", "name"]
+
+
+@pytest.mark.parametrize("session_id, export_format, status", [
+    (None, "pdf", 400),
+    ("missing", "csv", 404),
+])
+def test_export_errors(client, assigned_session, session_id, export_format, status):
+    response = client.get(f"/api/assignments/{session_id or assigned_session}/export", params={"format": export_format})
+    assert response.status_code == status
@@ -0,0 +1,44 @@
+import pytest
+
+from models import Person, SectionLimit, SectionLimits, RestrictionPriorities, GroupConstraint, SECTIONS
+from fairness import fairness_report
+
+LIMITS = SectionLimits(limits={section: SectionLimit(min=0, max=10) for section in SECTIONS})
+
+
+def pair():
+    return [Person(name="Ana", preferences=["Tropa", "Clan"]), Person(name="Luis", preferences=["Clan", "Tropa"])]
+
+
+@pytest.mark.parametrize("strategy", ["greedy", "lexicographic"])
+def test_together_pairs_share_one_first_choice(strategy):
+    people = pair()
+    free, _, analytic = fairness_report(people, LIMITS, [], RestrictionPriorities(), strategy, 200, 1)
+    assert [row.firstChoice for row in free] == [1.0, 1.0]
+    assert analytic == (strategy == "lexicographic")
+
+    together = [GroupConstraint(kind="together", person_ids=[person.id for person in people])]
+    rows, metrics, analytic = fairness_report(people, LIMITS, [], RestrictionPriorities(), strategy, 200, 1,
+                                              constraints=together)
+    # Only one of them can be in their first choice, and the other is then in their second
+    assert sum(row.firstChoice for row in rows) == pytest.approx(1.0)
+    assert sum(row.secondChoice for row in rows) == pytest.approx(1.0)
+    assert metrics.expectedFirstChoice == pytest.approx(1.0)
+    assert not analytic
+
+
+def test_fairness_endpoint_uses_the_session_constraints(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    client.post("/api/people", json={"session_id": session_id, "people": [
+        {"name": "Ana", "preferences": ["Tropa", "Clan"]}, {"name": "Luis", "preferences": ["Clan", "Tropa"]}]})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 10} for section in SECTIONS}})
+    ids = [person["id"] for person in client.get(f"/api/people/{session_id}").json()["people"]]
+    client.post("/api/constraints", json={"session_id": session_id,
+                                          "constraints": [{"kind": "together", "person_ids": ids}]})
+
+    report = client.post("/api/fairness", json={"session_id": session_id, "strategy": "lexicographic",
+                                                "simulations": 100, "seed": 3}).json()
+    assert not report["analytic"] and report["simulations"] == 100
+    assert sum(row["firstChoice"] for row in report["people"]) == pytest.approx(1.0)
+    assert client.post("/api/fairness", json={"session_id": session_id, "simulations": 5000}).status_code == 400
@@ -0,0 +1,121 @@
+import itertools
+import random
+
+import pytest
+
+from models import Person, SectionLimit, SectionLimits, ContinuityItem, RestrictionPriorities
+from assignment_algorithm import SectionAssigner, RESTRICTIONS
+from flow import MinCostFlow
+
+
+def brute_force_assignment(costs, capacities):
+    """Cheapest way to give every row a column within the column capacities; None if impossible"""
+    best = None
+    for choice in itertools.product(range(len(capacities)), repeat=len(costs)):
+        if any(choice.count(column) > capacity for column, capacity in enumerate(capacities)):
+            continue
+        cost = sum(row[column] for row, column in zip(costs, choice))
+        if best is None or cost < best:
+            best = cost
+    return best
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_min_cost_flow_matches_brute_force(seed):
+    rng = random.Random(seed)
+    rows, columns = rng.randint(1, 6), rng.randint(1, 4)
+    costs = [[rng.randint(-5, 9) for _ in range(columns)] for _ in range(rows)]
+    capacities = [rng.randint(0, 3) for _ in range(columns)]
+
+    solver = MinCostFlow(2)
+    source, sink = 0, 1
+    column_nodes = [solver.add_node() for _ in range(columns)]
+    for column, node in enumerate(column_nodes):
+        solver.add_edge(node, sink, capacities[column])
+    for row in costs:
+        node = solver.add_node()
+        solver.add_edge(source, node, 1)
+        for column, cost in enumerate(row):
+            solver.add_edge(node, column_nodes[column], 1, cost)
+    flow, cost = solver.solve(source, sink)
+
+    expected = brute_force_assignment(costs, capacities)
+    assert flow == min(rows, sum(capacities))
+    if expected is not None:
+        assert cost == expected
+
+
+def test_min_cost_flow_respects_max_flow():
+    solver = MinCostFlow(2)
+    middle = solver.add_node()
+    cheap = solver.add_edge(0, middle, 5, -3)
+    solver.add_edge(middle, 1, 5)
+    assert solver.solve(0, 1, max_flow=2) == (2, -6)
+    assert solver.flow(cheap) == 2
+
+
+SECTIONS = ["A", "B", "C"]
+
+
+def objective(assigner, people, continuity, assignment):
+    """Lexicographic objective of an assignment, highest level first; larger is better"""
+    where = dict(assignment)
+    counts = {section: 0 for section in SECTIONS}
+    for section in where.values():
+        counts[section] += 1
+    max_rank = max(len(person.preferences) for person in people)
+    metrics = {restriction: 0 for restriction in RESTRICTIONS}
+    vetoes = lower_ranks = 0
+    for section in SECTIONS:
+        limit = assigner.limits[section]
+        metrics["sectionLimits"] += min(counts[section], limit.min) - max(counts[section] - limit.max, 0)
+    for person in people:
+        section = where[person.id]
+        if section == continuity.get(person.id):
+            metrics["continuityList"] += 1
+        elif section in person.vetoes:
+            vetoes += 1
+        if section in person.preferences:
+            rank = person.preferences.index(section)
+            if rank < 2:
+                metrics[("firstPreference", "secondPreference")[rank]] += 1
+            else:
+                lower_ranks += max_rank - rank
+
+    levels = sorted({assigner._get_priority(restriction) for restriction in RESTRICTIONS})
+    return ((-vetoes,)
+            + tuple(sum(metrics[r] for r in RESTRICTIONS if assigner._get_priority(r) == level) for level in levels)
+            + (lower_ranks,))
+
+
+def random_instance(rng):
+    people = []
+    for i in range(rng.randint(2, 6)):
+        preferences = rng.sample(SECTIONS, rng.randint(1, 3))
+        vetoes = [s for s in SECTIONS if s not in preferences and rng.random() < 0.4]
+        people.append(Person(name=f"P{i}", preferences=preferences, vetoes=vetoes))
+    limits = {}
+    for section in SECTIONS:
+        low = rng.randint(0, 2)
+        limits[section] = SectionLimit(min=low, max=rng.randint(max(low, 1), 3))
+    continuity = [ContinuityItem(name=p.name, person_id=p.id, section=rng.choice(SECTIONS))
+                  for p in people if rng.random() < 0.3]
+    priorities = {restriction: rng.randint(1, 3) for restriction in RESTRICTIONS}
+    return people, SectionLimits(limits=limits), continuity, RestrictionPriorities(priorities=priorities)
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_lexicographic_solver_matches_brute_force(seed):
+    rng = random.Random(seed)
+    people, limits, continuity_list, priorities = random_instance(rng)
+    assigner = SectionAssigner(people, limits, continuity_list, priorities, rng=random.Random(seed),
+                               strategy="lexicographic", sections=SECTIONS)
+    continuity = {item.person_id: item.section for item in continuity_list}
+
+    result = assigner.assign_people()
+    placed = [(person.id, section) for section, members in result.items() for person in members]
+    assert sorted(person_id for person_id, _ in placed) == sorted(person.id for person in people)
+
+    best = max(objective(assigner, people, continuity, zip([p.id for p in people], choice))
+               for choice in itertools.product(SECTIONS, repeat=len(people)))
+    assert objective(assigner, people, continuity, placed) == best
@@ -0,0 +1,44 @@
+from models import Person
+from name_index import NameIndex, normalize_name
+
+
+def roster(*names):
+    return NameIndex([Person(name=name, option1="Tropa") for name in names])
+
+
+def test_names_match_ignoring_case_accents_and_spaces():
+    assert normalize_name("  José   MARÍA ") == "jose maria"
+    index = roster("José María", "Lucía")
+    assert index.find("jose  maria").name == "José María"
+    assert index.find("LUCIA").name == "Lucía"
+    assert index.find("Pedro") is None
+
+
+def test_shared_keys_are_ambiguous_unless_the_name_is_exact():
+    index = roster("Ana", "Ána", "Luis", "Luis")
+    assert index.find("Ana").name == "Ana"
+    assert index.find("Ána").name == "Ána"
+    assert index.find("ana") is None
+    # The very same name twice can only be told apart by ID
+    assert index.find("Luis") is None
+    assert [person.name for person in index.candidates("luis")] == ["Luis", "Luis"]
+
+
+def test_suggestions_for_unknown_names():
+    index = roster("Valentina Castro", "Valeria Castro", "Diego Torres")
+    assert index.suggest("Valentina Castra")[0] == "Valentina Castro"
+    assert "Diego Torres" not in index.suggest("Valentina Castra")
+
+
+def test_match_report_flags_duplicates(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name=name, option1="Tropa") for name in ["Ana", "Ana", "Lucía", "Diego Torres"]]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    continuity = [dict(name=name, section="Tropa") for name in ["Ana", "lucia", "Diego Torre", "Lucía"]]
+    client.post("/api/continuity", json={"session_id": session_id, "continuity_list": continuity})
+
+    report = client.get(f"/api/continuity/{session_id}/matches").json()
+    assert [item["status"] for item in report["items"]] == ["ambiguous", "normalized", "unmatched", "exact"]
+    assert report["items"][0]["candidates"] == ["Ana", "Ana"]
+    assert report["items"][2]["suggestions"] == ["Diego Torres"]
+    assert (report["matched"], report["ambiguous"], report["unmatched"]) == (2, 1, 1)
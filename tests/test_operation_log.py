@@ -0,0 +1,173 @@
+from models import Person, AssignmentOperation, SECTIONS
+from operation_log import replay, compact_snapshot, restore_snapshot, move_in_lists
+
+
+def make_state():
+    people = [Person(name=f"P{i}", option1=SECTIONS[i % 5], option2=SECTIONS[(i + 1) % 5]) for i in range(10)]
+    return {section: [p for p in people if p.option1 == section] for section in SECTIONS}
+
+
+def names(state):
+    return {section: [person.name for person in people] for section, people in state.items()}
+
+
+def members(state):
+    """Who is in each section; undo puts a person back at the end of their section"""
+    return {section: sorted(people) for section, people in state.items()}
+
+
+def operation(seq, person, from_section, to_section, with_id=True):
+    return AssignmentOperation(session_id="s", assignment_id="a", seq=seq,
+                               person_id=person.id if with_id else None, person_name=person.name,
+                               from_section=from_section, to_section=to_section)
+
+
+def test_replay_applies_moves_in_order_and_keeps_section_order():
+    state = make_state()
+    first, second = state["Colonia"]
+    operations = [operation(1, first, "Colonia", "Tropa"),
+                  operation(2, first, "Tropa", "Clan"),
+                  # Operations logged before person IDs existed only carry the name
+                  operation(3, second, "Colonia", "Clan", with_id=False)]
+
+    result = replay(state, operations)
+
+    assert names(result)["Colonia"] == []
+    assert names(result)["Tropa"] == names(state)["Tropa"]
+    assert names(result)["Clan"] == names(state)["Clan"] + [first.name, second.name]
+    # The base state is left untouched
+    assert names(state)["Colonia"] == [first.name, second.name]
+
+
+def test_undoing_every_move_restores_the_base_state():
+    state = make_state()
+    first, second = state["Colonia"][0], state["Tropa"][1]
+    operations = [operation(1, first, "Colonia", "Manada"), operation(2, second, "Tropa", "Colonia")]
+    inverse = [operation(3, second, "Colonia", "Tropa"), operation(4, first, "Manada", "Colonia")]
+
+    result = replay(replay(state, operations), inverse)
+
+    assert members(names(result)) == members(names(state))
+
+
+def test_snapshot_round_trip_by_id_and_by_name():
+    state = make_state()
+    assert names(restore_snapshot(compact_snapshot(state), state)) == names(state)
+    legacy = {section: [person.name for person in people] for section, people in state.items()}
+    assert names(restore_snapshot(legacy, state)) == names(state)
+
+
+def test_move_in_lists_reports_missing_people():
+    state = make_state()
+    person = state["Manada"][0]
+    assert move_in_lists(state, "Colonia", "Clan", person_id=person.id) is None
+    assert move_in_lists(state, "Manada", "Clan", person_name=person.name) is person
+    assert state["Clan"][-1] is person and person not in state["Manada"]
+
+
+def current(client, session_id):
+    assignments = client.get(f"/api/assignments/{session_id}").json()["assignments"]
+    return {section: [person["name"] for person in people] for section, people in assignments.items()}
+
+
+def test_move_undo_redo_and_history(client, assigned_session):
+    session_id = assigned_session
+    start = current(client, session_id)
+    moves = [(start["Colonia"][0], "Colonia", "Clan"), (start["Tropa"][0], "Tropa", "Colonia")]
+    states = [start]
+    for name, from_section, to_section in moves:
+        response = client.post(f"/api/assignments/{session_id}/move",
+                               json={"person_name": name, "from_section": from_section, "to_section": to_section})
+        assert response.status_code == 200
+        states.append(current(client, session_id))
+    assert states[1]["Clan"][-1] == moves[0][0]
+
+    assert client.post(f"/api/assignments/{session_id}/undo").json()["op_seq"] == 1
+    assert members(current(client, session_id)) == members(states[1])
+    assert client.post(f"/api/assignments/{session_id}/undo").json()["op_seq"] == 0
+    assert members(current(client, session_id)) == members(start)
+    assert client.post(f"/api/assignments/{session_id}/undo").status_code == 400
+
+    assert client.post(f"/api/assignments/{session_id}/redo").json()["op_seq"] == 1
+    assert client.post(f"/api/assignments/{session_id}/redo").json()["op_seq"] == 2
+    assert members(current(client, session_id)) == members(states[2])
+    assert client.post(f"/api/assignments/{session_id}/redo").status_code == 400
+
+    history = client.get(f"/api/assignments/{session_id}/history").json()
+    assert [(op["person_name"], op["from_section"], op["to_section"]) for op in history["operations"]] == moves
+    for seq, state in enumerate(states):
+        replayed = client.get(f"/api/assignments/{session_id}/history/{seq}").json()["assignments"]
+        assert {section: [p["name"] for p in people] for section, people in replayed.items()} == state
+
+
+def test_a_new_move_after_undo_drops_the_redo_branch(client, assigned_session):
+    session_id = assigned_session
+    start = current(client, session_id)
+    name = start["Manada"][0]
+    client.post(f"/api/assignments/{session_id}/move",
+                json={"person_name": name, "from_section": "Manada", "to_section": "Tropa"})
+    client.post(f"/api/assignments/{session_id}/undo")
+    client.post(f"/api/assignments/{session_id}/move",
+                json={"person_name": name, "from_section": "Manada", "to_section": "Esculta"})
+
+    assert client.post(f"/api/assignments/{session_id}/redo").status_code == 400
+    history = client.get(f"/api/assignments/{session_id}/history").json()
+    assert [op["to_section"] for op in history["operations"]] == ["Esculta"]
+
+
+def test_moves_after_preferences_were_shortened(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name=f"P{i}", preferences=["Colonia", "Manada", "Tropa"]) for i in range(3)]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 1} for section in SECTIONS}})
+    assert client.post("/api/assign", json={"session_id": session_id}).status_code == 200
+    # Re-uploading shorter lists leaves third choices in the stored assignment that the roster no longer ranks
+    people = [dict(person, preferences=["Colonia"]) for person in people]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+
+    placed = current(client, session_id)["Tropa"][0]
+    response = client.post(f"/api/assignments/{session_id}/move",
+                           json={"person_name": placed, "from_section": "Tropa", "to_section": "Clan"})
+    assert response.status_code == 200
+    assert response.json()["statistics"]["satisfaction"]["rankHistogram"] == [1, 1, 0]
+    assert client.post(f"/api/assignments/{session_id}/undo").status_code == 200
+    assert client.get(f"/api/assignments/{session_id}/history/1").status_code == 200
+
+
+def test_moves_after_a_section_change_ask_for_a_new_run(client, assigned_session):
+    session_id = assigned_session
+    name = current(client, session_id)["Colonia"][0]
+    sections = SECTIONS + ["Rovers"]
+    client.post("/api/sections", json={"session_id": session_id, "sections": sections})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 10} for section in sections}})
+    move = {"person_name": name, "from_section": "Colonia", "to_section": "Tropa"}
+
+    response = client.post(f"/api/assignments/{session_id}/move", json=move)
+    assert response.status_code == 409 and "asignación" in response.json()["detail"]
+    assert client.get(f"/api/assignments/{session_id}/history/0").status_code == 409
+
+    assert client.post("/api/assign", json={"session_id": session_id}).status_code == 200
+    assert client.post(f"/api/assignments/{session_id}/move", json=move).status_code == 200
+
+
+def test_moving_a_shared_name_needs_the_id(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name="Ana", option1="Tropa"), dict(name="Ana", option1="Tropa"), dict(name="Luis", option1="Tropa")]
+    client.post("/api/people", json={"session_id": session_id, "people": people})
+    client.post(f"/api/limits?session_id={session_id}",
+                json={"limits": {section: {"min": 0, "max": 10} for section in SECTIONS}})
+    client.post("/api/assign", json={"session_id": session_id})
+    anas = [p["id"] for p in client.get(f"/api/assignments/{session_id}").json()["assignments"]["Tropa"]
+            if p["name"] == "Ana"]
+
+    move = {"person_name": "Ana", "from_section": "Tropa", "to_section": "Clan"}
+    response = client.post(f"/api/assignments/{session_id}/move", json=move)
+    assert response.status_code == 409
+    assert all(person_id in response.json()["detail"] for person_id in anas)
+    assert current(client, session_id)["Clan"] == []
+
+    assert client.post(f"/api/assignments/{session_id}/move", json=dict(move, person_id=anas[1])).status_code == 200
+    clan = client.get(f"/api/assignments/{session_id}").json()["assignments"]["Clan"]
+    assert [p["id"] for p in clan] == [anas[1]]
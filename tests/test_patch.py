@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from models import PersonUpdate, ContinuityItemUpdate, PeoplePatch, ContinuityPatch
+from database import Database
+
+
+class RecordingSessions:
+    """Stands in for the sessions collection and keeps the bulk writes (mongomock has no array filters)"""
+
+    def __init__(self, people=()):
+        self.operations = []
+        self.people = list(people)
+
+    async def find_one(self, query, projection=None):
+        return {"people": self.people}
+
+    async def bulk_write(self, operations, ordered=True):
+        self.operations += operations
+        return type("Result", (), {"matched_count": 1})()
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    sessions = RecordingSessions()
+    monkeypatch.setattr(Database, "sessions", property(lambda self: sessions))
+    return sessions
+
+
+def people(client, session_id):
+    return client.get(f"/api/people/{session_id}").json()["people"]
+
+
+def test_update_sets_only_the_given_fields(recorded):
+    patch = PeoplePatch(update=[PersonUpdate(id="p1", name="Nueva"),
+                                PersonUpdate(id="p2", preferences=["Tropa", "Clan", "Tropa"])],
+                        remove=["p3"])
+    asyncio.run(Database().patch_people("s", patch))
+
+    pull, update, touch = recorded.operations
+    assert pull._doc == {"$pull": {"people": {"id": {"$in": ["p3"]}}}}
+    # New ranked lists rewrite the legacy fields they mirror, and nothing else is sent
+    assert update._doc == {"$set": {
+        "people.$[e0].name": "Nueva",
+        "people.$[e1].preferences": ["Tropa", "Clan"],
+        "people.$[e1].option1": "Tropa",
+        "people.$[e1].option2": "Clan",
+    }}
+    assert update._array_filters == [{"e0.id": "p1"}, {"e1.id": "p2"}]
+    assert set(touch._doc["$set"]) == {"last_accessed"}
+
+
+def test_legacy_fields_rewrite_the_ranked_lists(recorded):
+    recorded.people = [{"id": "p1", "name": "Ana", "option1": "Tropa", "option2": "Clan", "veto": "Colonia",
+                        "preferences": ["Tropa", "Clan", "Manada"], "vetoes": ["Colonia", "Esculta"]}]
+    patch = PeoplePatch(update=[PersonUpdate(id="p1", option2="Colonia", veto="Clan")])
+    asyncio.run(Database().patch_people("s", patch))
+
+    assert recorded.operations[0]._doc == {"$set": {
+        "people.$[e0].preferences": ["Tropa", "Colonia", "Manada"],
+        "people.$[e0].vetoes": ["Clan", "Esculta"],
+        "people.$[e0].option1": "Tropa",
+        "people.$[e0].option2": "Colonia",
+        "people.$[e0].veto": "Clan",
+    }}
+
+
+def test_continuity_person_id_can_be_cleared(recorded):
+    patch = ContinuityPatch(update=[ContinuityItemUpdate(id="c1", person_id=None)])
+    asyncio.run(Database().patch_continuity_list("s", patch))
+    assert recorded.operations[0]._doc == {"$set": {"continuity_list.$[e0].person_id": None}}
+
+
+@pytest.mark.parametrize("update", [
+    {"id": "p1", "name": None},
+    {"id": "p1", "preferences": ["Tropa", "Clan"], "vetoes": ["Clan"]},
+    {"id": "p1", "veto": None},
+    {"id": "p1", "preferences": None},
+    {"id": "p1", "preferences": []},
+])
+def test_person_updates_reject_values_that_break_the_roster(update):
+    with pytest.raises(ValidationError):
+        PersonUpdate(**update)
+
+
+def test_continuity_updates_reject_null_sections():
+    with pytest.raises(ValidationError):
+        ContinuityItemUpdate(id="c1", section=None)
+
+
+def test_add_and_remove_people(client, assigned_session):
+    session_id = assigned_session
+    before = people(client, session_id)
+    response = client.patch(f"/api/people/{session_id}", json={
+        "add": [{"name": "Nueva", "preferences": ["Tropa", "Clan"]}],
+        "remove": [before[0]["id"]],
+    })
+    assert response.status_code == 200
+    added_id, = response.json()["added"]
+
+    after = people(client, session_id)
+    assert [p["id"] for p in after] == [p["id"] for p in before[1:]] + [added_id]
+    assert after[-1]["option1"] == "Tropa" and after[-1]["veto"] == "Ninguna"
+
+
+def test_patch_rejects_unknown_sessions_sections_and_taken_ids(client, assigned_session):
+    session_id = assigned_session
+    existing = people(client, session_id)[0]["id"]
+    assert client.patch("/api/people/missing", json={"remove": ["x"]}).status_code == 404
+    assert client.patch(f"/api/people/{session_id}",
+                        json={"update": [{"id": existing, "option1": "Marte"}]}).status_code == 400
+    assert client.patch(f"/api/people/{session_id}",
+                        json={"add": [{"id": existing, "name": "Copia", "option1": "Tropa"}]}).status_code == 400
+    assert client.patch(f"/api/continuity/{session_id}",
+                        json={"add": [{"name": "P1", "section": "Marte"}]}).status_code == 400
+    assert client.patch(f"/api/people/{session_id}",
+                        json={"update": [{"id": existing, "veto": None}]}).status_code == 422
+    assert people(client, session_id)[0]["id"] == existing
+
+
+def test_reupload_keeps_ids(client, assigned_session):
+    session_id = assigned_session
+    before = people(client, session_id)
+    roster = [{"name": p["name"], "preferences": p["preferences"]} for p in before] + [{"name": "Nueva", "option1": "Clan"}]
+    client.post("/api/people", json={"session_id": session_id, "people": roster})
+
+    after = people(client, session_id)
+    assert [p["id"] for p in after[:-1]] == [p["id"] for p in before]
+    assert after[-1]["id"] not in {p["id"] for p in before}
+
+
+def test_a_section_cannot_be_both_preferred_and_vetoed(client, assigned_session, array_filters):
+    session_id = assigned_session
+    person = people(client, session_id)[0]
+    response = client.post("/api/people", json={"session_id": session_id, "people": [
+        {"name": "Ana", "preferences": ["Tropa", "Clan"], "vetoes": ["Clan"]}]})
+    assert response.status_code == 422
+
+    assert (person["preferences"], person["vetoes"]) == (["Colonia", "Manada"], [])
+    client.patch(f"/api/people/{session_id}", json={"update": [{"id": person["id"], "veto": "Clan"}]})
+    person = people(client, session_id)[0]
+    assert (person["preferences"], person["vetoes"]) == (["Colonia", "Manada"], ["Clan"])
+
+    # Each update is fine alone but clashes with what is stored
+    for update in [{"vetoes": ["Colonia"]}, {"veto": "Manada"}, {"preferences": ["Clan", "Tropa"]}, {"option2": "Clan"}]:
+        response = client.patch(f"/api/people/{session_id}", json={"update": [dict(update, id=person["id"])]})
+        assert response.status_code == 422 and "vetos" in response.json()["detail"]
+    assert people(client, session_id)[0] == person
@@ -0,0 +1,54 @@
+from models import SECTIONS
+
+LIMITS = {section: {"min": 0, "max": 10} for section in SECTIONS}
+
+
+def section_of(assignments):
+    return {person["name"]: section for section, people in assignments.items() for person in people}
+
+
+def test_run_saves_the_configuration_with_its_result(client):
+    people = [dict(name=f"P{i}", preferences=[SECTIONS[i % 5], SECTIONS[(i + 2) % 5]]) for i in range(8)]
+    response = client.post("/api/run", json={
+        "people": people, "limits": LIMITS,
+        "continuity_list": [{"name": "P0", "section": "Clan"}],
+        "priorities": {"sectionLimits": 1, "continuityList": 1, "firstPreference": 2, "secondPreference": 3},
+    })
+    assert response.status_code == 200
+    body = response.json()
+    session_id = body["session_id"]
+
+    placed = section_of(body["assignment"]["assignments"])
+    assert placed["P0"] == "Clan" and placed["P1"] == "Manada"
+    assert [p["name"] for p in client.get(f"/api/people/{session_id}").json()["people"]] == [p["name"] for p in people]
+    assert client.get(f"/api/limits/{session_id}").json()["limits"] == LIMITS
+    assert client.get(f"/api/continuity/{session_id}").json()["continuity_list"][0]["section"] == "Clan"
+    assert client.get(f"/api/priorities/{session_id}").json()["priorities"]["secondPreference"] == 3
+    assert client.get(f"/api/assignments/{session_id}").json()["id"] == body["assignment"]["id"]
+
+
+def test_rejected_runs_store_nothing(client):
+    session_id = client.post("/api/session").json()["session_id"]
+    people = [dict(name=f"P{i}", option1="Tropa") for i in range(3)]
+    hopeless = dict(LIMITS, Tropa={"min": 5, "max": 10})
+    assert client.post("/api/run", json={"session_id": session_id, "people": people, "limits": hopeless}).status_code == 422
+    assert client.post("/api/run", json={"session_id": session_id, "people": people, "limits": LIMITS,
+                                         "sections": ["Tropa", "Tropa"]}).status_code == 400
+    assert client.get(f"/api/people/{session_id}").json()["people"] == []
+    assert client.get(f"/api/limits/{session_id}").status_code == 404
+
+
+def test_run_with_sections_and_constraints(client):
+    people = [dict(id="a", name="Ana", option1="Norte"), dict(id="b", name="Luis", option1="Sur")]
+    sections = ["Norte", "Sur"]
+    response = client.post("/api/run", json={
+        "people": people, "sections": sections,
+        "limits": {section: {"min": 0, "max": 2} for section in sections},
+        "constraints": [{"kind": "together", "person_ids": ["a", "b"]}],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(set(section_of(body["assignment"]["assignments"]).values())) == 1
+    assert body["assignment"]["statistics"]["groupViolations"] == 0
+    assert client.get(f"/api/sections/{body['session_id']}").json()["sections"] == sections
+    assert len(client.get(f"/api/constraints/{body['session_id']}").json()["constraints"]) == 1
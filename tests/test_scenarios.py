@@ -0,0 +1,42 @@
+from models import Person, SectionLimit, SectionLimits, RestrictionPriorities, SECTIONS
+from scenarios import ScenarioEvaluator, evaluate_scenarios, create_pool, PARALLEL_THRESHOLD
+
+
+def evaluator():
+    people = [Person(name=f"P{i}", preferences=[SECTIONS[i % 2], SECTIONS[2]]) for i in range(30)]
+    limits = SectionLimits(limits={section: SectionLimit(min=0, max=30) for section in SECTIONS})
+    return ScenarioEvaluator(people, limits, [], RestrictionPriorities())
+
+
+def test_the_pool_gives_the_same_results_as_a_serial_sweep():
+    limits_variants = [{SECTIONS[0]: SectionLimit(min=0, max=cap)} for cap in range(1, 21)]
+    priorities_variants = [{}, {"sectionLimits": 3, "firstPreference": 1}]
+    assert len(limits_variants) * len(priorities_variants) >= PARALLEL_THRESHOLD
+    serial = evaluate_scenarios(evaluator(), limits_variants, priorities_variants, seed=5)
+
+    pool = create_pool(2)
+    try:
+        parallel = evaluate_scenarios(evaluator(), limits_variants, priorities_variants, seed=5, pool=pool)
+    finally:
+        pool.shutdown()
+
+    assert parallel == serial
+    # Tighter caps on the first section push its people to their second choice
+    counts = [result.statistics.sectionCounts[SECTIONS[0]] for result in serial if result.priorities_variant == 0]
+    assert counts == list(range(1, 16)) + [15] * 5
+
+
+def test_single_worker_runs_serially():
+    assert create_pool(1) is None
+
+
+def test_scenario_endpoint(client, assigned_session):
+    response = client.post("/api/scenarios", json={
+        "session_id": assigned_session, "seed": 1,
+        "limits_variants": [{"Colonia": {"min": 0, "max": 1}}, {}],
+        "priorities_variants": [],
+    })
+    assert response.status_code == 200
+    scenarios = response.json()["scenarios"]
+    assert [(s["limits_variant"], s["priorities_variant"]) for s in scenarios] == [(0, None), (1, None)]
+    assert [s["statistics"]["sectionCounts"]["Colonia"] for s in scenarios] == [1, 2]
@@ -0,0 +1,52 @@
+import random
+
+from models import Person, SectionLimit, SectionLimits, ContinuityItem, RestrictionPriorities
+from assignment_algorithm import SectionAssigner
+
+
+def test_trace_explains_every_placement():
+    limits = SectionLimits(limits={"A": SectionLimit(min=0, max=2), "B": SectionLimit(min=0, max=2),
+                                   "C": SectionLimit(min=0, max=9)})
+    staying = Person(name="Staying", preferences=["B"])
+    people = [staying] + [Person(name=f"P{i}", preferences=["A", "B"]) for i in range(4)]
+    continuity = [ContinuityItem(name=staying.name, person_id=staying.id, section="A")]
+    assigner = SectionAssigner(people, limits, continuity, RestrictionPriorities(), rng=random.Random(1),
+                               sections=["A", "B", "C"], trace=True)
+    result = assigner.assign_people()
+    trace = assigner.trace_report(result)
+
+    placed = {p.id: p for p in trace.placements}
+    assert set(placed) == {person.id for person in people}
+    assert (placed[staying.id].reason, placed[staying.id].section) == ("continuity", "A")
+    reasons = sorted((p.reason, p.section, p.rank, tuple(p.lost_draws)) for p in trace.placements if p.id != staying.id)
+    # A had one seat left after continuity and B two: the last draw falls back to C
+    assert reasons == [("fallback", "C", None, ("A", "B")), ("preference", "A", 0, ()),
+                       ("preference", "B", 1, ("A",)), ("preference", "B", 1, ("A",))]
+    assert [phase.phase for phase in trace.phases] == ["continuity", "strict_limits"]
+    assert all(phase.duration_ms >= 0 for phase in trace.phases)
+
+
+def test_no_trace_unless_asked():
+    people = [Person(name="Ana", preferences=["A"])]
+    limits = SectionLimits(limits={"A": SectionLimit(min=0, max=1)})
+    assigner = SectionAssigner(people, limits, [], RestrictionPriorities(), sections=["A"])
+    assert assigner.tracer is None
+    assert assigner.trace_report(assigner.assign_people()) is None
+
+
+def test_assign_returns_the_trace_on_request(client, assigned_session):
+    response = client.post("/api/assign", json={"session_id": assigned_session}).json()
+    assert response.get("trace") is None
+
+    response = client.post("/api/assign", json={"session_id": assigned_session, "trace": True}).json()
+    placements = response["trace"]["placements"]
+    assert len(placements) == 10
+    sections = {person["id"]: section for section, people in response["assignment"]["assignments"].items()
+                for person in people}
+    assert all(sections[p["id"]] == p["section"] and p["reason"] == "preference" and p["rank"] == 0
+               for p in placements)
+    assert response["trace"]["phases"][0]["phase"] == "continuity"
+    # Slim views keep the trace
+    stats = client.post("/api/assign", params={"view": "stats"},
+                        json={"session_id": assigned_session, "trace": True}).json()
+    assert len(stats["trace"]["placements"]) == 10
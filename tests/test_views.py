@@ -0,0 +1,43 @@
+from models import SECTIONS
+
+
+def test_assignment_views(client, assigned_session):
+    session_id = assigned_session
+    full = client.get(f"/api/assignments/{session_id}").json()
+    names = {section: [person["name"] for person in people] for section, people in full["assignments"].items()}
+
+    compact = client.get(f"/api/assignments/{session_id}", params={"view": "compact"}).json()
+    assert compact["assignments"] == names
+    assert (compact["id"], compact["statistics"]) == (full["id"], full["statistics"])
+
+    stats = client.get(f"/api/assignments/{session_id}", params={"view": "stats"}).json()
+    assert "assignments" not in stats and stats["statistics"] == full["statistics"]
+
+
+def test_assign_views(client, assigned_session):
+    request = {"session_id": assigned_session}
+    for view in ["compact", "stats"]:
+        slim = client.post("/api/assign", params={"view": view}, json=request).json()["assignment"]
+        # The slim response describes the assignment that was saved in full
+        saved = client.get(f"/api/assignments/{assigned_session}").json()
+        assert (slim["id"], slim["statistics"]) == (saved["id"], saved["statistics"])
+        if view == "compact":
+            assert slim["assignments"] == {section: [person["name"] for person in people]
+                                           for section, people in saved["assignments"].items()}
+        else:
+            assert "assignments" not in slim
+
+
+def test_people_views(client, assigned_session):
+    session_id = assigned_session
+    assert client.get(f"/api/people/{session_id}", params={"view": "compact"}).json() == \
+        {"people": [f"P{i}" for i in range(10)]}
+    assert client.get(f"/api/people/{session_id}", params={"view": "stats"}).json() == \
+        {"total": 10, "firstChoice": {section: 2 for section in SECTIONS}}
+
+
+def test_unknown_views_are_rejected(client, assigned_session):
+    for url in [f"/api/people/{assigned_session}", f"/api/assignments/{assigned_session}"]:
+        assert client.get(url, params={"view": "names"}).status_code == 400
+    assert client.post("/api/assign", params={"view": "names"},
+                       json={"session_id": assigned_session}).status_code == 400
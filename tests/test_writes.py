@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from models import Person, Assignment, AssignmentStatistics, SatisfactionStats
+from database import Database
+
+
+def make_assignment(session_id="s"):
+    person = Person(name="Ana", option1="Tropa")
+    statistics = AssignmentStatistics(totalPeople=1, assigned=1, satisfaction=SatisfactionStats(firstChoice=1),
+                                      sectionCounts={"Tropa": 1}, withinLimits=True)
+    return Assignment(session_id=session_id, assignments={"Tropa": [person]}, statistics=statistics), person
+
+
+async def stored(db, session_id="s"):
+    session = await db.sessions.find_one({"session_id": session_id})
+    history = await db.assignments.find({"session_id": session_id}).to_list(length=None)
+    return session, history
+
+
+def test_configuration_and_result_are_saved_together(db):
+    assignment, person = make_assignment()
+    configuration = {"people": [person.dict()]}
+    assert asyncio.run(db.save_assignment(assignment, configuration))
+
+    session, history = asyncio.run(stored(db))
+    assert session["people"] == [person.dict()]
+    assert session["current_assignment"]["id"] == assignment.id
+    assert [entry["id"] for entry in history] == [assignment.id]
+
+
+class FailingSessions:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_one(self, *args, **kwargs):
+        raise ConnectionError("network")
+
+
+def test_without_transactions_a_failed_session_update_takes_back_the_history_entry(db, monkeypatch):
+    sessions = Database.sessions.fget
+    monkeypatch.setattr(Database, "sessions", property(lambda self: FailingSessions(sessions(self))))
+    assignment, person = make_assignment()
+    with pytest.raises(ConnectionError):
+        asyncio.run(db.save_assignment(assignment, {"people": [person.dict()]}))
+
+    session, history = asyncio.run(stored(db))
+    assert session is None and history == []
+
+
+class FakeSession:
+    """Runs the transaction callback once and records that it was used"""
+
+    def __init__(self):
+        self.transactions = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def with_transaction(self, write):
+        self.transactions += 1
+        await write(self)
+
+
+def test_writes_share_one_transaction_where_supported(db, monkeypatch):
+    session = FakeSession()
+
+    async def start_session():
+        return session
+
+    monkeypatch.setattr(db.client, "start_session", start_session, raising=False)
+    db._transactions = True
+    given = []
+
+    async def write(s):
+        given.append(s)
+
+    assert asyncio.run(db._grouped_write(write))
+    assert given == [session] and session.transactions == 1
+
+
+def test_a_rollback_reports_failure(db):
+    from database import _Rollback
+
+    async def write(session):
+        raise _Rollback()
+
+    assert asyncio.run(db._grouped_write(write)) is False